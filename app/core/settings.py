@@ -2,6 +2,10 @@
 import os
 from dataclasses import dataclass
 
+# XML files at least this big are opened with the mode picked under
+# Settings → "Large files" (memory-mapped by default) instead of a full tree.
+LARGE_FILE_MIN_BYTES = 16 * 1024 * 1024
+
 
 @dataclass
 class Paths:
@@ -0,0 +1,349 @@
+# app/logic/bulk_clone.py
+"""
+Bulk clones from a spec file: one row per clone, each with its own base
+quest and field overrides.
+
+CSV (header row required) or JSON (a list of objects, or {"clones": [...]}):
+
+    base_id,new_id,name,start_npc,exp,gain_items
+    1000,61001,Lost Letter,1012100,500,4031000 1;2000000 10
+    1000,61002,Lost Parcel,,800,
+
+- base_id / new_id are required. A base may be an earlier row's new_id.
+- Every other column is a QuestInfo / Requirements / Rewards field name
+  (see records.py). The clone is a copy of the whole base quest in each
+  file, values the editor has no field for included; only the given fields
+  change. An empty CSV cell keeps the base value, a JSON null clears the
+  field.
+- (id, count) fields take "id count" pairs separated by ";" or new lines
+  (JSON: also [[id, count], ...]).
+
+The spec is checked as a whole before anything is applied (SpecError).
+plan_clones() then builds every row's quest XML from the trees as they
+are, apply_clones() writes it in one pass, and the report (write_report) lists
+the outcome per row and per file as JSON.
+"""
+
+import csv
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from app.xml import atomic_file
+from app.xml.act_helpers import set_reward_fields
+from app.xml.backend import ET
+from app.xml.check_helpers import set_requirement_fields
+from app.xml.clone_helpers import copy_quest
+from app.xml.questinfo_helpers import set_questinfo_fields
+from app.xml.quest_index import get_index
+from app.xml.records import PairList
+
+# Spec column → (record kind, field type)
+_INT, _BOOL, _STR, _PAIRS = "int", "bool", "str", "pairs"
+FIELDS: Dict[str, tuple] = {
+    name: ("QuestInfo", _STR)
+    for name in (
+        "name", "summary", "reward_summary", "demand_summary",
+        "log0", "log1", "log2", "type", "parent",
+    )
+}
+FIELDS.update({
+    "area": ("QuestInfo", _INT),
+    "order": ("QuestInfo", _INT),
+    "auto_start": ("QuestInfo", _BOOL),
+    "auto_complete": ("QuestInfo", _BOOL),
+    "start_npc": ("Check", _INT),
+    "end_npc": ("Check", _INT),
+    "lvmin": ("Check", _INT),
+    "items": ("Check", _PAIRS),
+    "mobs": ("Check", _PAIRS),
+    "prereq": ("Check", _PAIRS),
+    "exp": ("Act", _INT),
+    "gain_items": ("Act", _PAIRS),
+    "lose_items": ("Act", _PAIRS),
+})
+
+_ID_COLUMNS = ("base_id", "new_id")
+_TRUE = {"1", "true", "yes", "y"}
+_FALSE = {"0", "false", "no", "n"}
+
+# Problems listed in a SpecError before the rest are cut off.
+MAX_ERRORS = 20
+
+
+class SpecError(ValueError):
+    """The spec file can't be read or has invalid rows; nothing was applied."""
+
+
+class CloneRow:
+    """One spec row: clone base_id into new_id with `overrides` ({field: value})."""
+
+    __slots__ = ("line", "base_id", "new_id", "overrides")
+
+    def __init__(self, line: int, base_id: int, new_id: int, overrides: dict):
+        self.line = line
+        self.base_id = base_id
+        self.new_id = new_id
+        self.overrides = overrides
+
+
+class PlannedClone:
+    """A row with the quest XML it will write, or why it can't be applied."""
+
+    __slots__ = ("row", "images", "error", "overwrites")
+
+    def __init__(self, row: CloneRow, images: Optional[dict] = None, error: str = "", overwrites: bool = False):
+        self.row = row
+        # {file kind: xml of the new quest, or None = not in that file}, for the loaded files
+        self.images = images
+        self.error = error
+        self.overwrites = overwrites
+
+
+# ---------------- Reading the spec ----------------
+
+
+def _parse_value(kind: str, value):
+    """Spec cell / JSON value → record value. None (JSON null) clears the field."""
+    if value is None:
+        return {_STR: "", _PAIRS: PairList()}.get(kind)
+    if kind == _PAIRS:
+        if isinstance(value, list):
+            try:
+                return PairList.from_pairs((int(a), int(b)) for a, b in value)
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError("expected [[id, count], ...]")
+        parts = [p for p in re.split(r"[;\n]", str(value)) if p.strip()]
+        pairs = PairList.parse("\n".join(parts))
+        if len(pairs) != len(parts):
+            raise ValueError(f"expected \"id count\" pairs, got {value!r}")
+        return pairs
+    if kind == _BOOL:
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+        raise ValueError(f"expected 1/0, got {value!r}")
+    if kind == _INT:
+        if isinstance(value, bool):
+            raise ValueError(f"expected a number, got {value!r}")
+        try:
+            return int(str(value).strip())
+        except ValueError:
+            raise ValueError(f"expected a number, got {value!r}")
+    return str(value)
+
+
+def _parse_id(value) -> int:
+    text = str(value).strip() if value is not None else ""
+    if not text.isdigit():
+        raise ValueError(f"expected a quest ID, got {value!r}")
+    return int(text)
+
+
+def _rows_from_file(path: str) -> List[tuple]:
+    """[(line or entry number, {column: value}, from_csv), ...]"""
+    try:
+        if path.lower().endswith(".json"):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                data = data.get("clones")
+            if not isinstance(data, list) or not all(isinstance(e, dict) for e in data):
+                raise SpecError('JSON spec must be a list of objects (or {"clones": [...]}).')
+            return [(n, entry, False) for n, entry in enumerate(data, 1)]
+
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            return [(reader.line_num, entry, True) for entry in reader]
+    except (OSError, UnicodeDecodeError, ValueError, csv.Error) as exc:
+        if isinstance(exc, SpecError):
+            raise
+        raise SpecError(f"Could not read {os.path.basename(path)}: {exc}") from exc
+
+
+def load_spec(path: str) -> List[CloneRow]:
+    """Read and check a CSV / JSON spec. Raises SpecError listing the bad rows."""
+    rows: List[CloneRow] = []
+    errors: List[str] = []
+    seen: Dict[int, int] = {}
+    where = "line" if not path.lower().endswith(".json") else "entry"
+
+    for line, entry, from_csv in _rows_from_file(path):
+        problems = []
+        if None in entry:
+            problems.append("more cells than header columns")
+        unknown = [
+            str(col) for col in entry
+            if col is not None and col not in FIELDS and col not in _ID_COLUMNS
+        ]
+        if unknown:
+            problems.append(f"unknown column(s) {', '.join(unknown)}")
+
+        ids = []
+        for col in _ID_COLUMNS:
+            try:
+                ids.append(_parse_id(entry.get(col)))
+            except ValueError as exc:
+                problems.append(f"{col}: {exc}")
+
+        overrides = {}
+        for col, value in entry.items():
+            if col not in FIELDS:
+                continue
+            if from_csv and (value is None or value.strip() == ""):
+                continue  # empty cell: keep the base value
+            try:
+                overrides[col] = _parse_value(FIELDS[col][1], value)
+            except ValueError as exc:
+                problems.append(f"{col}: {exc}")
+
+        if len(ids) == 2:
+            new_id = ids[1]
+            if new_id in seen:
+                problems.append(f"new_id {new_id} already used on {where} {seen[new_id]}")
+            seen[new_id] = line
+
+        if problems:
+            errors.append(f"{where} {line}: " + "; ".join(problems))
+        else:
+            rows.append(CloneRow(line, ids[0], ids[1], overrides))
+
+    if errors:
+        shown = errors[:MAX_ERRORS]
+        if len(errors) > MAX_ERRORS:
+            shown.append(f"… and {len(errors) - MAX_ERRORS} more")
+        raise SpecError("\n".join(shown))
+    if not rows:
+        raise SpecError("The spec has no rows.")
+    return rows
+
+
+# ---------------- Applying ----------------
+
+_SET_FIELDS = {
+    "QuestInfo": set_questinfo_fields,
+    "Check": set_requirement_fields,
+    "Act": set_reward_fields,
+}
+
+
+def plan_clones(rows: List[CloneRow], roots: Dict[str, Optional[object]]) -> List[PlannedClone]:
+    """
+    Build each row's quest in every loaded file: a deep copy of its base
+    quest with the overrides written on top. Nothing is written yet. A base
+    that is an earlier row's new_id is copied from that row's planned quest.
+    A row fails if its base is neither in QuestInfo nor planned.
+    """
+    questinfo_root = roots.get("QuestInfo")
+    if questinfo_root is None:
+        return [PlannedClone(row, error="QuestInfo is not loaded") for row in rows]
+    questinfo_index = get_index(questinfo_root)
+    loaded = {kind: root for kind, root in roots.items() if root is not None}
+
+    planned: Dict[int, dict] = {}  # new_id → {kind: node or None}, for chained bases
+    plans = []
+    for row in rows:
+        base = planned.get(row.base_id)
+        if base is None:
+            if row.base_id not in questinfo_index:
+                plans.append(PlannedClone(row, error=f"base quest {row.base_id} not found"))
+                continue
+            base = {kind: get_index(root).get(row.base_id) for kind, root in loaded.items()}
+
+        overrides: Dict[str, dict] = {}
+        for field, value in row.overrides.items():
+            overrides.setdefault(FIELDS[field][0], {})[field] = (
+                value.copy() if isinstance(value, PairList) else value
+            )
+        nodes = {}
+        for kind, node in base.items():
+            if node is not None:
+                node = copy_quest(node, row.new_id)
+            elif kind in overrides:
+                node = ET.Element("imgdir", {"name": str(row.new_id)})
+            if kind in overrides:
+                _SET_FIELDS[kind](node, overrides[kind])
+            nodes[kind] = node
+        planned[row.new_id] = nodes
+        plans.append(
+            PlannedClone(
+                row,
+                {
+                    kind: None if node is None else ET.tostring(node, encoding="utf-8")
+                    for kind, node in nodes.items()
+                },
+                overwrites=row.new_id != row.base_id and row.new_id in questinfo_index,
+            )
+        )
+    return plans
+
+
+def clone_images(plans: List[PlannedClone]) -> Dict[str, Dict[str, Optional[bytes]]]:
+    """{kind: {new quest name: xml or None}} of the plans that can be applied, in spec order."""
+    images: Dict[str, Dict[str, Optional[bytes]]] = {}
+    for plan in plans:
+        for kind, xml in (plan.images or {}).items():
+            images.setdefault(kind, {})[str(plan.row.new_id)] = xml
+    return images
+
+
+def apply_clones(plans: List[PlannedClone], roots: Dict[str, Optional[object]]) -> int:
+    """
+    Write every planned clone into the loaded trees, in spec order: each
+    new quest is set to its planned XML, and taken out of the files its
+    base is not in. Returns how many.
+    """
+    for kind, quests in clone_images(plans).items():
+        root = roots.get(kind)
+        if root is None:
+            continue
+        get_index(root).restore_all(quests)
+    return sum(1 for plan in plans if plan.images is not None)
+
+
+# ---------------- Report ----------------
+
+
+def build_report(spec_path: str, plans: List[PlannedClone], files: Dict[str, dict], seconds: Dict[str, float]) -> dict:
+    """
+    JSON-ready report. files: {kind: {"status": "saved" | "unchanged" |
+    "pending" | "failed" | "not loaded", "changed": n, "error": text}}.
+    """
+    rows = []
+    for plan in plans:
+        row = {"line": plan.row.line, "base_id": plan.row.base_id, "new_id": plan.row.new_id}
+        if plan.images is None:
+            row.update(status="failed", error=plan.error)
+        else:
+            row.update(status="cloned", overwritten=plan.overwrites, fields=sorted(plan.row.overrides))
+        rows.append(row)
+    cloned = sum(1 for plan in plans if plan.images is not None)
+    return {
+        "spec": os.path.abspath(spec_path),
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "summary": {
+            "rows": len(plans),
+            "cloned": cloned,
+            "failed": len(plans) - cloned,
+            "overwritten": sum(1 for plan in plans if plan.overwrites and plan.images is not None),
+        },
+        "seconds": {name: round(value, 3) for name, value in seconds.items()},
+        "files": files,
+        "rows": rows,
+    }
+
+
+def report_path(spec_path: str) -> str:
+    """Where the report of `spec_path` goes: next to it, <spec>.report.json."""
+    return os.path.splitext(spec_path)[0] + ".report.json"
+
+
+def write_report(path: str, report: dict):
+    data = json.dumps(report, indent=2, ensure_ascii=False).encode("utf-8")
+    atomic_file.write_atomic(path, lambda out: out.write(data))
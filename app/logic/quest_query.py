@@ -0,0 +1,433 @@
+# app/logic/quest_query.py
+"""
+Structured searches for the quest list, e.g.
+
+    lvmin:30..50 exp:>5000 npc:9010000 -name:test (area:20 OR area:30)
+
+Terms next to each other are ANDed; OR joins alternatives, NOT or a leading
+"-" negates, and parentheses group. Operators must be upper case so "or"
+can still be searched for.
+
+    npc: mob: item: prereq:          reverse index lookups (Check / Act)
+    lvmin: exp: area: order: id:     N, =N, >N, >=N, <N, <=N, A..B, A.., ..B
+    name:                            substring of the quest name
+    anything else                    a word: full-text hit or ID / name substring
+
+Values with spaces go in quotes: name:"blue potion".
+
+Evaluation goes through the indexes. An AND starts from its most
+selective term (smallest estimated result) and then either intersects the
+next term's result or, when that would be larger than what is left, tests
+the remaining candidates one by one. Nothing walks every quest unless the
+query has no indexed term to start from.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.xml.questinfo_helpers import QuestList
+from app.xml.reverse_index import (
+    EXP,
+    LVMIN,
+    SEARCH_PREFIXES,
+    SortedColumn,
+    peek_column,
+    peek_reverse_index,
+    reverse_search,
+)
+from app.xml.text_index import AREA, ORDER, TextIndex
+
+# Range field → (file kind, column). "id" ranges over the quest list itself.
+RANGE_FIELDS: Dict[str, Tuple[str, str]] = {
+    "lvmin": ("Check", LVMIN),
+    "exp": ("Act", EXP),
+    "area": ("QuestInfo", AREA),
+    "order": ("QuestInfo", ORDER),
+}
+
+_AND, _OR, _NOT, _OPEN, _CLOSE = "AND", "OR", "NOT", "(", ")"
+_OPERATORS = {_AND, _OR, _NOT}
+
+_TOKEN = re.compile(r'[()]|(?:[^\s()"]|"[^"]*"?)+')
+_COMPARISON = re.compile(r"(>=|<=|>|<|=)?(\d+)$")
+
+
+class QuerySyntaxError(ValueError):
+    """The search text looks like a query but cannot be parsed."""
+
+
+class QueryContext:
+    """What a query is evaluated against (captured for one search)."""
+
+    def __init__(self, quests: QuestList, roots: dict, text_index: Optional[TextIndex] = None):
+        self.quests = quests
+        self.roots = roots
+        self.text_index = text_index
+        self._universe: Optional[Set[int]] = None
+
+    @property
+    def universe(self) -> Set[int]:
+        """Every quest in the list (what NOT is taken against)."""
+        if self._universe is None:
+            self._universe = set(self.quests.ids)
+        return self._universe
+
+    def column(self, field: str) -> Optional[SortedColumn]:
+        kind, name = RANGE_FIELDS[field]
+        if kind == "QuestInfo":
+            return self.text_index.columns.get(name) if self.text_index is not None else None
+        return peek_column(self.roots.get(kind), name)
+
+    def name_matches(self, quest_id: int, text: str) -> bool:
+        name = self.quests.name_of(quest_id)
+        return name is not None and text in name.lower()
+
+
+# ---------------- Query nodes ----------------
+#
+# estimate() — expected result size, used to order AND terms
+# evaluate() — the matching quest IDs
+# test()     — does one quest match (used once candidates are few)
+
+
+class KeyTerm:
+    """npc:/mob:/item:/prereq: — a reverse index lookup."""
+
+    __slots__ = ("prefix", "key")
+
+    def __init__(self, prefix: str, key: int):
+        self.prefix = prefix
+        self.key = key
+
+    def _sets(self, ctx: QueryContext):
+        for kind, table in SEARCH_PREFIXES[self.prefix]:
+            reverse = peek_reverse_index(ctx.roots.get(kind))
+            if reverse is not None:
+                quests = reverse.tables[table].get(self.key)
+                if quests:
+                    yield quests
+
+    def estimate(self, ctx: QueryContext) -> int:
+        return sum(len(quests) for quests in self._sets(ctx))
+
+    def evaluate(self, ctx: QueryContext) -> Set[int]:
+        return reverse_search(ctx.roots, self.prefix, self.key)
+
+    def test(self, ctx: QueryContext, quest_id: int) -> bool:
+        return any(quest_id in quests for quests in self._sets(ctx))
+
+
+class RangeTerm:
+    """lvmin:/exp:/area:/order:/id: — a sorted column range."""
+
+    __slots__ = ("field", "low", "high")
+
+    def __init__(self, field: str, low: Optional[int], high: Optional[int]):
+        self.field = field
+        self.low = low
+        self.high = high
+
+    def _id_bounds(self, ctx: QueryContext) -> Tuple[int, int]:
+        ids = ctx.quests.ids
+        start = 0 if self.low is None else bisect_left(ids, self.low)
+        end = len(ids) if self.high is None else bisect_right(ids, self.high)
+        return start, max(start, end)
+
+    def estimate(self, ctx: QueryContext) -> int:
+        if self.field == "id":
+            start, end = self._id_bounds(ctx)
+            return end - start
+        column = ctx.column(self.field)
+        return column.count(self.low, self.high) if column is not None else 0
+
+    def evaluate(self, ctx: QueryContext) -> Set[int]:
+        if self.field == "id":
+            start, end = self._id_bounds(ctx)
+            return set(ctx.quests.ids[start:end])
+        column = ctx.column(self.field)
+        return column.range(self.low, self.high) if column is not None else set()
+
+    def test(self, ctx: QueryContext, quest_id: int) -> bool:
+        if self.field == "id":
+            return (self.low is None or quest_id >= self.low) and (
+                self.high is None or quest_id <= self.high
+            )
+        column = ctx.column(self.field)
+        return column is not None and column.contains(quest_id, self.low, self.high)
+
+
+class NameTerm:
+    """name: — substring of the quest name (no index, so always a scan)."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def estimate(self, ctx: QueryContext) -> int:
+        return len(ctx.quests)
+
+    def evaluate(self, ctx: QueryContext) -> Set[int]:
+        text = self.text
+        return {qid for qid, name in ctx.quests if text in name.lower()}
+
+    def test(self, ctx: QueryContext, quest_id: int) -> bool:
+        return ctx.name_matches(quest_id, self.text)
+
+
+class WordTerm:
+    """
+    A bare word: what the search box matches without a query — full-text
+    hits plus quests whose ID or name contains it.
+    """
+
+    __slots__ = ("text", "_hits")
+
+    def __init__(self, text: str):
+        self.text = text
+        self._hits: Optional[Set[int]] = None
+
+    def _text_hits(self, ctx: QueryContext) -> Set[int]:
+        if self._hits is None:
+            self._hits = set()
+            if ctx.text_index is not None and not self.text.isdigit():
+                self._hits = {qid for qid, _score in ctx.text_index.search(self.text)}
+        return self._hits
+
+    def estimate(self, ctx: QueryContext) -> int:
+        return len(ctx.quests)
+
+    def evaluate(self, ctx: QueryContext) -> Set[int]:
+        text = self.text
+        out = set(self._text_hits(ctx))
+        out.update(qid for qid, name in ctx.quests if text in str(qid) or text in name.lower())
+        return out
+
+    def test(self, ctx: QueryContext, quest_id: int) -> bool:
+        return (
+            quest_id in self._text_hits(ctx)
+            or self.text in str(quest_id)
+            or ctx.name_matches(quest_id, self.text)
+        )
+
+
+class Not:
+    __slots__ = ("child",)
+
+    def __init__(self, child):
+        self.child = child
+
+    def estimate(self, ctx: QueryContext) -> int:
+        return max(len(ctx.quests) - self.child.estimate(ctx), 0)
+
+    def evaluate(self, ctx: QueryContext) -> Set[int]:
+        return ctx.universe - self.child.evaluate(ctx)
+
+    def test(self, ctx: QueryContext, quest_id: int) -> bool:
+        return not self.child.test(ctx, quest_id)
+
+
+class And:
+    __slots__ = ("children",)
+
+    def __init__(self, children: list):
+        self.children = children
+
+    def estimate(self, ctx: QueryContext) -> int:
+        return min(child.estimate(ctx) for child in self.children)
+
+    def evaluate(self, ctx: QueryContext) -> Set[int]:
+        # Negations subtract from (or filter) what the positive terms left.
+        positive = [c for c in self.children if not isinstance(c, Not)]
+        negative = [c.child for c in self.children if isinstance(c, Not)]
+
+        if positive:
+            ranked = sorted((child.estimate(ctx), n, child) for n, child in enumerate(positive))
+            result = set(ranked[0][2].evaluate(ctx))
+            for estimate, _n, child in ranked[1:]:
+                if not result:
+                    return result
+                if estimate <= len(result):
+                    result &= child.evaluate(ctx)
+                else:
+                    result = {qid for qid in result if child.test(ctx, qid)}
+        else:
+            result = set(ctx.universe)
+
+        for child in negative:
+            if not result:
+                break
+            if child.estimate(ctx) <= len(result):
+                result -= child.evaluate(ctx)
+            else:
+                result = {qid for qid in result if not child.test(ctx, qid)}
+        return result
+
+    def test(self, ctx: QueryContext, quest_id: int) -> bool:
+        return all(child.test(ctx, quest_id) for child in self.children)
+
+
+class Or:
+    __slots__ = ("children",)
+
+    def __init__(self, children: list):
+        self.children = children
+
+    def estimate(self, ctx: QueryContext) -> int:
+        return min(sum(child.estimate(ctx) for child in self.children), len(ctx.quests))
+
+    def evaluate(self, ctx: QueryContext) -> Set[int]:
+        out: Set[int] = set()
+        for child in self.children:
+            out |= child.evaluate(ctx)
+        return out
+
+    def test(self, ctx: QueryContext, quest_id: int) -> bool:
+        return any(child.test(ctx, quest_id) for child in self.children)
+
+
+# ---------------- Parsing ----------------
+
+
+def _unquote(text: str) -> str:
+    return text.replace('"', "")
+
+
+def parse_range(text: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    "30..50" → (30, 50), ">5000" → (5001, None), "<=40" → (None, 40),
+    "20" → (20, 20). Bounds are inclusive; None means unbounded.
+    """
+    low, sep, high = text.partition("..")
+    if sep:
+        low, high = low.strip(), high.strip()
+        if (low and not low.isdigit()) or (high and not high.isdigit()) or not (low or high):
+            raise QuerySyntaxError(f"Bad range '{text}'")
+        return (int(low) if low else None), (int(high) if high else None)
+
+    match = _COMPARISON.match(text.strip())
+    if match is None:
+        raise QuerySyntaxError(f"Bad number '{text}'")
+    op, value = match.group(1) or "=", int(match.group(2))
+    return {
+        "=": (value, value),
+        ">": (value + 1, None),
+        ">=": (value, None),
+        "<": (None, value - 1),
+        "<=": (None, value),
+    }[op]
+
+
+def _term(word: str):
+    field, sep, value = word.partition(":")
+    field = field.lower()
+    if not sep or not (field in SEARCH_PREFIXES or field in RANGE_FIELDS or field in ("id", "name")):
+        return WordTerm(_unquote(word).lower())
+
+    value = _unquote(value).strip()
+    if not value:
+        raise QuerySyntaxError(f"{field}: needs a value")
+    if field in SEARCH_PREFIXES:
+        if not value.isdigit():
+            raise QuerySyntaxError(f"{field}: takes an ID, not '{value}'")
+        return KeyTerm(field, int(value))
+    if field == "name":
+        return NameTerm(value.lower())
+    return RangeTerm(field, *parse_range(value))
+
+
+def _tokens(text: str) -> list:
+    out = []
+    for token in _TOKEN.findall(text):
+        if token in (_OPEN, _CLOSE) or token in _OPERATORS:
+            out.append(token)
+        elif token == "-":
+            out.append(_NOT)
+        elif token.startswith("-"):
+            out.extend((_NOT, _term(token[1:])))
+        else:
+            out.append(_term(token))
+    return out
+
+
+class _Parser:
+    """or := and (OR and)* ; and := not ([AND] not)* ; not := NOT not | atom"""
+
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self._or()
+        if self._peek() is not None:
+            raise QuerySyntaxError("Unmatched ')'")
+        return node
+
+    def _or(self):
+        nodes = [self._and()]
+        while self._peek() == _OR:
+            self._next()
+            nodes.append(self._and())
+        return nodes[0] if len(nodes) == 1 else Or(nodes)
+
+    def _and(self):
+        nodes = [self._not()]
+        while self._peek() not in (None, _OR, _CLOSE):
+            if self._peek() == _AND:
+                self._next()
+            nodes.append(self._not())
+        return nodes[0] if len(nodes) == 1 else And(nodes)
+
+    def _not(self):
+        if self._peek() == _NOT:
+            self._next()
+            return Not(self._not())
+        return self._atom()
+
+    def _atom(self):
+        token = self._next()
+        if token is None:
+            raise QuerySyntaxError("Query ends too early")
+        if token == _OPEN:
+            node = self._or()
+            if self._next() != _CLOSE:
+                raise QuerySyntaxError("Missing ')'")
+            return node
+        if isinstance(token, str):
+            raise QuerySyntaxError(f"Unexpected '{token}'")
+        return token
+
+
+def parse_query(text: str):
+    """
+    Parse search box text. Returns None when it is plain words (the ranked
+    word search handles those), otherwise the query tree. Raises
+    QuerySyntaxError for malformed queries.
+    """
+    tokens = _tokens(text or "")
+    if all(isinstance(token, WordTerm) for token in tokens):
+        return None
+    return _Parser(tokens).parse()
+
+
+def is_query(text: str) -> bool:
+    """True if `text` is a structured query (valid or not)."""
+    try:
+        return parse_query(text) is not None
+    except QuerySyntaxError:
+        return True
+
+
+def run_query(query, ctx: QueryContext) -> List[int]:
+    """Positions (into ctx.quests) of the quests matching `query`, in ID order."""
+    positions = map(ctx.quests.position, query.evaluate(ctx))
+    return sorted(pos for pos in positions if pos >= 0)
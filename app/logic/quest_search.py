@@ -0,0 +1,245 @@
+# app/logic/quest_search.py
+"""
+Quest list filtering, independent of Qt so it can run on a worker thread.
+
+search_rows() turns a filter string into the list rows to show (positions
+into the QuestList), handing them out in chunks as they are found and
+checking a cancel flag in between. rx: searches run through
+app.logic.regex_search under a time budget. Structured queries (npc:, lvmin:30..50,
+OR, ...) go through app.logic.quest_query; plain words keep the ranked
+word search, followed by fuzzy name matches for typos and odd spacing.
+When plain words only extend the previous filter, the previous rows are
+used as the candidates for the exact matches instead of scanning every
+quest again.
+"""
+
+import threading
+from array import array
+from typing import Callable, Optional
+
+from app.logic.quest_query import QueryContext, QuerySyntaxError, parse_query, run_query
+from app.logic.regex_search import RegexScanner, RegexSearchError, parse_regex
+from app.xml.questinfo_helpers import QuestList
+from app.xml.text_index import MIN_PREFIX, tokenize
+
+# Rows per chunk handed to the list, and quests scanned between cancel checks.
+CHUNK_ROWS = 2000
+
+
+class SearchRequest:
+    """Everything one search needs, captured on the GUI thread."""
+
+    __slots__ = ("raw", "text", "quests", "check_root", "act_root", "text_index", "previous")
+
+    def __init__(self, text, quests, check_root=None, act_root=None, text_index=None, previous=None):
+        self.raw = (text or "").strip()  # queries need the case of AND / OR / NOT
+        self.text = self.raw.lower()
+        self.quests: QuestList = quests
+        self.check_root = check_root
+        self.act_root = act_root
+        self.text_index = text_index
+        self.previous: Optional["SearchResult"] = previous
+
+
+class SearchResult:
+    """
+    Rows a finished search produced. `ordered` is True when the rows are in
+    ID order (everything except ranked full-text hits). `query` is True for
+    structured queries, `error` says why one could not be parsed.
+    """
+
+    __slots__ = ("text", "quests", "rows", "ordered", "text_indexed", "query", "error")
+
+    def __init__(
+        self,
+        text: str,
+        quests: QuestList,
+        rows: array,
+        ordered: bool,
+        text_indexed: bool,
+        query: bool = False,
+        error: Optional[str] = None,
+    ):
+        self.text = text
+        self.quests = quests
+        self.rows = rows
+        self.ordered = ordered
+        self.text_indexed = text_indexed
+        self.query = query
+        self.error = error
+
+
+def _narrower_words(old: str, new: str) -> bool:
+    """
+    True if the full-text words of `new` match a subset of those of `old`.
+    Words shorter than MIN_PREFIX only match whole words, so "s" → "sl"
+    widens the search even though the text got longer.
+    """
+    if old.isdigit() or new.isdigit():
+        return old.isdigit() and new.isdigit()  # neither uses the text index
+    old_terms, new_terms = tokenize(old), tokenize(new)
+    if not old_terms:
+        return not new_terms
+    if len(new_terms) < len(old_terms) or new_terms[:len(old_terms) - 1] != old_terms[:-1]:
+        return False
+    last, grown = old_terms[-1], new_terms[len(old_terms) - 1]
+    return grown == last or (len(last) >= MIN_PREFIX and grown.startswith(last))
+
+
+def narrows(previous: Optional[SearchResult], request: SearchRequest) -> bool:
+    """
+    True if plain-word `request` can only match a subset of `previous`:
+    same quest list and indexes, and plain words that extend the old ones.
+    """
+    return (
+        previous is not None
+        and not previous.query
+        and previous.quests is request.quests
+        and previous.text_indexed == (request.text_index is not None)
+        and bool(previous.text)
+        and request.text.startswith(previous.text)
+        and (not previous.text_indexed or _narrower_words(previous.text, request.text))
+    )
+
+
+def _regex_items(request: SearchRequest, fields) -> list:
+    """(position, texts) pairs for an rx: search; fields None = "id: name"."""
+    quests = request.quests
+    if fields is None:
+        return [(pos, (f"{qid}: {name}",)) for pos, (qid, name) in enumerate(quests)]
+    if request.text_index is None:
+        return []
+    strings = request.text_index.strings
+    items = []
+    for pos, qid in enumerate(quests.ids):
+        quest_strings = strings.get(qid)
+        if quest_strings:
+            texts = tuple(t for t in map(quest_strings.get, fields) if t)
+            if texts:
+                items.append((pos, texts))
+    return items
+
+
+def search_rows(
+    request: SearchRequest,
+    cancel: threading.Event,
+    emit: Callable[[array], None],
+    scanner: Optional[RegexScanner] = None,
+) -> Optional[SearchResult]:
+    """
+    Compute the rows for `request`, passing them to emit() in chunks as they
+    are found. Returns the full result, or None if cancelled. rx: searches
+    use `scanner` (a temporary one if None).
+    """
+    quests = request.quests
+    filt = request.text
+    text_indexed = request.text_index is not None
+    rows = array("i")
+
+    def flush(chunk: array):
+        rows.extend(chunk)
+        emit(chunk)
+
+    # rx: searches: regex over "id: name" or text fields, in ID order.
+    try:
+        regex = parse_regex(request.raw)
+    except RegexSearchError as exc:
+        return SearchResult(filt, quests, rows, True, text_indexed, query=True, error=str(exc))
+    if regex is not None:
+        fields, pattern = regex
+
+        def found(positions):
+            if positions:
+                flush(array("i", positions))
+
+        own_scanner = scanner is None
+        if own_scanner:
+            scanner = RegexScanner()
+        try:
+            complete = scanner.scan(pattern, _regex_items(request, fields), cancel, found)
+        except RegexSearchError as exc:
+            return SearchResult(filt, quests, rows, True, text_indexed, query=True, error=str(exc))
+        finally:
+            if own_scanner:
+                scanner.close()
+        if complete is None:
+            return None
+        error = None if complete else (
+            f"rx: stopped after {scanner.budget:g} s, showing the {len(rows)} matches found so far"
+        )
+        return SearchResult(filt, quests, rows, True, text_indexed, query=True, error=error)
+
+    # Structured queries go through the indexes, results in ID order.
+    try:
+        query = parse_query(request.raw)
+    except QuerySyntaxError as exc:
+        return SearchResult(filt, quests, rows, True, text_indexed, query=True, error=str(exc))
+    if query is not None:
+        ctx = QueryContext(
+            quests,
+            {"Check": request.check_root, "Act": request.act_root},
+            request.text_index,
+        )
+        positions = run_query(query, ctx)
+        for i in range(0, len(positions), CHUNK_ROWS):
+            if cancel.is_set():
+                return None
+            flush(array("i", positions[i:i + CHUNK_ROWS]))
+        return SearchResult(filt, quests, rows, True, text_indexed, query=True)
+
+    candidates = None
+    if narrows(request.previous, request):
+        candidates = sorted(request.previous.rows)
+
+    # Word searches: full-text hits first, best ranked on top, then any
+    # other ID / name substring matches in ID order.
+    shown = set()
+    if not filt.isdigit() and request.text_index is not None:
+        within = None if candidates is None else [quests.ids[p] for p in candidates]
+        ranked = array("i")
+        for qid, _score in request.text_index.search(filt, within=within):
+            pos = quests.position(qid)
+            if pos >= 0:
+                ranked.append(pos)
+                shown.add(pos)
+        for i in range(0, len(ranked), CHUNK_ROWS):
+            if cancel.is_set():
+                return None
+            flush(ranked[i:i + CHUNK_ROWS])
+
+    ids, names = quests.ids, quests.names
+    ranked = bool(shown)
+    scan = range(len(quests)) if candidates is None else candidates
+    chunk = array("i")
+    for n, pos in enumerate(scan):
+        if n % CHUNK_ROWS == 0 and cancel.is_set():
+            return None
+        if pos in shown:
+            continue
+        if filt in str(ids[pos]) or filt in names[pos].lower():
+            chunk.append(pos)
+            shown.add(pos)
+            if len(chunk) >= CHUNK_ROWS:
+                flush(chunk)
+                chunk = array("i")
+    if chunk:
+        flush(chunk)
+
+    # Fuzzy name matches last, most similar first. Not narrowed: a longer
+    # query can fuzzy-match names the shorter one did not.
+    if not filt.isdigit() and request.text_index is not None:
+        if cancel.is_set():
+            return None
+        fuzzy = array("i")
+        for qid, _similarity in request.text_index.names.search(filt):
+            pos = quests.position(qid)
+            if pos >= 0 and pos not in shown:
+                fuzzy.append(pos)
+        if fuzzy:
+            ranked = True
+            for i in range(0, len(fuzzy), CHUNK_ROWS):
+                if cancel.is_set():
+                    return None
+                flush(fuzzy[i:i + CHUNK_ROWS])
+
+    return SearchResult(filt, quests, rows, not ranked, text_indexed)
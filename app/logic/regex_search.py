@@ -0,0 +1,202 @@
+# app/logic/regex_search.py
+"""
+rx: searches — regular expressions over quest text, as in the v1 tool.
+
+    rx:<pattern>            "id: name" lines (the v1 behaviour)
+    rx.<field>:<pattern>    one text field: name, summary, reward, demand,
+                            log (any of the three log texts), type, parent,
+                            or text (all of them)
+
+Everything after the first ':' is the pattern, spaces included; matching
+ignores case. Compiled patterns are kept in a small LRU.
+
+Python's re cannot be interrupted and holds the GIL while it matches, so a
+pattern with catastrophic backtracking would freeze the whole editor even
+on a worker thread. RegexScanner therefore matches in a child process, one
+chunk of quests at a time, under a time budget. When the budget runs out
+(or the search is cancelled) the child is killed and the matches found so
+far are returned as a partial result.
+
+This module is imported by that child, so it must stay free of Qt / XML
+imports.
+"""
+
+import multiprocessing
+import re
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# rx.<field> → <string name="..."> fields searched (see text_index.FIELD_WEIGHTS).
+REGEX_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "name": ("name",),
+    "summary": ("summary",),
+    "reward": ("rewardSummary",),
+    "demand": ("demandSummary",),
+    "log": ("0", "1", "2"),
+    "type": ("type",),
+    "parent": ("parent",),
+    "text": ("name", "summary", "rewardSummary", "demandSummary", "0", "1", "2", "type", "parent"),
+}
+
+PATTERN_CACHE_SIZE = 64
+
+# Seconds a single rx: search may take before it stops with what it has.
+TIME_BUDGET = 2.0
+
+# Quests sent to the child per round trip; also how often the budget is checked.
+CHUNK_QUESTS = 1000
+
+_POLL_SECONDS = 0.05
+
+# Spawn everywhere (Windows has nothing else): forking the GUI process with
+# its Qt and worker threads running is not safe.
+_MP = multiprocessing.get_context("spawn")
+
+# (key, texts) — the key comes back when any of the texts matches.
+Item = Tuple[int, Tuple[str, ...]]
+
+
+class RegexSearchError(ValueError):
+    """Bad rx: search (unknown field or invalid pattern)."""
+
+
+def parse_regex(text: str) -> Optional[Tuple[Optional[Tuple[str, ...]], str]]:
+    """
+    "rx.log:^kill" → (("0", "1", "2"), "^kill"); plain "rx:..." gives None
+    for the fields ("id: name" lines). Returns None if `text` is not an rx:
+    search.
+    """
+    head, sep, pattern = (text or "").partition(":")
+    head = head.strip().lower()
+    if not sep or not (head == "rx" or head.startswith("rx.")):
+        return None
+    pattern = pattern.strip()
+    field = head[3:]
+    if not field:
+        return None, pattern
+    if field not in REGEX_FIELDS:
+        raise RegexSearchError(f"Unknown rx field '{field}' (use {', '.join(REGEX_FIELDS)})")
+    return REGEX_FIELDS[field], pattern
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern: str) -> "re.Pattern":
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error as exc:
+        raise RegexSearchError(f"Bad regex: {exc}") from None
+
+
+def match_items(pattern: str, items: Sequence[Item]) -> List[int]:
+    """Keys of the items with a text matching `pattern`."""
+    search = compile_pattern(pattern).search
+    return [key for key, texts in items if any(search(t) for t in texts)]
+
+
+def _serve(conn):
+    """Child process loop: (pattern, items) in, matching keys out."""
+    conn.send(True)  # ready
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        conn.send(match_items(*job))
+
+
+class RegexScanner:
+    """
+    Runs match_items() in a child process that can be killed. The process
+    is started on first use and kept for later searches (the pattern LRU
+    lives there too); it is restarted after being killed.
+    """
+
+    def __init__(self, budget: float = TIME_BUDGET):
+        self.budget = budget
+        self._process = None
+        self._conn = None
+
+    def _ensure_started(self, cancel) -> bool:
+        """
+        Start the child if needed and wait until it is ready; start-up does
+        not count against the time budget. False if cancelled or it died.
+        """
+        if self._process is not None and self._process.is_alive():
+            return True
+        self._kill()
+        parent, child = _MP.Pipe()
+        self._process = _MP.Process(
+            target=_serve, args=(child,), name="quest-regex", daemon=True
+        )
+        self._process.start()
+        child.close()
+        self._conn = parent
+        try:
+            while not parent.poll(_POLL_SECONDS):
+                if cancel.is_set() or not self._process.is_alive():
+                    self._kill()
+                    return False
+            parent.recv()
+        except (EOFError, OSError):
+            self._kill()
+            return False
+        return True
+
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join(1.0)
+            self._conn.close()
+            self._process = self._conn = None
+
+    def close(self):
+        """Stop the child process (politely if it is idle)."""
+        if self._process is not None:
+            try:
+                self._conn.send(None)
+                self._process.join(0.5)
+            except OSError:
+                pass
+            self._kill()
+
+    def scan(
+        self,
+        pattern: str,
+        items: Sequence[Item],
+        cancel,
+        found: Callable[[List[int]], None],
+    ) -> Optional[bool]:
+        """
+        Match `items` chunk by chunk, passing each chunk's matching keys to
+        found(). Returns True when everything was scanned, False when the
+        time budget ran out first, None if `cancel` (a threading.Event) was
+        set. Raises RegexSearchError for a bad pattern.
+        """
+        compile_pattern(pattern)  # report bad patterns here, not in the child
+        if not self._ensure_started(cancel):
+            return None if cancel.is_set() else False
+
+        deadline = time.monotonic() + self.budget
+        for start in range(0, len(items), CHUNK_QUESTS):
+            if cancel.is_set():
+                return None
+            if time.monotonic() >= deadline:
+                return False
+            try:
+                self._conn.send((pattern, items[start:start + CHUNK_QUESTS]))
+                while not self._conn.poll(_POLL_SECONDS):
+                    if cancel.is_set():
+                        self._kill()
+                        return None
+                    if time.monotonic() >= deadline:
+                        self._kill()
+                        return False
+                matches = self._conn.recv()
+            except (EOFError, OSError):  # the child died
+                self._kill()
+                return False
+            found(matches)
+        return True
@@ -0,0 +1,62 @@
+# app/ui/changeset_panel.py
+from PySide6.QtWidgets import (
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QListWidget,
+    QPushButton,
+)
+
+
+class ChangesetPanel(QWidget):
+    """
+    Pending changes of a transaction (see QuestEditorWindow's transaction
+    mode):
+    - one line per clone / delete, in the order they were made
+    - changed quests per file
+    - Commit / Rollback buttons
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.setSpacing(4)
+
+        self.edit_list = QListWidget(self)
+        self.files_label = QLabel(self)
+        self.files_label.setWordWrap(True)
+
+        buttons = QHBoxLayout()
+        self.commit_button = QPushButton("Commit", self)
+        self.rollback_button = QPushButton("Rollback", self)
+        buttons.addStretch(1)
+        buttons.addWidget(self.commit_button)
+        buttons.addWidget(self.rollback_button)
+
+        layout.addWidget(self.edit_list)
+        layout.addWidget(self.files_label)
+        layout.addLayout(buttons)
+
+        self.set_changes([], {})
+
+    def set_changes(self, edits: list[str], pending: dict):
+        """edits: one description per edit; pending: {file kind: changed quest IDs}."""
+        self.edit_list.clear()
+        self.edit_list.addItems(edits)
+
+        parts = [
+            f"{kind}: {len(ids)} quest(s)"
+            + (f" ({', '.join(ids[:10])}{' …' if len(ids) > 10 else ''})" if ids else "")
+            for kind, ids in pending.items()
+        ]
+        if any(pending.values()):
+            self.files_label.setText("Pending — " + " · ".join(parts))
+        else:
+            self.files_label.setText("No pending changes.")
+
+        has_changes = bool(edits) or any(pending.values())
+        self.commit_button.setEnabled(has_changes)
+        self.rollback_button.setEnabled(has_changes)
@@ -1,5 +1,9 @@
+from typing import Optional
+
 from PySide6.QtWidgets import QWidget, QFormLayout, QLineEdit, QTextEdit
 
+from app.xml.records import QuestInfo
+
 
 class QuestInfoForm(QWidget):
     """
@@ -43,26 +47,26 @@ class QuestInfoForm(QWidget):
         for w in (self.summary_edit, self.reward_summary_edit):
             w.setReadOnly(read_only)
 
-    def set_data(self, data: dict):
+    def set_data(self, data: Optional[QuestInfo], quest_id=""):
         """
-        Fill form from a dict like:
-        {
-          "id": "1000",
-          "name": "Quest Name",
-          "summary": "...",
-          "rewardSummary": "..."
-        }
+        Fill form from a QuestInfo record (None clears it). quest_id goes
+        into the ID field as-is.
         """
-        self.quest_id_edit.setText(str(data.get("id", "")))
-        self.quest_name_edit.setText(data.get("name", ""))
-        self.summary_edit.setPlainText(data.get("summary", ""))
-        self.reward_summary_edit.setPlainText(data.get("rewardSummary", ""))
+        if data is None:
+            data = QuestInfo()
+        self.quest_id_edit.setText(str(quest_id))
+        self.quest_name_edit.setText(data.name)
+        self.summary_edit.setPlainText(data.summary)
+        self.reward_summary_edit.setPlainText(data.reward_summary)
+
+    def quest_id_text(self) -> str:
+        """Raw ID field text (may hold several IDs)."""
+        return self.quest_id_edit.text().strip()
 
-    def to_data(self) -> dict:
-        """Return the form content as a dict."""
-        return {
-            "id": self.quest_id_edit.text().strip(),
-            "name": self.quest_name_edit.text().strip(),
-            "summary": self.summary_edit.toPlainText(),
-            "rewardSummary": self.reward_summary_edit.toPlainText(),
-        }
+    def to_data(self) -> QuestInfo:
+        """Return the form content as a QuestInfo record."""
+        return QuestInfo(
+            name=self.quest_name_edit.text().strip(),
+            summary=self.summary_edit.toPlainText(),
+            reward_summary=self.reward_summary_edit.toPlainText(),
+        )
@@ -1,5 +1,9 @@
+from typing import Optional
+
 from PySide6.QtWidgets import QWidget, QFormLayout, QLineEdit, QTextEdit
 
+from app.xml.records import PairList, Requirements, format_int, parse_int
+
 
 class RequirementsForm(QWidget):
     """
@@ -44,20 +48,22 @@ class RequirementsForm(QWidget):
         for w in (self.items_text, self.mobs_text, self.prereq_text):
             w.setReadOnly(read_only)
 
-    def set_data(self, data: dict):
-        self.start_npc_edit.setText(str(data.get("startNpc", "")))
-        self.end_npc_edit.setText(str(data.get("endNpc", "")))
-        self.level_min_edit.setText(str(data.get("lvmin", "")))
-        self.items_text.setPlainText(data.get("items", ""))
-        self.mobs_text.setPlainText(data.get("mobs", ""))
-        self.prereq_text.setPlainText(data.get("prereq", ""))
-
-    def to_data(self) -> dict:
-        return {
-            "startNpc": self.start_npc_edit.text().strip(),
-            "endNpc": self.end_npc_edit.text().strip(),
-            "lvmin": self.level_min_edit.text().strip(),
-            "items": self.items_text.toPlainText(),
-            "mobs": self.mobs_text.toPlainText(),
-            "prereq": self.prereq_text.toPlainText(),
-        }
+    def set_data(self, data: Optional[Requirements]):
+        if data is None:
+            data = Requirements()
+        self.start_npc_edit.setText(format_int(data.start_npc))
+        self.end_npc_edit.setText(format_int(data.end_npc))
+        self.level_min_edit.setText(format_int(data.lvmin))
+        self.items_text.setPlainText(data.items.format())
+        self.mobs_text.setPlainText(data.mobs.format())
+        self.prereq_text.setPlainText(data.prereq.format())
+
+    def to_data(self) -> Requirements:
+        return Requirements(
+            start_npc=parse_int(self.start_npc_edit.text()),
+            end_npc=parse_int(self.end_npc_edit.text()),
+            lvmin=parse_int(self.level_min_edit.text()),
+            items=PairList.parse(self.items_text.toPlainText()),
+            mobs=PairList.parse(self.mobs_text.toPlainText()),
+            prereq=PairList.parse(self.prereq_text.toPlainText()),
+        )
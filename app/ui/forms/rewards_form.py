@@ -1,5 +1,9 @@
+from typing import Optional
+
 from PySide6.QtWidgets import QWidget, QFormLayout, QLineEdit, QTextEdit
 
+from app.xml.records import PairList, Rewards, format_int, parse_int
+
 
 class RewardsForm(QWidget):
     """
@@ -32,14 +36,16 @@ class RewardsForm(QWidget):
         self.gain_items_text.setReadOnly(read_only)
         self.lose_items_text.setReadOnly(read_only)
 
-    def set_data(self, data: dict):
-        self.exp_edit.setText(str(data.get("exp", "")))
-        self.gain_items_text.setPlainText(data.get("gainItems", ""))
-        self.lose_items_text.setPlainText(data.get("loseItems", ""))
-
-    def to_data(self) -> dict:
-        return {
-            "exp": self.exp_edit.text().strip(),
-            "gainItems": self.gain_items_text.toPlainText(),
-            "loseItems": self.lose_items_text.toPlainText(),
-        }
+    def set_data(self, data: Optional[Rewards]):
+        if data is None:
+            data = Rewards()
+        self.exp_edit.setText(format_int(data.exp))
+        self.gain_items_text.setPlainText(data.gain_items.format())
+        self.lose_items_text.setPlainText(data.lose_items.format())
+
+    def to_data(self) -> Rewards:
+        return Rewards(
+            exp=parse_int(self.exp_edit.text()),
+            gain_items=PairList.parse(self.gain_items_text.toPlainText()),
+            lose_items=PairList.parse(self.lose_items_text.toPlainText()),
+        )
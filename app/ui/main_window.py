@@ -1,6 +1,7 @@
 # app/ui/main_window.py
 import os
 import re
+import time
 
 from PySide6.QtWidgets import (
     QMainWindow,
@@ -11,16 +12,20 @@ from PySide6.QtWidgets import (
     QToolBar,
     QMessageBox,
     QFileDialog,
-    QListWidgetItem,
     QApplication,
+    QProgressBar,
+    QPushButton,
+    QInputDialog,
+    QDockWidget,
 )
-from PySide6.QtGui import QAction, QActionGroup
-from PySide6.QtCore import Qt, QFile, QTextStream
+from PySide6.QtGui import QAction, QActionGroup, QKeySequence
+from PySide6.QtCore import Qt, QFile, QTextStream, QTimer
 
-from app.core.settings import get_default_paths
-from app.xml import xml_loader
+from app.core.settings import get_default_paths, LARGE_FILE_MIN_BYTES
+from app.xml import backup_store, edit_journal, undo_stack, xml_loader
 from app.xml.questinfo_helpers import (
-    get_all_quest_ids,
+    QuestList,
+    build_quest_list,
     extract_questinfo,
     apply_questinfo,
 )
@@ -32,11 +37,23 @@ from app.xml.act_helpers import (
     extract_rewards,
     apply_rewards,
 )
-from app.xml.xml_loader import save_xml, backup
+from app.xml.xml_loader import pending_changes
+from app.xml.quest_index import drop_index, get_index
+from app.logic import bulk_clone
+from app.logic.quest_query import is_query
+from app.logic.quest_search import SearchRequest
+from app.xml.text_index import peek_text_index
 
 from .quest_list_panel import QuestListPanel
 from .middle_actions_panel import MiddleActionsPanel
 from .quest_editor_panel import QuestEditorPanel
+from .xml_load_job import XmlLoadJob
+from .xml_save_job import XmlSaveJob
+from .quest_search_job import QuestSearchJob
+from .changeset_panel import ChangesetPanel
+
+# Pause after the last keystroke before the quest search runs.
+SEARCH_DEBOUNCE_MS = 150
 
 
 class QuestEditorWindow(QMainWindow):
@@ -68,14 +85,53 @@ class QuestEditorWindow(QMainWindow):
         self.act_root = None
 
         self.current_base_quest_id: int | None = None
-        self.all_quests: list[tuple[int, str]] = []
+        self.all_quests = QuestList()
+        # Set while the list re-selects the base quest after a refresh.
+        self._restoring_selection = False
+
+        # Search box: typing restarts the debounce timer; the search itself
+        # runs on QuestSearchJob's worker and streams rows into the list.
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._search_job = QuestSearchJob(self)
+        self._last_search = None  # SearchResult of the last finished search
+        self._scroll_to_selection = False
+
+        # Background parse of the three XMLs (see _start_load_job)
+        self._load_job: XmlLoadJob | None = None
+
+        # Background save (see _save_changed_files). Clone / delete wait in
+        # _queued_edits while it runs; closing waits for both.
+        self._save_job: XmlSaveJob | None = None
+        self._queued_edits: list = []
+        self._close_after_save = False
+
+        # Transaction mode: clone / delete only change the trees in memory;
+        # Commit saves each changed file once, Rollback undoes them (see
+        # QuestIndex.begin). One line per edit for the changeset panel.
+        self._transaction_edits: list[str] = []
+
+        # Write-ahead log of clone / delete in the data folder (edit_journal);
+        # replayed or rolled back after loading if a session died unsaved.
+        self._journal: edit_journal.EditJournal | None = None
+
+        # Undo / redo: per-quest before / after XML of each clone / delete
+        # (undo_stack). Cleared whenever the trees change some other way.
+        self._undo = undo_stack.UndoStack()
+
+        # Warm-start cache records, used read-only until the real XML
+        # for that file has been parsed ("QuestInfo" / "Check" / "Act").
+        self.snapshots: dict = {}
 
         self._create_menu_bar()
         self._create_toolbar()
         self._create_central_layout()
-        self._load_xml_files()
-        self._populate_quest_list()
+        self._create_changeset_dock()
+        self._create_status_bar()
         self._connect_signals()
+        self._populate_quest_list()
+        self._load_xml_files()
 
     # ---------------- Menu bar (Settings / Theme) ----------------
 
@@ -103,6 +159,30 @@ class QuestEditorWindow(QMainWindow):
         self.action_theme_dark.triggered.connect(self._set_dark_theme)
         self.action_theme_light.triggered.connect(self._set_light_theme)
 
+        # How files over LARGE_FILE_MIN_BYTES are opened. Applies to the next
+        # load (files are picked at startup).
+        large_menu = settings_menu.addMenu("Large files")
+        self.large_file_mode_actions = {}
+        mode_group = QActionGroup(self)
+        mode_group.setExclusive(True)
+        for mode, label in (
+            (xml_loader.LOAD_LAZY, "Memory-map, parse quests on demand"),
+            (xml_loader.LOAD_RECORDS, "Stream into compact records"),
+            (xml_loader.LOAD_FULL, "Load full tree"),
+        ):
+            action = QAction(label, self)
+            action.setCheckable(True)
+            mode_group.addAction(action)
+            large_menu.addAction(action)
+            self.large_file_mode_actions[mode] = action
+        self.large_file_mode_actions[xml_loader.LOAD_LAZY].setChecked(True)
+
+        # Every save stores the previous file in the backup store (backup_store).
+        backups_menu = menubar.addMenu("Backups")
+        self.restore_backup_action = QAction("Restore backup…", self)
+        backups_menu.addAction(self.restore_backup_action)
+        self.restore_backup_action.triggered.connect(self._on_restore_backup)
+
     def _set_dark_theme(self):
         """Switch back to the dark QSS theme (works in dev and in the EXE)."""
         app = QApplication.instance()
@@ -162,18 +242,42 @@ class QuestEditorWindow(QMainWindow):
         toolbar.setMovable(False)
 
         self.clone_action = QAction("Clone / Save", self)
+        self.bulk_clone_action = QAction("Bulk Clone…", self)
+        self.bulk_clone_action.setToolTip(
+            "Clone many quests from a CSV / JSON spec (base ID, new ID, fields per row)"
+        )
         self.delete_action = QAction("Delete Quest", self)
         self.preview_action = QAction("Preview IDs", self)
+        self.undo_action = QAction("Undo", self)
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.redo_action = QAction("Redo", self)
+        self.redo_action.setShortcut(QKeySequence.Redo)
+        self.transaction_action = QAction("Transaction", self)
+        self.transaction_action.setCheckable(True)
+        self.transaction_action.setToolTip(
+            "Keep clones / deletes in memory and save them all at once with Commit"
+        )
 
         toolbar.addAction(self.clone_action)
+        toolbar.addAction(self.bulk_clone_action)
         toolbar.addAction(self.delete_action)
         toolbar.addAction(self.preview_action)
+        toolbar.addSeparator()
+        toolbar.addAction(self.undo_action)
+        toolbar.addAction(self.redo_action)
+        toolbar.addSeparator()
+        toolbar.addAction(self.transaction_action)
 
         self.addToolBar(Qt.TopToolBarArea, toolbar)
 
         self.clone_action.triggered.connect(self._on_clone_save)
+        self.bulk_clone_action.triggered.connect(self._on_bulk_clone)
         self.delete_action.triggered.connect(self._on_delete_quest)
         self.preview_action.triggered.connect(self._on_preview_ids)
+        self.undo_action.triggered.connect(self._on_undo)
+        self.redo_action.triggered.connect(self._on_redo)
+        self._update_undo_actions()
+        self.transaction_action.toggled.connect(self._on_transaction_toggled)
 
     # ---------------- Layout ----------------
 
@@ -202,6 +306,36 @@ class QuestEditorWindow(QMainWindow):
 
         main_layout.addWidget(splitter)
 
+    def _create_changeset_dock(self):
+        """Pending changes of transaction mode; only shown while it is on."""
+        self.changeset_dock = QDockWidget("Pending changes", self)
+        self.changeset_dock.setFeatures(QDockWidget.DockWidgetMovable)
+        self.changeset_panel = ChangesetPanel(self.changeset_dock)
+        self.changeset_dock.setWidget(self.changeset_panel)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.changeset_dock)
+        self.changeset_dock.hide()
+
+        self.changeset_panel.commit_button.clicked.connect(self._on_commit)
+        self.changeset_panel.rollback_button.clicked.connect(self._on_rollback)
+
+    # ---------------- Status bar ----------------
+
+    def _create_status_bar(self):
+        status = self.statusBar()
+
+        self.load_progress = QProgressBar(status)
+        self.load_progress.setTextVisible(True)
+        self.load_progress.setMinimumWidth(320)
+
+        self.load_cancel_button = QPushButton("Cancel", status)
+        self.load_cancel_button.clicked.connect(self._on_cancel_load)
+
+        status.addPermanentWidget(self.load_progress)
+        status.addPermanentWidget(self.load_cancel_button)
+
+        self.load_progress.hide()
+        self.load_cancel_button.hide()
+
     # ---------------- XML loading ----------------
 
     def _load_xml_files(self):
@@ -210,6 +344,9 @@ class QuestEditorWindow(QMainWindow):
         - QuestInfo.img(.xml)
         - Check.img(.xml)
         - Act.img(.xml)
+
+        Parsing happens on worker threads; the window stays usable and the
+        quest list fills as soon as QuestInfo is ready.
         """
         folder = QFileDialog.getExistingDirectory(
             self,
@@ -225,6 +362,10 @@ class QuestEditorWindow(QMainWindow):
             return
 
         self.xml_folder = folder
+        try:
+            self._journal = edit_journal.EditJournal(folder)
+        except OSError:
+            self._journal = None  # read-only folder: edits just aren't logged
 
         def find_file(base_name: str) -> str | None:
             candidates = [
@@ -242,24 +383,155 @@ class QuestEditorWindow(QMainWindow):
         self.check_path = find_file("Check")
         self.act_path = find_file("Act")
 
-        def load_tree(path: str | None):
-            return xml_loader.load_xml(path) if path else None
+        self._start_load_job()
 
-        self.questinfo_tree = load_tree(self.questinfo_path)
-        self.questinfo_root = (
-            self.questinfo_tree.getroot() if self.questinfo_tree is not None else None
-        )
+    def _start_load_job(self):
+        """Parse the three files in parallel; results arrive via _on_file_loaded()."""
+        self._set_loading(True)
 
-        self.check_tree = load_tree(self.check_path)
-        self.check_root = (
-            self.check_tree.getroot() if self.check_tree is not None else None
+        # Big files use the mode picked under Settings → Large files.
+        large_mode = next(
+            mode
+            for mode, action in self.large_file_mode_actions.items()
+            if action.isChecked()
+        )
+        modes = {}
+        for kind, path in (
+            ("QuestInfo", self.questinfo_path),
+            ("Check", self.check_path),
+            ("Act", self.act_path),
+        ):
+            if path and os.path.getsize(path) >= LARGE_FILE_MIN_BYTES:
+                modes[kind] = large_mode
+
+        self._load_job = XmlLoadJob(
+            {
+                "QuestInfo": self.questinfo_path,
+                "Check": self.check_path,
+                "Act": self.act_path,
+            },
+            self,
+            modes=modes,
+        )
+        self._load_job.snapshot_loaded.connect(self._on_snapshot_loaded)
+        self._load_job.progress.connect(self._on_load_progress)
+        self._load_job.file_loaded.connect(self._on_file_loaded)
+        self._load_job.finished.connect(self._on_load_finished)
+
+        self.load_progress.setRange(0, 1000)
+        self.load_progress.setValue(0)
+        self._load_job.start()
+
+    def _set_loading(self, loading: bool):
+        """Show/hide the load progress widgets and lock actions that write files."""
+        self.load_progress.setVisible(loading)
+        self.load_cancel_button.setVisible(loading)
+        self.load_cancel_button.setEnabled(loading)
+        self.clone_action.setEnabled(not loading)
+        self.bulk_clone_action.setEnabled(not loading)
+        self.delete_action.setEnabled(not loading)
+        self.restore_backup_action.setEnabled(not loading)
+        self.transaction_action.setEnabled(not loading)
+        self._update_undo_actions()
+
+    def _on_load_progress(self, done: int, total: int, quests: int):
+        if total > 0:
+            self.load_progress.setValue(int(done * 1000 / total))
+        self.load_progress.setFormat(
+            f"Loading {done / 1048576:.1f} / {total / 1048576:.1f} MB — {quests} quests"
         )
 
-        self.act_tree = load_tree(self.act_path)
-        self.act_root = (
-            self.act_tree.getroot() if self.act_tree is not None else None
+    def _on_cancel_load(self):
+        if self._load_job is not None:
+            self.load_cancel_button.setEnabled(False)
+            self.load_progress.setFormat("Cancelling…")
+            self._load_job.cancel()
+
+    def _on_snapshot_loaded(self, kind: str, snapshot):
+        """A cached snapshot matched: browse from it until the XML is parsed."""
+        self.snapshots[kind] = snapshot
+        self.statusBar().showMessage("Opened from cache — verifying XML in the background…")
+        if kind == "QuestInfo" and self.questinfo_root is None:
+            self._populate_quest_list()
+        else:
+            self._reload_base_forms()
+
+    def _on_file_loaded(self, kind: str, tree):
+        root = tree.getroot() if tree is not None else None
+        # The parsed file is authoritative from here on.
+        self.snapshots.pop(kind, None)
+
+        # A reload replaces the previous tree: let go of it and its index.
+        old = {"QuestInfo": self.questinfo_tree, "Check": self.check_tree, "Act": self.act_tree}[kind]
+        if old is not None and old is not tree:
+            drop_index(old.getroot())
+
+        if kind == "QuestInfo":
+            self.questinfo_tree, self.questinfo_root = tree, root
+            # The list can be used while Check / Act are still loading.
+            self._populate_quest_list()
+        elif kind == "Check":
+            self.check_tree, self.check_root = tree, root
+            self._reload_base_forms()
+        elif kind == "Act":
+            self.act_tree, self.act_root = tree, root
+            self._reload_base_forms()
+
+        # A query typed while loading (npc:, lvmin:, ...) can use this file now.
+        current_filter = self.quest_list_panel.search_edit.text()
+        if kind != "QuestInfo" and is_query(current_filter):
+            self._refresh_quest_list(current_filter)
+
+    def _reload_base_forms(self):
+        """Refresh the Base column after Check / Act finished loading."""
+        qid = self.current_base_quest_id
+        if qid is None:
+            return
+        self.quest_editor_panel.base_requirements_form.set_data(
+            self._extract("Check", qid)
+        )
+        self.quest_editor_panel.base_rewards_form.set_data(
+            self._extract("Act", qid)
         )
 
+    def _extract(self, kind: str, quest_id: int):
+        """
+        extract_questinfo / extract_requirements / extract_rewards for the
+        loaded file, or the warm-start snapshot while it is still parsing.
+        """
+        root = {
+            "QuestInfo": self.questinfo_root,
+            "Check": self.check_root,
+            "Act": self.act_root,
+        }[kind]
+        if root is None and kind in self.snapshots:
+            return self.snapshots[kind].get(quest_id)
+        extract = {
+            "QuestInfo": extract_questinfo,
+            "Check": extract_requirements,
+            "Act": extract_rewards,
+        }[kind]
+        return extract(root, quest_id)
+
+    def _on_load_finished(self, cancelled: bool):
+        self._set_loading(False)
+        self._load_job = None
+        self.snapshots.clear()
+        self.statusBar().clearMessage()
+        self._undo.clear()
+        self._update_undo_actions()
+        folder = self.xml_folder
+
+        # Word searches typed during the load can use the text index now.
+        current_filter = self.quest_list_panel.search_edit.text()
+        if current_filter.strip():
+            self._refresh_quest_list(current_filter)
+
+        if cancelled:
+            self.statusBar().showMessage("Loading cancelled.", 5000)
+        else:
+            self._recover_journal()
+
         missing = []
         if self.questinfo_tree is None:
             missing.append("QuestInfo.img / QuestInfo.img.xml")
@@ -272,72 +544,180 @@ class QuestEditorWindow(QMainWindow):
             QMessageBox.warning(
                 self,
                 "Missing XML files",
-                "Could not find or load the following files in:\n"
-                f"{folder}\n\n"
+                ("Loading was cancelled before these files finished in:\n"
+                 if cancelled
+                 else "Could not find or load the following files in:\n")
+                + f"{folder}\n\n"
                 + "\n".join(missing)
                 + "\n\nThe editor will still open, but some features will be disabled.",
             )
 
-    # ---------------- Quest list + search ----------------
-
-    def _populate_quest_list(self):
-        lw = self.quest_list_panel.list_widget
+        # Quest-ID indexes were built by the load workers; report duplicate IDs
+        # (only the first <imgdir> with a given name is used by the editor).
+        duplicates = []
+        for label, root in (
+            ("QuestInfo", self.questinfo_root),
+            ("Check", self.check_root),
+            ("Act", self.act_root),
+        ):
+            if root is None:
+                continue
+            dupes = get_index(root).duplicates
+            if dupes:
+                shown = ", ".join(f"{qid} (x{n})" for qid, n in list(dupes.items())[:20])
+                more = f" … and {len(dupes) - 20} more" if len(dupes) > 20 else ""
+                duplicates.append(f"{label}: {shown}{more}")
 
-        # Avoid firing selection-changed signals while we rebuild the list,
-        # so we don't accidentally clear the forms.
-        lw.blockSignals(True)
-        lw.clear()
-        self.all_quests = []
+        if duplicates:
+            QMessageBox.warning(
+                self,
+                "Duplicate quest IDs",
+                "Some quest IDs appear more than once. Only the first entry is edited:\n\n"
+                + "\n".join(duplicates),
+            )
 
-        if self.questinfo_root is None:
-            lw.blockSignals(False)
+    def closeEvent(self, event):
+        # Let a save in flight (and the edits queued behind it) finish first;
+        # the window closes itself afterwards.
+        if self._save_job is not None:
+            self._close_after_save = True
+            self.statusBar().showMessage("Finishing save before closing…")
+            event.ignore()
             return
 
-        self.all_quests = get_all_quest_ids(self.questinfo_root)
+        if self._has_pending():
+            reply = QMessageBox.question(
+                self,
+                "Transaction",
+                "Commit the pending changes before closing?\n\nNo discards them.",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel,
+                QMessageBox.Yes,
+            )
+            if reply == QMessageBox.Cancel:
+                event.ignore()
+                return
+            if reply == QMessageBox.Yes:
+                self._commit_transaction()
+                if self._save_job is not None:
+                    self._close_after_save = True
+                    event.ignore()
+                    return
+            elif self.transaction_action.isChecked():
+                # The transaction's edits never reached a file: nothing to replay.
+                self._log_edit(lambda journal: journal.log_rollback())
+
+        # Stop background parsing before the window (and its signals) go away.
+        if self._load_job is not None:
+            self._load_job.cancel()
+            self._load_job.wait()
+        self._search_timer.stop()
+        self._search_job.shutdown()
+        if self._journal is not None:
+            self._journal.close()
+        super().closeEvent(event)
+
+    # ---------------- Quest list + search ----------------
+
+    def _populate_quest_list(self, scroll: bool = False):
+        self.all_quests = QuestList()
+
+        if self.questinfo_root is not None:
+            self.all_quests = build_quest_list(self.questinfo_root)
+        elif "QuestInfo" in self.snapshots:
+            self.all_quests = self.snapshots["QuestInfo"].quest_list
 
         # Keep whatever the user typed in the search box,
         # so we don't blow away their filter/place.
+        self._last_search = None
+        self.quest_list_panel.model.set_quests(self.all_quests)
         current_filter = self.quest_list_panel.search_edit.text()
-        self._refresh_quest_list(current_filter)
-        lw.blockSignals(False)
+        self._refresh_quest_list(current_filter, scroll)
 
-    def _refresh_quest_list(self, filter_text: str):
-        """Refill the quest list widget based on current self.all_quests and a filter string."""
-        lw = self.quest_list_panel.list_widget
-
-        # Avoid clearing forms when the list is re-filtered.
-        lw.blockSignals(True)
-        lw.clear()
+    def _refresh_quest_list(self, filter_text: str, scroll: bool = False):
+        """
+        Narrow the quest list view to the rows matching a filter string.
 
-        if not self.all_quests:
-            lw.blockSignals(False)
+        An empty filter is applied here; anything else is handed to the
+        search worker, which replaces the rows as results come in (see
+        _on_search_rows / _on_search_finished).
+        """
+        self._search_timer.stop()
+        model = self.quest_list_panel.model
+
+        if not (filter_text or "").strip():
+            self._search_job.cancel()
+            self._last_search = None
+            model.set_rows(None)
+            self._restore_selection(scroll)
             return
 
-        filt = (filter_text or "").strip().lower()
-
-        for qid, name in self.all_quests:
-            label = f"{qid}: {name}"
-            if filt:
-                if filt not in str(qid) and filt not in name.lower():
-                    continue
-            item = QListWidgetItem(label)
-            item.setData(Qt.UserRole, qid)
-            lw.addItem(item)
-
-        lw.blockSignals(False)
-
+        self._scroll_to_selection = scroll
+        self._search_job.start(
+            SearchRequest(
+                filter_text,
+                self.all_quests,
+                check_root=self.check_root,
+                act_root=self.act_root,
+                text_index=peek_text_index(self.questinfo_root),
+                previous=self._last_search,
+            )
+        )
 
+    def _on_search_rows(self, generation: int, rows, first: bool):
+        if generation != self._search_job.generation:
+            return  # a newer search has started
+        model = self.quest_list_panel.model
+        if first:
+            model.set_rows(rows, ordered=False)
+            self._restore_selection()
+        else:
+            model.append_rows(rows)
 
+    def _on_search_finished(self, generation: int, result):
+        if generation != self._search_job.generation:
+            return
+        self._last_search = result
+        if result.error:
+            self.statusBar().showMessage(f"Search: {result.error}", 5000)
+        elif self.statusBar().currentMessage().startswith("Search: "):
+            self.statusBar().clearMessage()
+        self.quest_list_panel.model.set_ordered(result.ordered)
+        self._restore_selection(self._scroll_to_selection)
+        self._scroll_to_selection = False
+
+    def _stop_search(self):
+        """Cancel a running search and wait for it; call before editing quests."""
+        self._search_timer.stop()
+        self._search_job.cancel(wait=True)
+
+    def _restore_selection(self, scroll: bool = False):
+        """
+        Re-select the base quest after the list changed, without reloading
+        the forms. Found by ID (bisect), not by walking the rows.
+        """
+        if self.current_base_quest_id is None:
+            return
+        self._restoring_selection = True
+        try:
+            self.quest_list_panel.select_quest(self.current_base_quest_id, scroll)
+        finally:
+            self._restoring_selection = False
 
     # ---------------- Signals ----------------
 
     def _connect_signals(self):
-        lw = self.quest_list_panel.list_widget
-        lw.currentItemChanged.connect(self._on_quest_selected)
+        self.quest_list_panel.list_view.selectionModel().currentChanged.connect(
+            self._on_quest_selected
+        )
 
         self.quest_list_panel.search_edit.textChanged.connect(
             self._on_search_text_changed
         )
+        self._search_timer.timeout.connect(
+            lambda: self._refresh_quest_list(self.quest_list_panel.search_edit.text())
+        )
+        self._search_job.rows_found.connect(self._on_search_rows)
+        self._search_job.finished.connect(self._on_search_finished)
 
         self.middle_actions_panel.copy_button.clicked.connect(
             self._on_copy_base_to_new
@@ -347,16 +727,25 @@ class QuestEditorWindow(QMainWindow):
     # ---------------- Event handlers ----------------
 
     def _on_search_text_changed(self, text: str):
-        self._refresh_quest_list(text)
+        # Clearing the box is instant; typing waits for a pause.
+        if not text.strip():
+            self._refresh_quest_list(text)
+        else:
+            self._search_timer.start()
 
     def _on_quest_selected(self, current, previous):
-        if current is None or self.questinfo_root is None:
+        if self._restoring_selection:
+            return
+
+        if not current.isValid() or (
+            self.questinfo_root is None and "QuestInfo" not in self.snapshots
+        ):
             self.current_base_quest_id = None
             self._clear_base_forms()
             self._clear_new_forms()
             return
 
-        quest_id = current.data(Qt.UserRole)
+        quest_id = self.quest_list_panel.model.quest_id(current.row())
         if quest_id is None:
             self.current_base_quest_id = None
             self._clear_base_forms()
@@ -366,15 +755,16 @@ class QuestEditorWindow(QMainWindow):
         self.current_base_quest_id = int(quest_id)
 
         # QuestInfo
-        qi_data = extract_questinfo(self.questinfo_root, self.current_base_quest_id)
-        qi_data["id"] = self.current_base_quest_id
+        qi_data = self._extract("QuestInfo", self.current_base_quest_id)
 
         # Requirements / Rewards
-        req_data = extract_requirements(self.check_root, self.current_base_quest_id)
-        rew_data = extract_rewards(self.act_root, self.current_base_quest_id)
+        req_data = self._extract("Check", self.current_base_quest_id)
+        rew_data = self._extract("Act", self.current_base_quest_id)
 
         # Fill Base column
-        self.quest_editor_panel.base_questinfo_form.set_data(qi_data)
+        self.quest_editor_panel.base_questinfo_form.set_data(
+            qi_data, self.current_base_quest_id
+        )
         self.quest_editor_panel.base_requirements_form.set_data(req_data)
         self.quest_editor_panel.base_rewards_form.set_data(rew_data)
 
@@ -382,23 +772,21 @@ class QuestEditorWindow(QMainWindow):
         self._clear_new_forms()
 
     def _clear_base_forms(self):
-        empty = {}
-        self.quest_editor_panel.base_questinfo_form.set_data(empty)
-        self.quest_editor_panel.base_requirements_form.set_data(empty)
-        self.quest_editor_panel.base_rewards_form.set_data(empty)
+        self.quest_editor_panel.base_questinfo_form.set_data(None)
+        self.quest_editor_panel.base_requirements_form.set_data(None)
+        self.quest_editor_panel.base_rewards_form.set_data(None)
 
     def _clear_new_forms(self):
-        empty = {}
-        self.quest_editor_panel.new_questinfo_form.set_data(empty)
-        self.quest_editor_panel.new_requirements_form.set_data(empty)
-        self.quest_editor_panel.new_rewards_form.set_data(empty)
+        self.quest_editor_panel.new_questinfo_form.set_data(None)
+        self.quest_editor_panel.new_requirements_form.set_data(None)
+        self.quest_editor_panel.new_rewards_form.set_data(None)
 
     def _on_copy_base_to_new(self):
         """
         Copy Base forms → New forms.
         """
         base_qi = self.quest_editor_panel.base_questinfo_form.to_data()
-        base_qi["id"] = ""  # force user to type new ID for clones
+        # ID left empty: force user to type new ID for clones
         self.quest_editor_panel.new_questinfo_form.set_data(base_qi)
 
         base_req = self.quest_editor_panel.base_requirements_form.to_data()
@@ -445,7 +833,7 @@ class QuestEditorWindow(QMainWindow):
         req_data = self.quest_editor_panel.new_requirements_form.to_data()
         rew_data = self.quest_editor_panel.new_rewards_form.to_data()
 
-        id_text = str(qi_data.get("id", "")).strip()
+        id_text = self.quest_editor_panel.new_questinfo_form.quest_id_text()
         if not id_text:
             QMessageBox.warning(
                 self,
@@ -455,7 +843,7 @@ class QuestEditorWindow(QMainWindow):
             return
 
         # Parse IDs: allow "3000 3001,3002"
-        tokens = [t for t in re.split(r"[\\s,]+", id_text) if t]
+        tokens = [t for t in re.split(r"[\s,]+", id_text) if t]
         new_ids = []
         invalid_tokens = []
         for t in tokens:
@@ -477,12 +865,12 @@ class QuestEditorWindow(QMainWindow):
 
         # Warn if any targets already exist (and are not just the base-id edit-in-place case)
         existing_ids: list[int] = []
+        questinfo_index = get_index(self.questinfo_root)
         for nid in new_ids:
             if nid == base_id:
                 # Editing the base quest in-place is allowed without warning.
                 continue
-            node = self.questinfo_root.find(f"./imgdir[@name='{nid}']")
-            if node is not None:
+            if nid in questinfo_index:
                 existing_ids.append(nid)
 
         if existing_ids:
@@ -498,83 +886,40 @@ class QuestEditorWindow(QMainWindow):
             if resp != QMessageBox.Yes:
                 return
 
-        # --- Apply changes in-memory ---
-        messages: list[str] = []
-        saved_labels: list[str] = []
+        self._run_edit(lambda: self._apply_clone(new_ids, qi_data, req_data, rew_data))
 
-        for nid in new_ids:
-            # Ensure the data dict has the correct ID for this target
-            qi_for_id = dict(qi_data)
-            qi_for_id["id"] = nid
-
-            # Track what we actually saved so we can show it in the popup.
-            qname = qi_for_id.get("name", "")
-            if qname:
-                saved_labels.append(f"{nid}: {qname}")
-            else:
-                saved_labels.append(str(nid))
+    def _apply_clone(self, new_ids: list[int], qi_data, req_data, rew_data):
+        """Write the New Quest forms into every target ID, then save in the background."""
+        label = "Clone → " + ", ".join(str(nid) for nid in new_ids)
+        before = edit_journal.quest_images(self._roots(), new_ids)
+        if not self._log_edit(
+            lambda journal: journal.log_clone(
+                before, new_ids, qi_data, req_data, rew_data, label
+            )
+        ):
+            return
 
-            apply_questinfo(self.questinfo_root, nid, qi_for_id)
+        # --- Apply changes in-memory ---
+        self._stop_search()
+        for nid in new_ids:
+            apply_questinfo(self.questinfo_root, nid, qi_data)
             apply_requirements(self.check_root, nid, req_data)
             apply_rewards(self.act_root, nid, rew_data)
-
-        # --- Save XMLs with .bak backups, like the old tool ---
-        if self.questinfo_tree and self.questinfo_path:
-            backup(self.questinfo_path)
-            save_xml(self.questinfo_tree, self.questinfo_path)
-            if saved_labels:
-                messages.append(
-                    f"QuestInfo: saved {len(new_ids)} quest(s): "
-                    + ", ".join(saved_labels)
-                )
-            else:
-                messages.append(f"QuestInfo: saved {len(new_ids)} quest(s).")
-
-        else:
-            messages.append("QuestInfo: not loaded, skipping.")
-
-        if self.check_tree and self.check_path:
-            backup(self.check_path)
-            save_xml(self.check_tree, self.check_path)
-            messages.append("Check: updated requirements.")
-        else:
-            messages.append("Check: not loaded, skipping.")
-
-        if self.act_tree and self.act_path:
-            backup(self.act_path)
-            save_xml(self.act_tree, self.act_path)
-            messages.append("Act: updated rewards.")
-        else:
-            messages.append("Act: not loaded, skipping.")
+        self._record_undo(label, before, new_ids)
 
         # --- Keep your place in the quest list ---
         # Remember which quest was selected as base
         selected_id = self.current_base_quest_id
 
-        # Rebuild the quest list from updated QuestInfo
-        self._populate_quest_list()
-
-        # Restore selection to the same base quest without firing selection handler
+        # Rebuild the quest list from updated QuestInfo; the base quest is
+        # re-selected (without firing the selection handler) once it shows.
         if selected_id is not None:
-            lw = self.quest_list_panel.list_widget
-            target_item = None
-            for i in range(lw.count()):
-                item = lw.item(i)
-                if item.data(Qt.UserRole) == selected_id:
-                    target_item = item
-                    break
-
-            if target_item is not None:
-                lw.blockSignals(True)
-                lw.setCurrentItem(target_item)
-                lw.blockSignals(False)
-                lw.scrollToItem(target_item)
+            self.current_base_quest_id = selected_id
+        self._populate_quest_list(scroll=True)
 
-        QMessageBox.information(
-            self,
-            "Clone / Save",
-            "\n".join(messages),
-        )
+        # Saved in the background; the summary lists what each file got
+        # (see _save_messages).
+        self._finish_edit("Clone / Save", [], label)
 
 
     def _on_delete_quest(self):
@@ -586,13 +931,7 @@ class QuestEditorWindow(QMainWindow):
           2) Quest ID in the New Quest form
         """
         # 1) Try the currently selected quest in the list
-        qid: int | None = None
-        lw = self.quest_list_panel.list_widget
-        current_item = lw.currentItem()
-        if current_item is not None:
-            data = current_item.data(Qt.UserRole)
-            if isinstance(data, int):
-                qid = data
+        qid: int | None = self.quest_list_panel.current_quest_id()
 
         # 2) Fallback: quest ID typed in the New Quest form
         if qid is None:
@@ -615,35 +954,35 @@ class QuestEditorWindow(QMainWindow):
             self,
             "Delete Quest",
             f"Delete quest {qid} from all loaded XML files?\n\n"
-            "A .bak backup will be created next to each XML before changes.",
+            "Each XML that changes is backed up first (Backups → Restore backup…).",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No,
         )
         if reply != QMessageBox.Yes:
             return
 
-        messages: list[str] = []
-
-        def delete_from(name: str, tree, root, path: str | None):
-            if tree is None or root is None or not path:
-                messages.append(f"{name}: not loaded, skipping.")
-                return
+        self._run_edit(lambda: self._apply_delete(qid))
 
-            # Backup original file
-            backup(path)
+    def _apply_delete(self, qid: int):
+        """Remove `qid` from every loaded XML, then save in the background."""
+        before = edit_journal.quest_images(self._roots(), [qid])
+        positions = edit_journal.quest_positions(self._roots(), [qid])
+        if not self._log_edit(
+            lambda journal: journal.log_delete(before, [qid], f"Delete {qid}", positions)
+        ):
+            return
+        messages: list[str] = []
+        self._stop_search()
 
-            node = root.find(f"./imgdir[@name='{qid}']")
-            if node is not None:
-                root.remove(node)
-                save_xml(tree, path)
+        # Only a file that actually held the quest is backed up and saved.
+        for name, tree, path in self._xml_files():
+            if tree is None or not path:
+                continue
+            if get_index(tree.getroot()).remove(qid) is not None:
                 messages.append(f"{name}: removed quest {qid}.")
             else:
                 messages.append(f"{name}: quest {qid} not present.")
-
-        # Delete from each loaded XML
-        delete_from("QuestInfo", self.questinfo_tree, self.questinfo_root, self.questinfo_path)
-        delete_from("Check", self.check_tree, self.check_root, self.check_path)
-        delete_from("Act", self.act_tree, self.act_root, self.act_path)
+        self._record_undo(f"Delete {qid}", before, [qid], positions)
 
         # If we just deleted the current base quest, clear it
         if self.current_base_quest_id == qid:
@@ -654,8 +993,611 @@ class QuestEditorWindow(QMainWindow):
         # Refresh quest list from updated QuestInfo root
         self._populate_quest_list()
 
-        QMessageBox.information(self, "Delete Quest", "\n".join(messages))
+        self._finish_edit("Delete Quest", messages, f"Delete {qid}")
+
+    # ---------------- Bulk clone ----------------
+
+    def _on_bulk_clone(self):
+        """
+        Clone from a CSV / JSON spec (see app.logic.bulk_clone): every row is
+        applied in one pass, each changed file is saved once and a JSON
+        report is written next to the spec.
+        """
+        if self.questinfo_root is None:
+            QMessageBox.warning(
+                self,
+                "No QuestInfo loaded",
+                "QuestInfo.img.xml is not loaded. Cannot clone/save quests.",
+            )
+            return
+
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Bulk clone spec",
+            self.xml_folder,
+            "Clone spec (*.csv *.json);;All files (*)",
+        )
+        if not path:
+            return
+        try:
+            rows = bulk_clone.load_spec(path)
+        except bulk_clone.SpecError as exc:
+            QMessageBox.warning(
+                self, "Bulk Clone", f"Nothing was cloned; fix the spec first:\n\n{exc}"
+            )
+            return
+
+        questinfo_index = get_index(self.questinfo_root)
+        existing = [
+            row.new_id for row in rows
+            if row.new_id != row.base_id and row.new_id in questinfo_index
+        ]
+        if existing:
+            shown = ", ".join(str(qid) for qid in existing[:20])
+            if len(existing) > 20:
+                shown += f" … and {len(existing) - 20} more"
+            resp = QMessageBox.question(
+                self,
+                "Overwrite existing quests?",
+                f"{len(existing)} of the {len(rows)} new quest IDs already exist and will be "
+                f"overwritten:\n{shown}\n\nContinue?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            if resp != QMessageBox.Yes:
+                return
+
+        self._run_edit(lambda: self._apply_bulk_clone(path, rows))
+
+    def _apply_bulk_clone(self, spec_path: str, rows: list):
+        """Plan and apply every spec row, then save once and write the report."""
+        started = time.perf_counter()
+        roots = self._roots()
+        plans = bulk_clone.plan_clones(rows, roots)
+        good = [plan for plan in plans if plan.images is not None]
+        ids = [plan.row.new_id for plan in good]
+        label = f"Bulk clone {os.path.basename(spec_path)} ({len(good)} quest(s))"
+        planned = time.perf_counter()
+
+        before = edit_journal.quest_images(roots, ids)
+        if good and not self._log_edit(
+            lambda journal: journal.log_bulk_clone(before, bulk_clone.clone_images(plans), label)
+        ):
+            return
+
+        self._stop_search()
+        bulk_clone.apply_clones(plans, roots)
+        self._record_undo(label, before, ids)
+        applied = time.perf_counter()
+        self._populate_quest_list()
+
+        report_path = bulk_clone.report_path(spec_path)
+        messages = [f"Cloned {len(good)} of {len(plans)} row(s) from {os.path.basename(spec_path)}."]
+        failed = [plan for plan in plans if plan.images is None]
+        for plan in failed[:10]:
+            messages.append(f"  line {plan.row.line}: {plan.error}")
+        if len(failed) > 10:
+            messages.append(f"  … and {len(failed) - 10} more failed row(s)")
+        messages.append(f"Report: {report_path}")
+
+        seconds = {"plan": planned - started, "apply": applied - planned}
+
+        def write_report(results):
+            files = self._bulk_file_report(results)
+            if results is not None:
+                seconds["save"] = time.perf_counter() - applied
+            report = bulk_clone.build_report(spec_path, plans, files, seconds)
+            try:
+                bulk_clone.write_report(report_path, report)
+            except OSError as exc:
+                QMessageBox.warning(self, "Bulk Clone", f"Could not write the report:\n\n{exc}")
+
+        self._finish_edit("Bulk Clone", messages, label, write_report)
+
+    def _bulk_file_report(self, results) -> dict:
+        """Per-file part of the bulk clone report from XmlSaveJob's results (None: transaction)."""
+        files = {}
+        for kind, tree, path in self._xml_files():
+            if tree is None or not path:
+                files[kind] = {"status": "not loaded"}
+                continue
+            result = None if results is None else results.get(kind)
+            if results is None:
+                files[kind] = {"status": "pending", "changed": len(pending_changes(tree))}
+            elif isinstance(result, Exception):
+                files[kind] = {
+                    "status": "failed",
+                    "changed": len(pending_changes(tree)),
+                    "error": str(result),
+                }
+            elif result:
+                files[kind] = {"status": "saved", "changed": len(result), "path": path}
+            else:
+                files[kind] = {"status": "unchanged", "changed": 0, "path": path}
+        return files
+
+    # ---------------- Saving ----------------
+
+    def _xml_files(self):
+        """(kind, tree, path) for QuestInfo / Check / Act (tree / path may be None)."""
+        return (
+            ("QuestInfo", self.questinfo_tree, self.questinfo_path),
+            ("Check", self.check_tree, self.check_path),
+            ("Act", self.act_tree, self.act_path),
+        )
+
+    def _run_edit(self, edit):
+        """
+        Run an edit (clone / delete) now, or after the save in flight: the
+        save worker is still serializing the quests, so they can't change yet.
+        """
+        if self._save_job is not None:
+            self._queued_edits.append(edit)
+            self.statusBar().showMessage(
+                f"Saving… {len(self._queued_edits)} change(s) queued behind the save.", 5000
+            )
+            return
+        edit()
+
+    def _finish_edit(self, title: str, messages: list[str], description: str, done=None):
+        """
+        After an edit: save now, or in transaction mode add it to the changeset.
+        done(results) is called once the save finished (see
+        _save_changed_files); with None in transaction mode.
+        """
+        # Nothing empties the journal until the next save; keep it bounded.
+        if self._journal is not None:
+            try:
+                self._journal.compact(self._roots())
+            except OSError:
+                pass  # the journal as it is still covers every edit
+        if self.transaction_action.isChecked():
+            if done is not None:
+                done(None)
+            self._transaction_edits.append(description)
+            self._refresh_changeset()
+            self.statusBar().showMessage(f"{description} — pending until Commit.", 5000)
+            self._run_queued_edit()
+            return
+        self._save_changed_files(title, messages, done)
+
+    def _save_changed_files(self, title: str, messages: list[str], done=None):
+        """
+        Back up and save every file with changed quests on a worker thread.
+        done(results), if given, gets XmlSaveJob's results ({} if nothing
+        needed saving) before the summary is shown.
+        """
+        job = XmlSaveJob(self._xml_files(), self)
+        if not job.has_work():
+            if done is not None:
+                done({})
+            self._checkpoint_journal()
+            self._show_save_summary(title, messages, {})
+            self._run_queued_edit()
+            return
+
+        self._save_job = job
+        job.progress.connect(self._on_save_progress)
+        job.finished.connect(lambda results: self._on_save_finished(title, messages, results, done))
+        self.load_progress.setRange(0, 1000)
+        self.load_progress.setValue(0)
+        self.load_progress.setFormat("Saving…")
+        self.load_progress.show()
+        job.start()
+
+    def _on_save_progress(self, done: int, total: int, label: str):
+        if total > 0:
+            self.load_progress.setValue(int(done * 1000 / total))
+        self.load_progress.setFormat(
+            f"Saving {label} — {done / 1048576:.1f} / {total / 1048576:.1f} MB"
+        )
+
+    def _on_save_finished(self, title: str, messages: list[str], results: dict, done=None):
+        self._save_job = None
+        self.load_progress.hide()
+        self._refresh_changeset()
+        if done is not None:
+            done(results)
+
+        failed = [
+            f"{kind}: {error}" for kind, error in results.items() if isinstance(error, Exception)
+        ]
+        if not failed:
+            self._checkpoint_journal()
+        # Start the next queued edit first; its save runs while the summary is up.
+        self._run_queued_edit()
+
+        if failed:
+            # Don't close on top of unsaved changes.
+            self._close_after_save = False
+            QMessageBox.warning(
+                self,
+                title,
+                "Could not save:\n\n"
+                + "\n".join(failed)
+                + "\n\nThe original files were not touched. The changes are kept and "
+                "will be saved with the next Clone / Save or Delete.",
+            )
+        elif not self._close_after_save:
+            self._show_save_summary(title, messages, results)
+
+        if self._close_after_save and self._save_job is None:
+            self.close()
+
+    def _run_queued_edit(self):
+        if self._queued_edits and self._save_job is None:
+            self._queued_edits.pop(0)()
+
+    def _show_save_summary(self, title: str, messages: list[str], results: dict):
+        if not self._close_after_save:
+            QMessageBox.information(
+                self, title, "\n".join(messages + self._save_messages(results))
+            )
+
+    def _save_messages(self, results: dict) -> list[str]:
+        """
+        One summary line per file from XmlSaveJob's results: the quests that
+        save actually wrote. QuestInfo quests are listed with their names.
+        """
+        messages = []
+        for kind, tree, path in self._xml_files():
+            if tree is None or not path:
+                messages.append(f"{kind}: not loaded, skipping.")
+                continue
+            changed = results.get(kind)
+            if not changed:
+                messages.append(f"{kind}: no changes, file not rewritten.")
+                continue
+            if kind == "QuestInfo":
+                shown = []
+                for qid in changed:
+                    name = self.all_quests.name_of(int(qid)) if qid.isdigit() else None
+                    shown.append(f"{qid}: {name}" if name else qid)
+            else:
+                shown = changed
+            messages.append(f"{kind}: saved {len(changed)} changed quest(s): " + ", ".join(shown))
+        return messages
+
+
+    # ---------------- Transactions ----------------
+
+    def _indexes(self):
+        """QuestIndex of every loaded file."""
+        return [get_index(tree.getroot()) for _kind, tree, _path in self._xml_files() if tree is not None]
+
+    def _has_pending(self) -> bool:
+        """True if a loaded file has changes that are not saved yet."""
+        return any(
+            pending_changes(tree) for _kind, tree, _path in self._xml_files() if tree is not None
+        )
+
+    def _refresh_changeset(self):
+        pending = {
+            kind: pending_changes(tree)
+            for kind, tree, _path in self._xml_files()
+            if tree is not None
+        }
+        self.changeset_panel.set_changes(self._transaction_edits, pending)
+
+    def _on_transaction_toggled(self, checked: bool):
+        if checked:
+            for index in self._indexes():
+                index.begin()
+            self._log_edit(lambda journal: journal.log_begin())
+            self._transaction_edits = []
+            self._refresh_changeset()
+            self.changeset_dock.show()
+            self.statusBar().showMessage(
+                "Transaction mode: edits stay in memory until Commit.", 5000
+            )
+            return
+
+        if self._save_job is not None:
+            self.statusBar().showMessage("Wait for the save to finish.", 5000)
+            reply = QMessageBox.Cancel
+        elif self._has_pending():
+            reply = QMessageBox.question(
+                self,
+                "Transaction",
+                "Commit the pending changes?\n\nNo rolls them back.",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel,
+                QMessageBox.Yes,
+            )
+        else:
+            reply = None
+        if reply == QMessageBox.Cancel:
+            self.transaction_action.blockSignals(True)
+            self.transaction_action.setChecked(True)
+            self.transaction_action.blockSignals(False)
+            return
+        if reply == QMessageBox.Yes:
+            self._commit_transaction()
+        elif reply == QMessageBox.No:
+            self._rollback_transaction()
+
+        for index in self._indexes():
+            index.commit()
+        self._transaction_edits = []
+        self.changeset_dock.hide()
+
+    def _on_commit(self):
+        if self._save_job is not None:
+            self.statusBar().showMessage("A save is already running.", 5000)
+            return
+        self._commit_transaction()
+
+    def _commit_transaction(self):
+        """Back up and save every file with pending changes, once."""
+        messages = [f"Committed {len(self._transaction_edits)} edit(s)."]
+        self._transaction_edits = []
+        self._save_changed_files("Commit", messages)
+        self._refresh_changeset()
+
+    def _on_rollback(self):
+        if self._save_job is not None:
+            # The save worker is still reading the quests.
+            self.statusBar().showMessage("Wait for the save to finish before rolling back.", 5000)
+            return
+        reply = QMessageBox.question(
+            self,
+            "Rollback",
+            f"Discard the {len(self._transaction_edits)} pending edit(s)?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No,
+        )
+        if reply == QMessageBox.Yes:
+            self._rollback_transaction()
+
+    def _rollback_transaction(self):
+        """Undo every edit since the transaction started (or the last commit)."""
+        self._stop_search()
+        for index in self._indexes():
+            if index.in_transaction():
+                index.rollback()
+                index.begin()
+        self._log_edit(lambda journal: journal.log_rollback())
+        self._checkpoint_journal()
+        self._log_edit(lambda journal: journal.log_begin())
+        self._transaction_edits = []
+        self._undo.clear()
+        self._update_undo_actions()
+        self._refresh_changeset()
+        self._refresh_shown_quests()
+        self.statusBar().showMessage("Pending changes rolled back.", 5000)
+
+    def _refresh_shown_quests(self):
+        """Quests changed behind the forms' back (rollback, recovery): show them as they are now."""
+        # Clones may be gone and deleted quests back.
+        qid = self.current_base_quest_id
+        if qid is not None and self.questinfo_root is not None and qid not in get_index(self.questinfo_root):
+            self.current_base_quest_id = None
+            self._clear_base_forms()
+        elif qid is not None:
+            self.quest_editor_panel.base_questinfo_form.set_data(
+                self._extract("QuestInfo", qid), qid
+            )
+            self._reload_base_forms()
+        self._populate_quest_list()
+
+    # ---------------- Undo / redo ----------------
+
+    def _record_undo(self, label: str, before: dict, ids, positions=None):
+        """
+        After an edit: push its before / after images of `ids` onto the undo
+        stack (positions: quest_positions() of quests the edit removed).
+        """
+        self._undo.push(label, before, edit_journal.quest_images(self._roots(), ids), positions)
+        self._update_undo_actions()
+
+    def _update_undo_actions(self):
+        # Same rule as Clone / Delete: no edits while the XMLs load.
+        allowed = self.clone_action.isEnabled()
+        for action, step, verb in (
+            (self.undo_action, self._undo.undo_step(), "Undo"),
+            (self.redo_action, self._undo.redo_step(), "Redo"),
+        ):
+            action.setEnabled(allowed and step is not None)
+            if step is None:
+                action.setToolTip(verb)
+            else:
+                label = step.label if len(step.label) <= 60 else step.label[:57] + "…"
+                action.setToolTip(f"{verb} {label} ({step.quests} quest(s))")
+
+    def _on_undo(self):
+        self._run_edit(lambda: self._apply_undo(undo=True))
+
+    def _on_redo(self):
+        self._run_edit(lambda: self._apply_undo(undo=False))
+
+    def _apply_undo(self, undo: bool):
+        """Put the quests of the newest undo (or redo) step back to their XML before (after) it."""
+        step = self._undo.undo_step() if undo else self._undo.redo_step()
+        if step is None:
+            self._run_queued_edit()
+            return
+        verb = "Undo" if undo else "Redo"
+        label = f"{verb} {step.label}"
+        target = step.images(undo_stack.BEFORE if undo else undo_stack.AFTER)
+        current = step.images(undo_stack.AFTER if undo else undo_stack.BEFORE)
+        positions = step.positions()
+        if not self._log_edit(
+            lambda journal: journal.log_restore(current, target, label, positions)
+        ):
+            return
+
+        self._stop_search()
+        edit_journal.restore_images(target, self._roots(), positions)
+        if undo:
+            self._undo.undone()
+        else:
+            self._undo.redone()
+        self._update_undo_actions()
+        self._refresh_shown_quests()
+        self._finish_edit(verb, [], label)
+
+    # ---------------- Edit journal ----------------
+
+    def _roots(self) -> dict:
+        return {
+            "QuestInfo": self.questinfo_root,
+            "Check": self.check_root,
+            "Act": self.act_root,
+        }
 
+    def _log_edit(self, write) -> bool:
+        """
+        write(journal) before an edit is applied. False (and a warning) if
+        the journal can't be written; the edit must not go ahead then.
+        """
+        if self._journal is None:
+            return True
+        try:
+            write(self._journal)
+        except OSError as exc:
+            QMessageBox.warning(
+                self,
+                "Edit journal",
+                f"Could not write the edit journal:\n\n{exc}\n\nThe edit was not applied.",
+            )
+            self._run_queued_edit()
+            return False
+        return True
+
+    def _checkpoint_journal(self):
+        """Empty the journal once every loaded file is saved with nothing pending."""
+        if self._journal is None or self._has_pending():
+            return
+        try:
+            self._journal.checkpoint()
+        except OSError:
+            pass  # replaying edits that are already saved is harmless
+
+    def _recover_journal(self):
+        """
+        After loading: edits logged by a session that ended before saving
+        them to every file are replayed or rolled back, then saved.
+        """
+        ops = self._journal.pending() if self._journal is not None else []
+        if not ops:
+            return
+        labels = [op["label"] for op in ops]
+        shown = "\n".join(labels[:15])
+        if len(labels) > 15:
+            shown += f"\n… and {len(labels) - 15} more"
+        reply = QMessageBox.question(
+            self,
+            "Unsaved edits found",
+            f"The last session ended before these {len(ops)} edit(s) were saved to every file:\n\n"
+            f"{shown}\n\n"
+            "Yes: replay them (apply them again where missing) and save.\n"
+            "No: roll them back (put the quests back as they were) and save.",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes,
+        )
+        self._stop_search()
+        if reply == QMessageBox.Yes:
+            edit_journal.replay(ops, self._roots())
+            title = "Replay unsaved edits"
+        else:
+            edit_journal.roll_back(ops, self._roots())
+            title = "Roll back unsaved edits"
+        self._refresh_shown_quests()
+        self._save_changed_files(title, [])
+
+    # ---------------- Backups ----------------
+
+    def _on_restore_backup(self):
+        """Put back a stored version of QuestInfo / Check / Act, then reload the XMLs."""
+        if self._save_job is not None or self._load_job is not None:
+            QMessageBox.information(
+                self, "Restore backup", "Wait for the current load / save to finish."
+            )
+            return
+        if self.transaction_action.isChecked():
+            QMessageBox.information(
+                self, "Restore backup", "Commit or roll back the pending changes first."
+            )
+            return
+
+        choices = []
+        for kind, _tree, path in self._xml_files():
+            if path:
+                choices.extend((kind, path, version) for version in backup_store.versions(path))
+        if not choices:
+            QMessageBox.information(
+                self,
+                "Restore backup",
+                "No backups yet. The previous version of a file is stored every time it is saved.",
+            )
+            return
+        choices.sort(key=lambda choice: choice[2].created, reverse=True)
+
+        labels = []
+        for kind, _path, version in choices:
+            label = (
+                f"{kind} — {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(version.created))}"
+                f" — {version.quests} quests, {version.size / 1048576:.1f} MB"
+            )
+            if version.restored_from is not None:
+                label += f" (restored #{version.restored_from})"
+            labels.append(f"#{version.seq} {label}")
+        label, ok = QInputDialog.getItem(
+            self, "Restore backup", "Version to restore:", labels, 0, False
+        )
+        if not ok:
+            return
+        kind, path, version = choices[labels.index(label)]
+
+        unsaved = [
+            name for name, tree, _path in self._xml_files()
+            if tree is not None and pending_changes(tree)
+        ]
+        reply = QMessageBox.question(
+            self,
+            "Restore backup",
+            f"Replace {os.path.basename(path)} with this version?\n\n{label}\n\n"
+            "The current file is backed up first, so this can be undone the same way. "
+            "All XMLs are reloaded afterwards"
+            + (f"; unsaved changes in {', '.join(unsaved)} are lost." if unsaved else "."),
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No,
+        )
+        if reply != QMessageBox.Yes:
+            return
+        # Unsaved edits are given up: don't offer them for replay later.
+        if self._journal is not None:
+            try:
+                self._journal.checkpoint()
+            except OSError:
+                pass
+
+        # Let go of the file: a memory-mapped file can't be replaced on Windows.
+        tree = {"QuestInfo": self.questinfo_tree, "Check": self.check_tree, "Act": self.act_tree}[kind]
+        if tree is not None:
+            drop_index(tree.getroot())
+        if kind == "QuestInfo":
+            self.questinfo_tree = self.questinfo_root = None
+        elif kind == "Check":
+            self.check_tree = self.check_root = None
+        else:
+            self.act_tree = self.act_root = None
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            backup_store.restore(path, version.seq)
+        except (OSError, backup_store.BackupError) as exc:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.warning(
+                self,
+                "Restore backup",
+                f"Could not restore {os.path.basename(path)}:\n\n{exc}\n\nThe file was not changed.",
+            )
+        else:
+            QApplication.restoreOverrideCursor()
+            self.statusBar().showMessage(
+                f"Restored {os.path.basename(path)} from backup #{version.seq}.", 5000
+            )
+        self._start_load_job()
 
     def _on_preview_ids(self):
         QMessageBox.information(
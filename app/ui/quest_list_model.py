@@ -0,0 +1,114 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Optional
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+from app.xml.questinfo_helpers import QuestList
+
+
+class QuestListModel(QAbstractListModel):
+    """
+    List model over a QuestList (sorted ID array + names).
+
+    Filtering only swaps `rows`, an array of positions into the QuestList
+    that are visible, in display order; nothing is created per quest and the
+    view only asks for the rows on screen.
+
+    row_of() finds a quest's row by ID: a bisect when the rows are in ID
+    order (the unfiltered list and plain filters), a lazily built dict when a
+    ranked search put them in another order.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._quests = QuestList()
+        self._rows: Optional[array] = None  # None = every quest, in ID order
+        self._ordered = True
+        self._row_by_pos: Optional[Dict[int, int]] = None
+
+    # ---------------- Qt model API ----------------
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._quests) if self._rows is None else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        pos = index.row() if self._rows is None else self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{self._quests.ids[pos]}: {self._quests.names[pos]}"
+        if role == Qt.UserRole:
+            return self._quests.ids[pos]
+        return None
+
+    # ---------------- Contents ----------------
+
+    @property
+    def quests(self) -> QuestList:
+        return self._quests
+
+    def set_quests(self, quests: QuestList):
+        """Show a new quest list, unfiltered."""
+        self.beginResetModel()
+        self._quests = quests
+        self._set_rows(None, True)
+        self.endResetModel()
+
+    def set_rows(self, rows: Optional[array], ordered: bool = True):
+        """
+        Show only `rows` (positions into the quest list, in display order),
+        or everything for None. `ordered` says the positions are ascending.
+        """
+        self.beginResetModel()
+        self._set_rows(rows, ordered)
+        self.endResetModel()
+
+    def append_rows(self, rows: array):
+        """Add rows below the current ones (a search streaming in results)."""
+        if not rows:
+            return
+        if self._rows is None:
+            self.set_rows(array("i", rows), ordered=False)
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        self._row_by_pos = None
+        self.endInsertRows()
+
+    def set_ordered(self, ordered: bool):
+        """Tell row_of() whether the current rows are in ID order."""
+        self._ordered = ordered
+        self._row_by_pos = None
+
+    def _set_rows(self, rows: Optional[array], ordered: bool):
+        self._rows = rows
+        self._ordered = ordered
+        self._row_by_pos = None
+
+    # ---------------- Lookups ----------------
+
+    def quest_id(self, row: int) -> Optional[int]:
+        if not 0 <= row < self.rowCount():
+            return None
+        pos = row if self._rows is None else self._rows[row]
+        return self._quests.ids[pos]
+
+    def row_of(self, quest_id: int) -> int:
+        """Visible row showing quest_id, or -1."""
+        pos = self._quests.position(quest_id)
+        if pos < 0 or self._rows is None:
+            return pos
+
+        if self._ordered:
+            row = bisect_left(self._rows, pos)
+            if row < len(self._rows) and self._rows[row] == pos:
+                return row
+            return -1
+
+        if self._row_by_pos is None:
+            self._row_by_pos = {p: r for r, p in enumerate(self._rows)}
+        return self._row_by_pos.get(pos, -1)
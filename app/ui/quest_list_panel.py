@@ -1,12 +1,16 @@
 # app/ui/quest_list_panel.py
+from typing import Optional
+
 from PySide6.QtWidgets import (
     QWidget,
     QVBoxLayout,
     QLineEdit,
-    QListWidget,
+    QListView,
     QLabel,
 )
 
+from .quest_list_model import QuestListModel
+
 
 class QuestListPanel(QWidget):
     """
@@ -25,12 +29,24 @@ class QuestListPanel(QWidget):
         # Search box
         self.search_edit = QLineEdit(self)
         self.search_edit.setPlaceholderText(
-            "Search quests (ID or name)"
+            "Search quests (ID, words, or a query like npc:9010000 lvmin:30..50)"
+        )
+        self.search_edit.setToolTip(
+            "Words match quest text, ID or name. Queries combine fields:\n"
+            "  npc:<id>  mob:<id>  item:<id>  prereq:<id>\n"
+            "  lvmin: exp: area: order: id:  with N, >N, >=N, <N, <=N, A..B\n"
+            "  name:<text>  (quote values with spaces)\n"
+            "Terms are ANDed; use OR, NOT or -term, and ( ) to group.\n"
+            "rx:<regex> matches \"id: name\"; rx.name: rx.summary: rx.reward:\n"
+            "rx.demand: rx.log: rx.type: rx.parent: rx.text: match those fields."
         )
 
 
-        # Quest list
-        self.list_widget = QListWidget(self)
+        # Quest list: a view over the quest arrays, only visible rows are drawn
+        self.model = QuestListModel(self)
+        self.list_view = QListView(self)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setModel(self.model)
 
         # Placeholder label to show until we wire up XML loading
         placeholder_label = QLabel(
@@ -39,5 +55,21 @@ class QuestListPanel(QWidget):
         placeholder_label.setWordWrap(True)
 
         layout.addWidget(self.search_edit)
-        layout.addWidget(self.list_widget)
+        layout.addWidget(self.list_view)
         layout.addWidget(placeholder_label)
+
+    def current_quest_id(self) -> Optional[int]:
+        """Quest ID of the selected row, or None."""
+        index = self.list_view.currentIndex()
+        return self.model.quest_id(index.row()) if index.isValid() else None
+
+    def select_quest(self, quest_id: int, scroll: bool = True) -> bool:
+        """Make quest_id the current row if it is visible. Returns False if not."""
+        row = self.model.row_of(quest_id)
+        if row < 0:
+            return False
+        index = self.model.index(row)
+        self.list_view.setCurrentIndex(index)
+        if scroll:
+            self.list_view.scrollTo(index)
+        return True
@@ -0,0 +1,75 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Signal
+
+from app.logic.quest_search import SearchRequest, search_rows
+from app.logic.regex_search import RegexScanner
+
+
+class QuestSearchJob(QObject):
+    """
+    Runs quest list searches on one worker thread, newest request wins.
+
+    Each search gets a generation number. Starting a new search cancels the
+    one in flight, and the GUI side drops signals from older generations,
+    so a slow search can never overwrite the results of a newer one.
+
+    - rows_found(generation, rows, first) — a chunk of list rows; `first`
+      means the chunk replaces what the list showed before
+    - finished(generation, SearchResult) — the search ran to the end
+    """
+
+    rows_found = Signal(int, object, bool)
+    finished = Signal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quest-search")
+        self._cancel = threading.Event()
+        self._future = None
+        self._scanner = RegexScanner()  # child process for rx: searches
+        self.generation = 0
+
+    def start(self, request: SearchRequest) -> int:
+        """Cancel any running search and queue `request`. Returns its generation."""
+        self.cancel()
+        self.generation += 1
+        self._cancel = threading.Event()
+        self._future = self._executor.submit(self._run, self.generation, request, self._cancel)
+        return self.generation
+
+    def cancel(self, wait: bool = False):
+        """
+        Stop the running search. With wait=True, also wait for the worker to
+        let go of the indexes (call before editing quests).
+        """
+        self._cancel.set()
+        if wait and self._future is not None:
+            try:
+                self._future.result()
+            except Exception:
+                pass
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=True)
+        self._scanner.close()
+
+    # ---------------- Worker side ----------------
+
+    def _run(self, generation: int, request: SearchRequest, cancel: threading.Event):
+        first = [True]
+
+        def emit(chunk):
+            if not cancel.is_set():
+                self.rows_found.emit(generation, chunk, first[0])
+                first[0] = False
+
+        result = search_rows(request, cancel, emit, self._scanner)
+        if result is None or cancel.is_set():
+            return
+        if first[0]:
+            # Nothing matched: still clear the old rows.
+            self.rows_found.emit(generation, result.rows, True)
+        self.finished.emit(generation, result)
@@ -0,0 +1,188 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Signal
+
+from app.xml import xml_loader, snapshot_cache, splice_writer
+from app.xml.quest_index import drop_index, get_index
+from app.xml.reverse_index import build_reverse_index
+from app.xml.text_index import build_text_index, collect_fields
+
+
+class XmlLoadJob(QObject):
+    """
+    Parses QuestInfo / Check / Act at the same time on worker threads.
+
+    Signals are emitted from the worker threads; Qt queues them onto the GUI
+    thread, so slots connected from the main window can touch widgets.
+
+    - snapshot_loaded(kind, QuestSnapshot) — a warm-start cache matched, the
+      UI can browse from it while the XML is still being parsed
+    - progress(bytes_read, total_bytes, quests_seen) — summed over all files
+    - file_loaded(kind, tree) — as soon as one file is done (tree may be None)
+    - finished(cancelled) — after every file has loaded, failed or stopped
+    """
+
+    snapshot_loaded = Signal(str, object)
+    progress = Signal(object, object, int)
+    file_loaded = Signal(str, object)
+    finished = Signal(bool)
+
+    def __init__(self, paths: dict, parent=None, modes=None):
+        """
+        paths: {"QuestInfo": path, "Check": path, "Act": path} (missing → None).
+        modes: optional {kind: xml_loader.LOAD_*}; anything missing loads a full tree.
+        """
+        super().__init__(parent)
+        self._paths = {kind: path for kind, path in paths.items() if path}
+        self._modes = dict(modes or {})
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._bytes = {kind: 0 for kind in self._paths}
+        self._quests = {kind: 0 for kind in self._paths}
+        self._pending = len(self._paths)
+        self.total_bytes = sum(os.path.getsize(p) for p in self._paths.values() if os.path.exists(p))
+        self._executor: ThreadPoolExecutor | None = None
+
+    def start(self):
+        if not self._paths:
+            self.finished.emit(False)
+            return
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self._paths), thread_name_prefix="xml-load"
+        )
+        self._executor.submit(self._run)
+
+    def _run(self):
+        # Snapshots are tiny compared to the XML, so read them all before the
+        # parsers start competing for the interpreter.
+        snapshots = {}
+        for kind, path in self._paths.items():
+            if self._cancel.is_set():
+                break
+            snapshots[kind] = snapshot_cache.load_snapshot(path, kind)
+            if snapshots[kind] is not None:
+                self.snapshot_loaded.emit(kind, snapshots[kind])
+
+        for kind, path in self._paths.items():
+            self._executor.submit(self._load_one, kind, path, snapshots.get(kind))
+        # Workers keep running; don't block anyone waiting for them.
+        self._executor.shutdown(wait=False)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def wait(self):
+        """Block until all workers have returned (used on window close)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    # ---------------- Worker side ----------------
+
+    @staticmethod
+    def _digest(path: str, disk_key):
+        """
+        Content hash of `path`, or None if it can't be read or is no longer
+        the version that was parsed (disk_key).
+        """
+        try:
+            digest = snapshot_cache.content_hash(path)
+            if splice_writer.stat_key(path) != disk_key:
+                return None
+        except OSError:
+            return None
+        return digest
+
+    def _load_one(self, kind: str, path: str, snapshot):
+        def report(done: int, total: int, quests: int):
+            with self._lock:
+                self._bytes[kind] = done
+                self._quests[kind] = quests
+                done_all = sum(self._bytes.values())
+                quests_all = sum(self._quests.values())
+            self.progress.emit(done_all, self.total_bytes, quests_all)
+
+        tree = None
+        fields = None
+        mode = self._modes.get(kind, xml_loader.LOAD_FULL)
+        source_key = children = digest = None
+        try:
+            # The file as it was when parsing started: the snapshot and the
+            # splice source map are only valid for exactly this version.
+            disk_key = splice_writer.stat_key(path)
+            if mode == xml_loader.LOAD_FULL:
+                source_key = disk_key
+            tree = xml_loader.load_xml(
+                path,
+                progress=report,
+                cancel=self._cancel,
+                mode=mode,
+            )
+            if tree is not None:
+                if source_key is not None:
+                    # The quests as parsed, before anything can edit them;
+                    # paired with their byte ranges further down.
+                    children = [c for c in tree.getroot() if c.tag == "imgdir"]
+                # Build the quest-ID and npc:/mob:/item: indexes here rather
+                # than on the GUI thread. A snapshot of this very file
+                # (same content hash) already holds the derived index.
+                get_index(tree.getroot())
+                if snapshot is not None and snapshot.index is not None:
+                    digest = self._digest(path, disk_key)
+                adopted = (
+                    digest is not None
+                    and digest == snapshot.digest
+                    and snapshot_cache.attach_index(tree.getroot(), kind, snapshot)
+                )
+                if not adopted:
+                    build_reverse_index(tree.getroot(), kind)
+                    if kind == "QuestInfo":
+                        fields = collect_fields(tree.getroot())
+        except xml_loader.LoadCancelled:
+            tree = None
+        except Exception:
+            if tree is not None:
+                drop_index(tree.getroot())
+            tree = None
+
+        if not self._cancel.is_set():
+            self.file_loaded.emit(kind, tree)
+
+            # The full-text index is only needed for word searches, so the
+            # list goes up first and the words are indexed afterwards.
+            # Editing stays disabled until finished, so nothing changes the
+            # quests underneath it.
+            if fields is not None:
+                build_text_index(tree.getroot(), fields)
+        elif tree is not None:
+            # Nobody will use this tree; lxml trees stay registered otherwise.
+            drop_index(tree.getroot())
+            tree = None
+
+        # Both of these read the quests as parsed, so they run before
+        # finished: editing is enabled only then, and nothing can have
+        # changed the tree (or the file) underneath them yet.
+        if tree is not None and not self._cancel.is_set():
+            # Verify the warm-start snapshot against the real file contents
+            # and (re)write it when it is missing or stale.
+            if digest is None:
+                digest = self._digest(path, disk_key)
+            if digest is not None and (snapshot is None or snapshot.digest != digest):
+                snapshot_cache.write_snapshot(path, kind, tree.getroot(), digest)
+
+            # Byte ranges of the parsed quests, so saves can splice (rewrite
+            # only the quests that changed). map_source() gives up if the
+            # file changed on disk since source_key.
+            if children is not None:
+                splice_writer.map_source(tree.getroot(), path, source_key, children)
+
+        with self._lock:
+            self._pending -= 1
+            last = self._pending == 0
+        if last:
+            self.finished.emit(self._cancel.is_set())
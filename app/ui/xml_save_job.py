@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Signal
+
+from app.xml import xml_loader
+
+
+class XmlSaveJob(QObject):
+    """
+    Backs up and saves the changed quest files on a worker thread, one file
+    after the other (see xml_loader.save_changes). Each file is written to a
+    temp file and swapped in atomically.
+
+    The quests must not be edited while the job runs; the main window
+    queues edits until finished fires.
+
+    - progress(bytes_written, total_bytes, label) — summed over all files
+    - finished(results) — {kind: changed quest IDs, or the exception that
+      stopped that file}; files that fail keep their changes pending
+    """
+
+    progress = Signal(object, object, str)
+    finished = Signal(object)
+
+    def __init__(self, files, parent=None):
+        """files: [(kind, tree, path), ...] to save if they have changes."""
+        super().__init__(parent)
+        self._files = [
+            (kind, tree, path)
+            for kind, tree, path in files
+            if tree is not None and path and xml_loader.pending_changes(tree)
+        ]
+        self.total_bytes = sum(
+            os.path.getsize(path) for _k, _t, path in self._files if os.path.exists(path)
+        )
+        self._executor: ThreadPoolExecutor | None = None
+
+    def has_work(self) -> bool:
+        return bool(self._files)
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xml-save")
+        self._executor.submit(self._run)
+        self._executor.shutdown(wait=False)
+
+    def wait(self):
+        """Block until the save is done (used on window close)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    # ---------------- Worker side ----------------
+
+    def _run(self):
+        results = {}
+        saved = 0
+        for kind, tree, path in self._files:
+            label = os.path.basename(path)
+
+            def report(done: int, total: int):
+                self.progress.emit(saved + done, max(self.total_bytes, saved + total), label)
+
+            report(0, 0)
+            try:
+                results[kind] = xml_loader.save_changes(tree, path, report)
+            except Exception as exc:
+                results[kind] = exc
+            if os.path.exists(path):
+                saved += os.path.getsize(path)
+        self.finished.emit(results)
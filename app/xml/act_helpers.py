@@ -1,35 +1,34 @@
 # app/xml/act_helpers.py
-import xml.etree.ElementTree as ET
-from typing import Dict, Any, Optional
-from .xml_loader import ensure_imgdir
+from typing import Dict, Optional
+from .backend import ET
+from .xml_loader import child_imgdir, ensure_imgdir, set_child_value
+from .quest_index import get_index
+from .records import Rewards
 
 
-def extract_rewards(root: Optional[ET.Element], quest_id: int) -> Dict[str, Any]:
+def extract_rewards(root: Optional[ET.Element], quest_id: int) -> Rewards:
     """
     Extract rewards from Act.img(.xml) EXACTLY like your old program.
 
     Output:
-        {
-          "exp": "1000",
-          "gainItems": "2000000 10\n2000001 5",
-          "loseItems": "4030000 1"
-        }
+        Rewards(exp=1000,
+                gain_items=[(2000000, 10), (2000001, 5)],
+                lose_items=[(4030000, 1)])
     """
-    info = {
-        "exp": "",
-        "gainItems": "",
-        "loseItems": "",
-    }
-
     if root is None:
-        return info
+        return Rewards()
+    return rewards_from_node(get_index(root).get(quest_id))
+
+
+def rewards_from_node(node: Optional[ET.Element]) -> Rewards:
+    """extract_rewards() for a quest node already in hand."""
+    info = Rewards()
 
-    node = root.find(f"./imgdir[@name='{quest_id}']")
     if node is None:
         return info
 
-    gain = []
-    lose = []
+    gain = info.gain_items
+    lose = info.lose_items
 
     # Search stages (0 and 1)
     for stage in node.findall("./imgdir"):
@@ -38,7 +37,7 @@ def extract_rewards(root: Optional[ET.Element], quest_id: int) -> Dict[str, Any]
             # EXP
             if child.tag == "int" and child.get("name") == "exp":
                 try:
-                    info["exp"] = str(int(child.get("value")))
+                    info.exp = int(child.get("value"))
                 except Exception:
                     pass
 
@@ -61,17 +60,14 @@ def extract_rewards(root: Optional[ET.Element], quest_id: int) -> Dict[str, Any]
 
                     if iid is not None and count is not None:
                         if count >= 0:
-                            gain.append((iid, count))
+                            gain.append(iid, count)
                         else:
-                            lose.append((iid, -count))
-
-    info["gainItems"] = "\n".join(f"{i} {c}" for i, c in gain)
-    info["loseItems"] = "\n".join(f"{i} {c}" for i, c in lose)
+                            lose.append(iid, -count)
 
     return info
 
 
-def apply_rewards(root: Optional[ET.Element], quest_id: int, data: Dict[str, Any]):
+def apply_rewards(root: Optional[ET.Element], quest_id: int, data: Rewards):
     """
     Apply reward data to Act.img just like your old quest helper.
 
@@ -83,6 +79,8 @@ def apply_rewards(root: Optional[ET.Element], quest_id: int, data: Dict[str, Any
     if root is None:
         return
 
+    index = get_index(root)
+    before = index.xml_of(quest_id)
     node = ensure_imgdir(root, str(quest_id))
 
     # Remove all existing reward data
@@ -108,31 +106,11 @@ def apply_rewards(root: Optional[ET.Element], quest_id: int, data: Dict[str, Any
         stage1 = ET.SubElement(node, "imgdir", name="1")
 
     # EXP
-    exp_val = data.get("exp")
-    if exp_val and exp_val.isdigit():
-        ET.SubElement(stage1, "int", name="exp", value=str(int(exp_val)))
-
-    # Parse item lines
-    def parse(text):
-        out = []
-        if not text:
-            return out
-        for line in text.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            line = line.replace("x", " ").replace("X", " ")
-            parts = line.split()
-            if len(parts) != 2:
-                continue
-            try:
-                out.append((int(parts[0]), int(parts[1])))
-            except:
-                pass
-        return out
+    if data.exp is not None and data.exp >= 0:
+        ET.SubElement(stage1, "int", name="exp", value=str(data.exp))
 
-    gain = parse(data.get("gainItems"))
-    lose = parse(data.get("loseItems"))
+    gain = data.gain_items
+    lose = data.lose_items
 
     if gain or lose:
         item_block = ET.SubElement(stage1, "imgdir", name="item")
@@ -149,3 +127,72 @@ def apply_rewards(root: Optional[ET.Element], quest_id: int, data: Dict[str, Any
             idx += 1
             ET.SubElement(row, "int", name="id", value=str(iid))
             ET.SubElement(row, "int", name="count", value=str(-count))
+
+    index.touch(quest_id, before)
+    if index.reverse is not None:
+        # From the node: a negative exp is not written, so it must not be indexed.
+        index.reverse.update_node(quest_id, node)
+
+
+def set_reward_fields(node: ET.Element, values: Dict[str, object]):
+    """
+    Write only the given Rewards fields ({field: value}) into an Act quest
+    node; everything else in it stays as it is. Like apply_rewards(), exp
+    and new item rows go to stage 1 and a replaced exp is taken out of
+    stage 0 too. Replacing gain_items keeps the lose rows (and their extra
+    values) where they are, and the other way round.
+    """
+    if "exp" in values:
+        for stage in node.findall("./imgdir"):
+            set_child_value(stage, "int", "exp", None)
+        exp = values["exp"]
+        if exp is not None and exp >= 0:
+            set_child_value(child_imgdir(node, "1"), "int", "exp", exp)
+
+    replace_gain = "gain_items" in values
+    replace_lose = "lose_items" in values
+    if not (replace_gain or replace_lose):
+        return
+    for stage in node.findall("./imgdir"):
+        block = child_imgdir(stage, "item", create=False)
+        if block is None:
+            continue
+        for row in block.findall("./imgdir"):
+            lose = _row_count(row) < 0
+            if (replace_lose if lose else replace_gain):
+                block.remove(row)
+        _number_rows(stage, block)
+
+    rows = []
+    if replace_gain:
+        rows += [(iid, count) for iid, count in values["gain_items"] or ()]
+    if replace_lose:
+        rows += [(iid, -count) for iid, count in values["lose_items"] or ()]
+    if not rows:
+        return
+    stage1 = child_imgdir(node, "1")
+    block = child_imgdir(stage1, "item")
+    start = len(block.findall("./imgdir"))
+    for idx, (iid, count) in enumerate(rows, start):
+        row = ET.SubElement(block, "imgdir", name=str(idx))
+        ET.SubElement(row, "int", name="id", value=str(iid))
+        ET.SubElement(row, "int", name="count", value=str(count))
+
+
+def _row_count(row: ET.Element) -> int:
+    for i in row.findall("./int"):
+        if i.get("name") == "count":
+            try:
+                return int(i.get("value"))
+            except (TypeError, ValueError):
+                break
+    return 0
+
+
+def _number_rows(stage: ET.Element, block: ET.Element):
+    """Renumber an item list's rows 0, 1, ...; drop the list once it is empty."""
+    rows = block.findall("./imgdir")
+    if not rows:
+        stage.remove(block)
+    for idx, row in enumerate(rows):
+        row.set("name", str(idx))
@@ -0,0 +1,110 @@
+"""
+Crash-safe file writes.
+
+Files are written to a temp file in the same directory, flushed and
+fsynced, then renamed over the original. The rename is atomic, so a crash
+or power loss at any point leaves either the old file or the complete new
+one, never a truncated XML.
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# progress(bytes_written, total_bytes)
+WriteProgress = Callable[[int, int], None]
+
+# Write buffer of the temp file; quests arrive as many small writes.
+BUFFER_SIZE = 1 << 20
+
+# Bytes written between progress callbacks.
+PROGRESS_STEP = 1 << 20
+
+
+def temp_path(path: str) -> str:
+    """Temp file used while writing `path` (same directory, so rename is atomic)."""
+    return path + ".tmp"
+
+
+class _ProgressFile:
+    """
+    Binary file wrapper that counts the bytes written and reports them to
+    `progress` (if any). Bytes copied into the file behind its back (see
+    splice_writer) are added with advance().
+    """
+
+    def __init__(self, f, progress: Optional[WriteProgress], total: int):
+        self._f = f
+        self._progress = progress
+        self._total = total
+        self._reported = 0
+        self.done = 0
+
+    def write(self, data) -> int:
+        n = self._f.write(data)
+        self.advance(n)
+        return n
+
+    def advance(self, n: int):
+        self.done += n
+        if self._progress is not None and self.done - self._reported >= PROGRESS_STEP:
+            self._reported = self.done
+            self._progress(self.done, max(self._total, self.done))
+
+    def flush(self):
+        self._f.flush()
+
+    def fileno(self) -> int:
+        return self._f.fileno()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._f.seek(offset, whence)
+
+
+@contextmanager
+def temp_file(path: str, progress: Optional[WriteProgress] = None, total: int = 0):
+    """
+    Open temp_path(path) for writing. On a clean exit the data is flushed
+    and fsynced (but not yet renamed, see replace()); on an error the temp
+    file is removed. `total` is the expected size, for progress only.
+    """
+    tmp = temp_path(path)
+    f = open(tmp, "wb", buffering=BUFFER_SIZE)
+    try:
+        out = _ProgressFile(f, progress, total)
+        yield out
+        f.flush()
+        os.fsync(f.fileno())
+    except BaseException:
+        f.close()
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    f.close()
+    if progress is not None:
+        progress(out.done, out.done)
+
+
+def replace(tmp: str, path: str):
+    """Rename the finished temp file over `path` and make the rename durable."""
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        os.remove(tmp)
+        raise
+    if os.name == "posix":
+        # The new directory entry only survives a crash once the directory is synced.
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def write_atomic(path: str, write: Callable, progress: Optional[WriteProgress] = None, total: int = 0):
+    """Call write(file) on a temp file, then swap it in with replace()."""
+    with temp_file(path, progress, total) as out:
+        write(out)
+    replace(temp_path(path), path)
@@ -0,0 +1,64 @@
+"""
+XML backend used by all app.xml helpers.
+
+If lxml is installed the helpers run on lxml.etree (faster parsing and
+tostring, O(1) child removal since lxml nodes know their parent). Otherwise they use
+xml.etree.ElementTree exactly as before. Set QUEST_EDITOR_XML_BACKEND=etree
+to force the standard library even when lxml is available.
+
+Only the API both libraries share is used by the helpers; the places where
+they differ (incremental parsing, weak references) are handled here and in
+quest_index.
+"""
+
+import os
+
+try:
+    if os.environ.get("QUEST_EDITOR_XML_BACKEND", "").lower() == "etree":
+        raise ImportError("xml.etree forced by QUEST_EDITOR_XML_BACKEND")
+    from lxml import etree as ET
+
+    HAVE_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+    HAVE_LXML = False
+
+BACKEND_NAME = "lxml" if HAVE_LXML else "xml.etree"
+
+
+class ChunkParser:
+    """
+    Incremental parser fed raw bytes.
+
+    `quests_seen` is the number of top-level children built so far. With
+    xml.etree the root is captured through the element factory as soon as it
+    is created; lxml doesn't expose the partial tree, so there it is only
+    known after close().
+    """
+
+    def __init__(self):
+        self._root = None
+        if HAVE_LXML:
+            self._parser = ET.XMLParser(huge_tree=True)
+        else:
+            make_element = ET.Element
+
+            def element_factory(tag, attrs):
+                elem = make_element(tag, attrs)
+                if self._root is None:
+                    self._root = elem
+                return elem
+
+            self._parser = ET.XMLParser(target=ET.TreeBuilder(element_factory=element_factory))
+
+    def feed(self, data: bytes):
+        self._parser.feed(data)
+
+    @property
+    def quests_seen(self) -> int:
+        return len(self._root) if self._root is not None else 0
+
+    def close(self):
+        self._root = self._parser.close()
+        return self._root
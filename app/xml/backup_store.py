@@ -0,0 +1,393 @@
+"""
+Versioned, deduplicated backups of the quest XMLs.
+
+A backup splits the file into pieces — the header, every top-level quest
+(with the whitespace in front of it) and the tail — and stores each piece
+once, keyed by its content hash. A version is a manifest listing its
+pieces' hashes in file order, so backing up a file in which three quests
+changed adds three small blobs and a manifest, not another full copy.
+
+Layout, next to the data folder:
+    .quest_editor_backups/<file name>/
+        000007.pack       blobs new in version 7, zlib-compressed back to back
+        000007.manifest   MAGIC | u32 header length | marshal(header)
+                          | zlib(marshal([(hash, pack, offset, length), ...]))
+
+A new version shares every blob already in any kept version. Version
+numbers are claimed by creating the manifest file exclusively, so two
+editors backing up the same file never write the same version.
+
+Restoring a version streams its blobs back out into a temp file that then
+replaces the XML (see atomic_file). The newest MAX_VERSIONS versions of each
+file are kept; a pack is deleted once no kept manifest refers to it.
+"""
+
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from . import atomic_file
+from .lazy_loader import ScanError, scan_top_level
+from .splice_writer import stat_key
+
+MAGIC = b"QEBACK\x00\x01"
+BACKUP_DIR_NAME = ".quest_editor_backups"
+
+# Bump when the manifest layout changes; other versions are not listed.
+STORE_VERSION = 1
+
+# Versions kept per file.
+MAX_VERSIONS = 50
+
+# Piece size for files that can't be split into quests.
+FALLBACK_PIECE = 1 << 20
+
+# zlib level for blobs: most of the gain, a fraction of the time of level 6.
+COMPRESS_LEVEL = 1
+
+# (hash, pack number, offset in pack, compressed length)
+BlobRef = Tuple[bytes, int, int, int]
+
+
+# store → (manifests read, {hash: BlobRef} of their blobs), so a backup only
+# reads the manifests added since the last one.
+_blob_cache: Dict[str, Tuple[set, Dict[bytes, BlobRef]]] = {}
+
+
+class BackupError(Exception):
+    """A manifest or blob is missing or does not match its hash."""
+
+
+class BackupVersion:
+    """Header of one stored version (what versions() lists)."""
+
+    __slots__ = ("seq", "created", "size", "quests", "restored_from")
+
+    def __init__(self, seq: int, created: float, size: int, quests: int, restored_from: Optional[int]):
+        self.seq = seq
+        self.created = created
+        self.size = size
+        self.quests = quests
+        self.restored_from = restored_from
+
+
+def store_dir_for(path: str) -> str:
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, BACKUP_DIR_NAME, name)
+
+
+def _hash(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _manifest_path(store: str, seq: int) -> str:
+    return os.path.join(store, f"{seq:06d}.manifest")
+
+
+def _pack_path(store: str, seq: int) -> str:
+    return os.path.join(store, f"{seq:06d}.pack")
+
+
+def _manifest_seqs(store: str) -> List[int]:
+    """Sequence numbers of the stored manifests, oldest first."""
+    try:
+        names = os.listdir(store)
+    except OSError:
+        return []
+    return sorted(
+        int(name[:-len(".manifest")])
+        for name in names
+        if name.endswith(".manifest") and name[:-len(".manifest")].isdigit()
+    )
+
+
+def _pack_seqs(store: str) -> set:
+    try:
+        names = os.listdir(store)
+    except OSError:
+        return set()
+    return {
+        int(name[:-len(".pack")])
+        for name in names
+        if name.endswith(".pack") and name[:-len(".pack")].isdigit()
+    }
+
+
+def _claim_seq(store: str) -> int:
+    """
+    The next free version number, reserved by creating its (empty) manifest
+    exclusively. Unreadable until _write_manifest() replaces it, so the
+    other functions skip it meanwhile.
+    """
+    seqs = _manifest_seqs(store)
+    seq = seqs[-1] + 1 if seqs else 1
+    while True:
+        try:
+            os.close(os.open(_manifest_path(store, seq), os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+            return seq
+        except FileExistsError:
+            seq += 1
+
+
+def _release_seq(store: str, seq: int):
+    """Give up a claimed version that was never written."""
+    try:
+        if os.path.getsize(_manifest_path(store, seq)) == 0:
+            os.remove(_manifest_path(store, seq))
+    except OSError:
+        pass
+
+
+def _read_header(f) -> Dict:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise BackupError("not a backup manifest")
+    (header_len,) = struct.unpack("<I", f.read(4))
+    header = marshal.loads(f.read(header_len))
+    if header.get("version") != STORE_VERSION:
+        raise BackupError("unsupported backup manifest version")
+    return header
+
+
+def _load_manifest(store: str, seq: int) -> Tuple[Dict, List[BlobRef]]:
+    try:
+        with open(_manifest_path(store, seq), "rb") as f:
+            header = _read_header(f)
+            pieces = marshal.loads(zlib.decompress(f.read()))
+    except (OSError, EOFError, ValueError, TypeError, struct.error, zlib.error) as exc:
+        raise BackupError(f"backup {seq} is unreadable: {exc}") from exc
+    return header, pieces
+
+
+def _known_blobs(store: str, seqs: List[int]) -> Dict[bytes, BlobRef]:
+    """Every blob the manifests `seqs` refer to: hash → where it is stored."""
+    read, known = _blob_cache.get(store, (set(), {}))
+    read &= set(seqs)
+    for seq in reversed(seqs):
+        if seq in read:
+            continue
+        try:
+            _header, pieces = _load_manifest(store, seq)
+        except BackupError:
+            continue
+        for ref in pieces:
+            known.setdefault(ref[0], ref)
+        read.add(seq)
+    # Pruning (here or in another editor) deletes packs with their blobs.
+    packs = _pack_seqs(store)
+    if any(ref[1] not in packs for ref in known.values()):
+        known = {digest: ref for digest, ref in known.items() if ref[1] in packs}
+    _blob_cache[store] = (read, known)
+    return known
+
+
+def _write_manifest(store: str, seq: int, header: Dict, pieces: List[BlobRef]):
+    header = dict(header, version=STORE_VERSION)
+    header_bytes = marshal.dumps(header)
+    payload = zlib.compress(marshal.dumps(pieces))
+
+    def write(out):
+        out.write(MAGIC)
+        out.write(struct.pack("<I", len(header_bytes)))
+        out.write(header_bytes)
+        out.write(payload)
+
+    atomic_file.write_atomic(_manifest_path(store, seq), write)
+
+
+def versions(path: str) -> List[BackupVersion]:
+    """Stored versions of `path`, newest first. Unreadable manifests are skipped."""
+    store = store_dir_for(path)
+    found = []
+    for seq in reversed(_manifest_seqs(store)):
+        try:
+            with open(_manifest_path(store, seq), "rb") as f:
+                header = _read_header(f)
+        except (OSError, EOFError, ValueError, struct.error, BackupError):
+            continue
+        found.append(
+            BackupVersion(
+                seq, header["created"], header["size"], header["quests"], header.get("restored_from")
+            )
+        )
+    return found
+
+
+def _split(buf, quests: Optional[List[Tuple[int, int]]]) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    ([(start, end), ...], quest count): byte ranges covering all of `buf` —
+    header, one range per top-level quest (leading whitespace included) and
+    the tail. `quests` are those quest ranges if the caller knows them; they
+    are used if they tile the file, else the file is scanned. Fixed-size
+    ranges if it can't be scanned for quests.
+    """
+    if quests and quests[-1][1] <= len(buf) and all(
+        prev[1] == cur[0] for prev, cur in zip(quests, quests[1:])
+    ):
+        return [(0, quests[0][0])] + list(quests) + [(quests[-1][1], len(buf))], len(quests)
+    try:
+        head_end, last_end, found, _attrib = scan_top_level(buf)
+    except ScanError:
+        head_end = -1
+    if head_end < 0:
+        return [(pos, min(pos + FALLBACK_PIECE, len(buf))) for pos in range(0, len(buf), FALLBACK_PIECE)], 0
+
+    ranges = [(0, head_end)]
+    pos = head_end
+    for _name, _start, end in found:
+        ranges.append((pos, end))
+        pos = end
+    ranges.append((pos, len(buf)))
+    return ranges, len(found)
+
+
+def backup(path: str, quests: Optional[List[Tuple[int, int]]] = None) -> Optional[int]:
+    """
+    Store the current contents of `path` as a new version and return its
+    number; None if `path` does not exist. Nothing is stored when the file
+    is unchanged since the newest version. `quests`: the (gap_start, end)
+    byte range of every top-level quest, if known (saves scanning the file).
+    """
+    if not os.path.exists(path):
+        return None
+    store = store_dir_for(path)
+    seqs = _manifest_seqs(store)
+    key = list(stat_key(path))
+    if seqs:
+        try:
+            with open(_manifest_path(store, seqs[-1]), "rb") as f:
+                if _read_header(f).get("key") == key:
+                    return seqs[-1]
+        except (OSError, EOFError, ValueError, struct.error, BackupError):
+            pass
+
+    os.makedirs(store, exist_ok=True)
+    seq = _claim_seq(store)
+    try:
+        _store_version(path, store, seq, key, quests, _known_blobs(store, seqs))
+    except BaseException:
+        _release_seq(store, seq)
+        raise
+    _blob_cache[store][0].add(seq)
+    _prune(store)
+    return seq
+
+
+def _store_version(path: str, store: str, seq: int, key: list, quests, known: Dict[bytes, BlobRef]):
+    """Write version `seq` of `path`: a pack of the blobs not in `known`, then the manifest."""
+    refs: List[BlobRef] = []
+    blobs: List[bytes] = []
+    pack_size = 0
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            ranges, count = _split(buf, quests)
+            for start, end in ranges:
+                data = buf[start:end]
+                digest = _hash(data)
+                ref = known.get(digest)
+                if ref is None:
+                    blob = zlib.compress(data, COMPRESS_LEVEL)
+                    ref = (digest, seq, pack_size, len(blob))
+                    known[digest] = ref
+                    blobs.append(blob)
+                    pack_size += len(blob)
+                refs.append(ref)
+        finally:
+            if size:
+                buf.close()
+
+    if blobs:
+
+        def write_pack(out):
+            for blob in blobs:
+                out.write(blob)
+
+        atomic_file.write_atomic(_pack_path(store, seq), write_pack)
+    header = {
+        "created": time.time(),
+        "size": size,
+        "quests": count,
+        "key": key,
+        "packs": sorted({ref[1] for ref in refs}),
+    }
+    _write_manifest(store, seq, header, refs)
+
+
+def restore(path: str, seq: int, progress: Optional[atomic_file.WriteProgress] = None):
+    """
+    Rebuild version `seq` of `path` and swap it in atomically. The current
+    file is backed up first, so the restore itself can be undone.
+    Raises BackupError if the version is missing or damaged; `path` is
+    untouched in that case.
+    """
+    store = store_dir_for(path)
+    header, pieces = _load_manifest(store, seq)
+    backup(path)
+
+    packs = {}
+    try:
+        for pack in header["packs"]:
+            f = open(_pack_path(store, pack), "rb")
+            packs[pack] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+        def write(out):
+            for digest, pack, offset, length in pieces:
+                data = zlib.decompress(packs[pack][1][offset:offset + length])
+                if _hash(data) != digest:
+                    raise BackupError(f"backup {seq} is damaged (pack {pack}, offset {offset})")
+                out.write(data)
+
+        atomic_file.write_atomic(path, write, progress, header["size"])
+    except (OSError, ValueError, zlib.error) as exc:
+        raise BackupError(f"could not restore backup {seq}: {exc}") from exc
+    finally:
+        for f, buf in packs.values():
+            buf.close()
+            f.close()
+
+    # The restored file is this version again: record it, so the next
+    # backup finds it unchanged instead of splitting it once more.
+    new_header = dict(
+        header,
+        created=time.time(),
+        key=list(stat_key(path)),
+        restored_from=seq,
+    )
+    new_seq = _claim_seq(store)
+    try:
+        _write_manifest(store, new_seq, new_header, pieces)
+    except BaseException:
+        _release_seq(store, new_seq)
+        raise
+    _prune(store)
+
+
+def _prune(store: str):
+    """Drop all but the newest MAX_VERSIONS manifests, then packs nothing refers to."""
+    seqs = _manifest_seqs(store)
+    for seq in seqs[:-MAX_VERSIONS]:
+        try:
+            os.remove(_manifest_path(store, seq))
+        except OSError:
+            pass
+
+    used = set()
+    for seq in seqs[-MAX_VERSIONS:]:
+        try:
+            with open(_manifest_path(store, seq), "rb") as f:
+                used.update(_read_header(f)["packs"])
+        except (OSError, EOFError, ValueError, struct.error, BackupError):
+            return  # unsure what is still needed: keep every pack
+    for name in os.listdir(store):
+        stem = name[:-len(".pack")]
+        if name.endswith(".pack") and stem.isdigit() and int(stem) not in used:
+            try:
+                os.remove(os.path.join(store, name))
+            except OSError:
+                pass
@@ -1,27 +1,32 @@
 # app/xml/check_helpers.py
-import xml.etree.ElementTree as ET
-from typing import Dict, Any, Optional
-from .xml_loader import ensure_imgdir
+from typing import Dict, Optional
+from .backend import ET
+from .xml_loader import child_imgdir, ensure_imgdir, set_child_value
+from .quest_index import get_index
+from .records import PairList, Requirements
 
+# Requirements list field → (<imgdir name> in a stage, name of the row's value)
+_PAIR_BLOCKS = {
+    "items": ("item", "count"),
+    "mobs": ("mob", "count"),
+    "prereq": ("quest", "state"),
+}
 
-def extract_requirements(root: Optional[ET.Element], quest_id: int) -> Dict[str, Any]:
+
+def extract_requirements(root: Optional[ET.Element], quest_id: int) -> Requirements:
     """
     Extract requirements for a quest from Check.img(.xml).
     Matches your original quest_helper_gui logic.
     """
-    info: Dict[str, Any] = {
-        "startNpc": "",
-        "endNpc": "",
-        "lvmin": "",
-        "items": "",
-        "mobs": "",
-        "prereq": "",
-    }
-
     if root is None:
-        return info
+        return Requirements()
+    return requirements_from_node(get_index(root).get(quest_id))
+
+
+def requirements_from_node(node: Optional[ET.Element]) -> Requirements:
+    """extract_requirements() for a quest node already in hand."""
+    info = Requirements()
 
-    node = root.find(f"./imgdir[@name='{quest_id}']")
     if node is None:
         return info
 
@@ -29,9 +34,9 @@ def extract_requirements(root: Optional[ET.Element], quest_id: int) -> Dict[str,
     end_npc = None
     lvmin = None
 
-    items = []
-    mobs = []
-    prereq = []
+    items = info.items
+    mobs = info.mobs
+    prereq = info.prereq
 
     for stage in node.findall("./imgdir"):
         stage_name = stage.get("name")
@@ -76,7 +81,7 @@ def extract_requirements(root: Optional[ET.Element], quest_id: int) -> Dict[str,
                             elif nm == "count":
                                 count = v
                         if iid is not None and count is not None:
-                            items.append((iid, count))
+                            items.append(iid, count)
 
                 # Mobs
                 elif cname == "mob":
@@ -94,7 +99,7 @@ def extract_requirements(root: Optional[ET.Element], quest_id: int) -> Dict[str,
                             elif nm == "count":
                                 cnt = v
                         if mid is not None and cnt is not None:
-                            mobs.append((mid, cnt))
+                            mobs.append(mid, cnt)
 
                 # Prereq quests
                 elif cname == "quest":
@@ -112,29 +117,24 @@ def extract_requirements(root: Optional[ET.Element], quest_id: int) -> Dict[str,
                             elif nm == "state":
                                 st = v
                         if qid is not None and st is not None:
-                            prereq.append((qid, st))
-
-    if start_npc is not None:
-        info["startNpc"] = str(start_npc)
-    if end_npc is not None:
-        info["endNpc"] = str(end_npc)
-    if lvmin is not None:
-        info["lvmin"] = str(lvmin)
+                            prereq.append(qid, st)
 
-    info["items"] = "\n".join(f"{i} {c}" for i, c in items)
-    info["mobs"] = "\n".join(f"{i} {c}" for i, c in mobs)
-    info["prereq"] = "\n".join(f"{q} {s}" for q, s in prereq)
+    info.start_npc = start_npc
+    info.end_npc = end_npc
+    info.lvmin = lvmin
 
     return info
 
 
-def apply_requirements(root: Optional[ET.Element], qid: int, data: Dict[str, Any]):
+def apply_requirements(root: Optional[ET.Element], qid: int, data: Requirements):
     """
     EXACT port of your working apply_requirements (quest_helper_gui.py).
     """
     if root is None:
         return
 
+    index = get_index(root)
+    before = index.xml_of(qid)
     node = ensure_imgdir(root, str(qid))
 
     # Clear everything first
@@ -145,34 +145,16 @@ def apply_requirements(root: Optional[ET.Element], qid: int, data: Dict[str, Any
     stage0 = ET.SubElement(node, "imgdir", {"name": "0"})
 
     # Start NPC
-    if data.get("startNpc"):
-        ET.SubElement(stage0, "int", {"name": "npc", "value": data["startNpc"]})
+    if data.start_npc is not None:
+        ET.SubElement(stage0, "int", {"name": "npc", "value": str(data.start_npc)})
 
     # lvmin
-    if data.get("lvmin"):
-        ET.SubElement(stage0, "int", {"name": "lvmin", "value": data["lvmin"]})
-
-    # Helper parser
-    def parse_lines(text):
-        results = []
-        if not text:
-            return results
-        for line in text.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            line = line.replace("x", " ").replace("X", " ")
-            parts = line.split()
-            if len(parts) == 2:
-                try:
-                    results.append((int(parts[0]), int(parts[1])))
-                except:
-                    pass
-        return results
+    if data.lvmin is not None:
+        ET.SubElement(stage0, "int", {"name": "lvmin", "value": str(data.lvmin)})
 
-    items = parse_lines(data.get("items"))
-    mobs = parse_lines(data.get("mobs"))
-    prereq = parse_lines(data.get("prereq"))
+    items = data.items
+    mobs = data.mobs
+    prereq = data.prereq
 
     # Items
     if items:
@@ -200,5 +182,47 @@ def apply_requirements(root: Optional[ET.Element], qid: int, data: Dict[str, Any
 
     # Stage 1 = end NPC
     stage1 = ET.SubElement(node, "imgdir", {"name": "1"})
-    if data.get("endNpc"):
-        ET.SubElement(stage1, "int", {"name": "npc", "value": data["endNpc"]})
+    if data.end_npc is not None:
+        ET.SubElement(stage1, "int", {"name": "npc", "value": str(data.end_npc)})
+
+    index.touch(qid, before)
+    if index.reverse is not None:
+        index.reverse.update(qid, data)
+
+
+def set_requirement_fields(node: ET.Element, values: Dict[str, object]):
+    """
+    Write only the given Requirements fields ({field: value}) into a Check
+    quest node; everything else in it stays as it is. None / an empty list
+    removes a field. Like apply_requirements(), the start NPC, lvmin and
+    lists go to stage 0 and the end NPC to stage 1; a replaced lvmin or
+    list is taken out of every stage first.
+    """
+    for field, value in values.items():
+        if field in ("start_npc", "end_npc"):
+            stage = "0" if field == "start_npc" else "1"
+            set_child_value(child_imgdir(node, stage, value is not None), "int", "npc", value)
+            continue
+
+        for stage in node.findall("./imgdir"):
+            if field == "lvmin":
+                set_child_value(stage, "int", "lvmin", None)
+                continue
+            for block in stage.findall("./imgdir"):
+                if block.get("name") == _PAIR_BLOCKS[field][0]:
+                    stage.remove(block)
+
+        if field == "lvmin":
+            if value is not None:
+                set_child_value(child_imgdir(node, "0"), "int", "lvmin", value)
+        elif value:
+            _write_pairs(child_imgdir(node, "0"), field, value)
+
+
+def _write_pairs(stage: ET.Element, field: str, pairs: PairList):
+    block_name, key = _PAIR_BLOCKS[field]
+    block = ET.SubElement(stage, "imgdir", {"name": block_name})
+    for idx, (pair_id, value) in enumerate(pairs):
+        row = ET.SubElement(block, "imgdir", {"name": str(idx)})
+        ET.SubElement(row, "int", {"name": "id", "value": str(pair_id)})
+        ET.SubElement(row, "int", {"name": key, "value": str(value)})
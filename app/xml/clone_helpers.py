@@ -1,5 +1,6 @@
-import xml.etree.ElementTree as ET
 from typing import Tuple, Optional
+from .backend import ET
+from .quest_index import get_index
 
 
 def clone_node(root: ET.Element, old_id: int, new_id: int) -> Tuple[Optional[ET.Element], str]:
@@ -7,18 +8,21 @@ def clone_node(root: ET.Element, old_id: int, new_id: int) -> Tuple[Optional[ET.
     EXACT clone behavior from your old tool.
     Duplicates <imgdir name="old_id"> and renames it to new_id.
     """
-    old = root.find(f"./imgdir[@name='{old_id}']")
+    index = get_index(root)
+    old = index.get(old_id)
     if old is None:
         return None, f"Base quest {old_id} not found."
 
-    # If already exists, delete (old tool overwrote it)
-    existing = root.find(f"./imgdir[@name='{new_id}']")
-    if existing is not None:
-        root.remove(existing)
+    new = copy_quest(old, new_id)
 
-    # Deep copy
-    new = ET.fromstring(ET.tostring(old))
-    new.set("name", str(new_id))
-    root.append(new)
+    # If already exists, the index replaces it (old tool overwrote it)
+    index.append(new)
 
     return new, "OK"
+
+
+def copy_quest(node: ET.Element, new_id: int) -> ET.Element:
+    """Deep copy of a quest node, renamed to new_id; not in any tree yet."""
+    new = ET.fromstring(ET.tostring(node))
+    new.set("name", str(new_id))
+    return new
@@ -0,0 +1,386 @@
+"""
+Write-ahead journal of quest edits.
+
+Every clone / delete is appended to <data folder>/.quest_editor_journal (and
+fsynced) before it touches the trees in memory. Once all three files are
+saved with nothing pending, the journal is emptied (checkpoint). So after a
+crash — or a save that got QuestInfo written but not Check / Act — the
+journal holds exactly the edits that may be missing from some of the files.
+
+Each operation is logged logically (which IDs, with which QuestInfo /
+Requirements / Rewards) together with the XML the affected quests had
+before it, per file. That makes both directions safe to run against
+whatever reached the disk:
+- replay() applies the operations again (applying one twice is a no-op);
+- roll_back() puts the before-images back, newest first.
+Undo / redo are logged as "restore" records (set quests to given XML), bulk
+clones as "bulk_clone" records carrying each new quest's whole XML. Records that
+remove quests also keep where those sat (quest_positions), so putting them
+back restores the file's order.
+
+File layout: a sequence of frames
+    u32 payload length | u32 crc32(payload) | marshal(record)
+A torn frame at the end (crash mid-append) is dropped when the journal is
+opened.
+
+Without a save (transaction mode) nothing empties the journal, and every
+edit adds the before-images of its quests. Once it passes MAX_BYTES it is
+compacted: the pending operations become one "restore" record (the
+oldest before-image and the current XML of each quest they touched), or
+two around an open transaction's "begin". Its size then depends on how
+many quests were edited, not how often.
+"""
+
+import marshal
+import os
+import struct
+import zlib
+from typing import Dict, List, Optional
+
+from . import atomic_file
+from .act_helpers import apply_rewards
+from .check_helpers import apply_requirements
+from .questinfo_helpers import apply_questinfo
+from .quest_index import get_index
+from .records import QuestInfo, Requirements, Rewards
+
+JOURNAL_NAME = ".quest_editor_journal"
+
+_FRAME = struct.Struct("<II")
+
+# Journal size that triggers compaction (see compact()).
+MAX_BYTES = 32 << 20
+
+# file kind → (record type, apply function)
+_APPLY = {
+    "QuestInfo": (QuestInfo, apply_questinfo),
+    "Check": (Requirements, apply_requirements),
+    "Act": (Rewards, apply_rewards),
+}
+
+# Record "op" values. begin / rollback bracket a transaction that was
+# rolled back in memory (see QuestIndex.begin); its edits don't count.
+OP_CLONE = "clone"
+OP_DELETE = "delete"
+OP_RESTORE = "restore"  # set quests to given XML (undo / redo)
+OP_BULK_CLONE = "bulk_clone"  # set new quests to their cloned XML (bulk_clone spec)
+OP_BEGIN = "begin"
+OP_ROLLBACK = "rollback"
+
+
+def quest_images(roots: Dict[str, Optional[object]], ids) -> Dict[str, Dict[str, Optional[bytes]]]:
+    """{kind: {quest name: xml_of() or None}} of `ids` in every loaded file."""
+    images = {}
+    for kind, root in roots.items():
+        if root is None:
+            continue
+        index = get_index(root)
+        images[kind] = {str(qid): index.xml_of(qid) for qid in ids}
+    return images
+
+
+def quest_positions(roots: Dict[str, Optional[object]], ids) -> Dict[str, Dict[str, str]]:
+    """{kind: {quest name: QuestIndex.previous()}} of the `ids` present in each loaded file."""
+    positions = {}
+    for kind, root in roots.items():
+        if root is None:
+            continue
+        positions[kind] = get_index(root).previous_names(ids)
+    return positions
+
+
+class EditJournal:
+    """Append-only edit log of one data folder."""
+
+    def __init__(self, folder: str):
+        self.path = os.path.join(folder, JOURNAL_NAME)
+        self._file = None
+        self._size = 0
+        # Size right after the last compaction; compact() waits for the
+        # journal to double before trying again.
+        self._compacted_size = 0
+        self._records = self._read()
+
+    def _read(self) -> List[dict]:
+        """Records in the file; a torn tail is cut off."""
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        records = []
+        pos = 0
+        while pos + _FRAME.size <= len(data):
+            length, crc = _FRAME.unpack_from(data, pos)
+            payload = data[pos + _FRAME.size:pos + _FRAME.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            try:
+                records.append(marshal.loads(payload))
+            except (EOFError, ValueError, TypeError):
+                break
+            pos += _FRAME.size + length
+        if pos < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(pos)
+                f.flush()
+                os.fsync(f.fileno())
+        self._size = pos
+        return records
+
+    # ---------------- Reading ----------------
+
+    def pending(self) -> List[dict]:
+        """Clone / delete records not yet known to be in every file, oldest first."""
+        return self._segments()[0]
+
+    def _segments(self):
+        """(pending ops, where the open transaction starts in them, or None)."""
+        ops: List[dict] = []
+        begun = 0
+        open_tx = False
+        for record in self._records:
+            op = record["op"]
+            if op == OP_BEGIN:
+                begun = len(ops)
+                open_tx = True
+            elif op == OP_ROLLBACK:
+                del ops[begun:]
+                open_tx = False
+            else:
+                ops.append(record)
+        return ops, (begun if open_tx else None)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def size(self) -> int:
+        """Bytes in the journal file."""
+        return self._size
+
+    # ---------------- Writing ----------------
+
+    def _append(self, record: dict):
+        frame = _frame(record)
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(frame)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._records.append(record)
+        self._size += len(frame)
+
+    def compact(self, roots, max_bytes: Optional[int] = None) -> bool:
+        """
+        Rewrite a journal over `max_bytes` as at most one "restore" record
+        before and one after the open transaction's "begin". Call it only
+        while the trees (roots: {kind: root or None}) hold every logged
+        edit, i.e. before logging the next one. Returns True if compacted.
+        """
+        if max_bytes is None:
+            max_bytes = MAX_BYTES
+        if self._size < max(max_bytes, 2 * self._compacted_size):
+            return False
+        ops, tx_start = self._segments()
+        if any(roots.get(kind) is None for record in ops for kind in record["before"]):
+            return False  # a file that isn't loaded has no current XML
+        begun = len(ops) if tx_start is None else tx_start
+        committed, in_tx = ops[:begun], ops[begun:]
+
+        # The committed part ends where the transaction's first edit of a
+        # quest started; untouched quests are as they are now.
+        tx_before = _oldest_images(in_tx)
+        records = []
+        if committed:
+            records.append(_restore_record(committed, roots, tx_before))
+        if tx_start is not None:
+            records.append({"op": OP_BEGIN})
+        if in_tx:
+            records.append(_restore_record(in_tx, roots, {}))
+
+        frames = [_frame(record) for record in records]
+
+        def write(out):
+            for frame in frames:
+                out.write(frame)
+
+        self.close()
+        atomic_file.write_atomic(self.path, write)
+        self._records = records
+        self._size = self._compacted_size = sum(len(frame) for frame in frames)
+        return True
+
+    def log_clone(self, before, ids, questinfo: QuestInfo, requirements: Requirements, rewards: Rewards, label: str):
+        """
+        Log "write these forms into `ids`" (call before applying it).
+        before: quest_images() of `ids`.
+        """
+        self._append({
+            "op": OP_CLONE,
+            "label": label,
+            "ids": [int(qid) for qid in ids],
+            "data": {
+                "QuestInfo": questinfo.to_tuple(),
+                "Check": requirements.to_tuple(),
+                "Act": rewards.to_tuple(),
+            },
+            "before": before,
+        })
+
+    def log_bulk_clone(self, before, images, label: str):
+        """
+        Log "set each new quest to its cloned XML" (call before applying it).
+        images: {kind: {name: xml or None}} (bulk_clone.clone_images()).
+        """
+        self._append({
+            "op": OP_BULK_CLONE,
+            "label": label,
+            "images": images,
+            "before": before,
+        })
+
+    def log_delete(self, before, ids, label: str, positions=None):
+        """
+        Log "remove `ids` from every file" (call before removing them).
+        positions: quest_positions() of `ids`.
+        """
+        self._append({
+            "op": OP_DELETE,
+            "label": label,
+            "ids": [int(qid) for qid in ids],
+            "before": before,
+            "positions": positions or {},
+        })
+
+    def log_restore(self, before, images, label: str, positions=None):
+        """
+        Log "set these quests to this XML" (images: {kind: {name: xml or
+        None}}), e.g. an undo. before: the quests' current quest_images();
+        positions: where the quests sat when present (quest_positions()).
+        """
+        self._append({
+            "op": OP_RESTORE,
+            "label": label,
+            "images": images,
+            "before": before,
+            "positions": positions or {},
+        })
+
+    def log_begin(self):
+        self._append({"op": OP_BEGIN})
+
+    def log_rollback(self):
+        """The edits since the last log_begin() were undone in memory."""
+        self._append({"op": OP_ROLLBACK})
+
+    def checkpoint(self):
+        """Every file is saved with nothing pending: start an empty journal."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self._records = []
+        self._size = self._compacted_size = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _frame(record: dict) -> bytes:
+    payload = marshal.dumps(record)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _oldest_images(ops: List[dict], key: str = "before") -> Dict[str, Dict[str, Optional[bytes]]]:
+    """{kind: {name: xml}}: each quest's before-image in the first of `ops` that touched it."""
+    images: Dict[str, Dict[str, Optional[bytes]]] = {}
+    for record in ops:
+        for kind, quests in record.get(key, {}).items():
+            into = images.setdefault(kind, {})
+            for name, xml in quests.items():
+                into.setdefault(name, xml)
+    return images
+
+
+def _restore_record(ops: List[dict], roots, after) -> dict:
+    """
+    One "restore" record standing for `ops`: their oldest before-images,
+    and as the result each quest's XML in `after` or else its XML now.
+    """
+    before = _oldest_images(ops)
+    images = {}
+    for kind, quests in before.items():
+        index = get_index(roots[kind])
+        known = after.get(kind, {})
+        images[kind] = {
+            name: known[name] if name in known else index.xml_of(name) for name in quests
+        }
+    label = ops[0]["label"]
+    if len(ops) > 1:
+        label = f"{label} … {ops[-1]['label']} ({len(ops)} edits)"
+    return {
+        "op": OP_RESTORE,
+        "label": label,
+        "images": images,
+        "before": before,
+        "positions": _oldest_images(ops, "positions"),
+    }
+
+
+# ---------------- Recovery ----------------
+
+
+def replay(ops: List[dict], roots) -> int:
+    """
+    Apply `ops` again to the loaded trees (roots: {kind: root or None}).
+    Quests that change become dirty, so the next save writes them.
+    Returns the number of operations applied.
+    """
+    for record in ops:
+        if record["op"] in (OP_RESTORE, OP_BULK_CLONE):
+            restore_images(record["images"], roots, record.get("positions"))
+            continue
+        ids = record["ids"]
+        for kind, root in roots.items():
+            if root is None:
+                continue
+            if record["op"] == OP_DELETE:
+                index = get_index(root)
+                for qid in ids:
+                    index.remove(qid)
+                continue
+            record_type, apply = _APPLY[kind]
+            data = record_type.from_tuple(record["data"][kind])
+            for qid in ids:
+                apply(root, qid, data)
+    return len(ops)
+
+
+def roll_back(ops: List[dict], roots) -> int:
+    """
+    Undo `ops`, newest first, by putting every affected quest back to the
+    XML it had before (in files where it differs). Returns the number of
+    quests changed.
+    """
+    return sum(
+        restore_images(record["before"], roots, record.get("positions"))
+        for record in reversed(ops)
+    )
+
+
+def restore_images(images, roots, positions=None) -> int:
+    """
+    Set every quest in `images` ({kind: {name: xml or None}}) to its XML;
+    quests that are gone go back where `positions` (quest_positions()) says.
+    """
+    changed = 0
+    for kind, quests in images.items():
+        root = roots.get(kind)
+        if root is None:
+            continue
+        changed += get_index(root).restore_all(quests, (positions or {}).get(kind))
+    return changed
@@ -0,0 +1,432 @@
+"""
+Lazy loader for the big files (Check.img.xml / Act.img.xml).
+
+Instead of building a full ElementTree, the file is memory-mapped and
+scanned once for the byte range of every top-level <imgdir name="N">.
+A quest subtree is parsed only when something asks the quest index for
+it, so memory stays roughly flat no matter how large the file is.
+"""
+
+import mmap
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import unescape
+
+from . import atomic_file, splice_writer
+from .backend import ET
+from .quest_index import QuestIndex, set_index
+
+# Every <imgdir ...>, <imgdir .../> and </imgdir>. Only imgdir nests in the
+# quest files, so this is enough to track depth without a real parser.
+_IMGDIR_TAG = re.compile(rb"<(/?)imgdir\b[^>]*?(/?)>")
+_NAME_ATTR = re.compile(rb'\sname="([^"]*)"')
+_ROOT_ATTR = re.compile(rb'(\w+)="([^"]*)"')
+
+# Clean (read-only) quests kept parsed after they were looked at.
+CACHE_SIZE = 256
+
+_XML_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+
+
+class _Entry:
+    """One top-level quest: where it sits in the mapped file."""
+
+    __slots__ = ("name", "gap_start", "start", "end")
+
+    def __init__(self, name: str, gap_start: int, start: int, end: int):
+        self.name = name
+        # Whitespace before the element starts at gap_start (= end of the
+        # previous top-level element), the element itself is [start, end).
+        self.gap_start = gap_start
+        self.start = start
+        self.end = end
+
+
+class ScanError(ValueError):
+    """The file does not look like an <imgdir> quest dump."""
+
+
+def scan_top_level(buf) -> Tuple[int, int, List[Tuple[str, int, int]], Dict[str, str]]:
+    """
+    Find every top-level <imgdir> in `buf` (bytes or mmap).
+
+    Returns (root_open_end, last_child_end, [(name, start, end), ...], root_attrib).
+    """
+    depth = 0
+    root_open_end = -1
+    root_attrib: Dict[str, str] = {}
+    entries: List[Tuple[str, int, int]] = []
+    last_end = -1
+    start = -1
+    name = ""
+
+    for m in _IMGDIR_TAG.finditer(buf):
+        closing, self_closing = m.group(1), m.group(2)
+
+        if closing:
+            depth -= 1
+            if depth == 1:
+                entries.append((name, start, m.end()))
+                last_end = m.end()
+            elif depth == 0:
+                break
+            continue
+
+        if depth == 0:
+            root_open_end = m.end()
+            for k, v in _ROOT_ATTR.findall(m.group(0)):
+                root_attrib[k.decode("utf-8")] = unescape(v.decode("utf-8"), _XML_ENTITIES)
+            depth = 1
+            continue
+
+        if depth == 1:
+            nm = _NAME_ATTR.search(m.group(0))
+            name = unescape(nm.group(1).decode("utf-8"), _XML_ENTITIES) if nm else ""
+            if self_closing:
+                entries.append((name, m.start(), m.end()))
+                last_end = m.end()
+                continue
+            start = m.start()
+
+        if not self_closing:
+            depth += 1
+
+    if root_open_end < 0 or depth != 0:
+        raise ScanError("no complete <imgdir> root element found")
+    if last_end < 0:
+        last_end = root_open_end
+    return root_open_end, last_end, entries, root_attrib
+
+
+class LazyQuestIndex(QuestIndex):
+    """
+    QuestIndex over a memory-mapped file.
+
+    get() parses <imgdir name="N"> from its byte range on demand. Quests that
+    are only read sit in a small LRU; quests handed out for writing (ensure,
+    append) stay pinned in memory until the next write().
+
+    write() may run on a save worker while the GUI keeps reading quests;
+    `_lock` keeps get() off the map while write() swaps in the new file.
+    """
+
+    def __init__(self, root: ET.Element, path: str):
+        self.path = path
+        self._file = None
+        self._mm = None
+        self._order: List[_Entry] = []
+        self._entries: Dict[str, _Entry] = {}
+        self._pinned: Dict[str, ET.Element] = {}
+        self._cache: "OrderedDict[str, ET.Element]" = OrderedDict()
+        self._root_open_end = 0
+        self._tail_start = 0
+        self.root_attrib: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        super().__init__(root)
+
+    # ---------------- Building ----------------
+
+    def _build(self, root: ET.Element):
+        self._map()
+
+    def _map(self):
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        root_open_end, last_end, found, self.root_attrib = scan_top_level(self._mm)
+        self._index_entries(root_open_end, last_end, found)
+
+    def _index_entries(self, root_open_end: int, last_end: int, found):
+        self._root_open_end = root_open_end
+        self._tail_start = last_end
+        self._order = []
+        self._entries = {}
+        self.duplicates = {}
+
+        gap_start = root_open_end
+        for name, start, end in found:
+            entry = _Entry(name, gap_start, start, end)
+            gap_start = end
+            self._order.append(entry)
+            if name in self._entries:
+                self.duplicates[name] = self.duplicates.get(name, 1) + 1
+            else:
+                self._entries[name] = entry
+
+    def quest_ranges(self) -> List[Tuple[int, int]]:
+        """(gap_start, end) of each quest in the mapped file, in file order."""
+        return [(e.gap_start, e.end) for e in self._order if e.start >= 0]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __del__(self):
+        self.close()
+
+    # ---------------- Lookup ----------------
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, quest_id) -> bool:
+        return str(quest_id) in self._entries
+
+    def _materialize(self, entry: _Entry) -> ET.Element:
+        return ET.fromstring(self._mm[entry.start:entry.end])
+
+    def get(self, quest_id) -> Optional[ET.Element]:
+        name = str(quest_id)
+        node = self._pinned.get(name)
+        if node is not None:
+            return node
+
+        with self._lock:
+            node = self._cache.get(name)
+            if node is not None:
+                self._cache.move_to_end(name)
+                return node
+
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+
+            node = self._materialize(entry)
+            self._cache[name] = node
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return node
+
+    def ids(self) -> List[str]:
+        self._in_document_order()
+        return list(self._entries)
+
+    def items(self) -> Iterator[Tuple[str, ET.Element]]:
+        """
+        (name, node) pairs in document order. Quests that are not already in
+        memory are parsed one at a time and not kept.
+        """
+        self._in_document_order()
+        for name, entry in list(self._entries.items()):
+            node = self._pinned.get(name)
+            if node is None:
+                node = self._cache.get(name)
+            if node is None:
+                if entry.start < 0:
+                    continue
+                node = self._materialize(entry)
+            yield name, node
+
+    def _in_document_order(self):
+        if self._in_order:
+            return
+        entries = self._entries
+        self._entries = {e.name: e for e in self._order if entries.get(e.name) is e}
+        self._in_order = True
+
+    # ---------------- Mutation ----------------
+
+    def _pin(self, name: str, node: ET.Element):
+        self._cache.pop(name, None)
+        self._pinned[name] = node
+
+    def append(self, node: ET.Element) -> ET.Element:
+        name = node.get("name")
+        self.remove(name)
+        entry = _Entry(name, -1, -1, -1)
+        self._order.append(entry)
+        self._entries[name] = entry
+        self._pin(name, node)
+        self._changed(name)
+        return node
+
+    def ensure(self, quest_id) -> ET.Element:
+        name = str(quest_id)
+        node = self.get(name)
+        if node is None:
+            return self.append(ET.Element("imgdir", {"name": name}))
+        self._pin(name, node)
+        return node
+
+    def previous_names(self, ids) -> Dict[str, str]:
+        wanted = {}
+        for quest_id in ids:
+            entry = self._entries.get(str(quest_id))
+            if entry is not None:
+                wanted[entry] = str(quest_id)
+        found: Dict[str, str] = {}
+        last = ""
+        for entry in self._order:
+            if len(found) == len(wanted):
+                break
+            name = wanted.get(entry)
+            if name is not None:
+                found[name] = last
+            last = entry.name
+        return found
+
+    def _insert_all(self, inserts: Dict[str, Optional[str]]) -> Dict[str, ET.Element]:
+        new = {name: _Entry(name, -1, -1, -1) for name in inserts}
+        if not new:
+            return {}
+        visible = self._entries
+        self._order = self._placed(
+            self._order, new, inserts, lambda e: e.name if visible.get(e.name) is e else None
+        )
+        self._added(visible, new, inserts)
+        visible.update(new)
+        nodes = {}
+        for name in new:
+            nodes[name] = ET.Element("imgdir", {"name": name})
+            self._pin(name, nodes[name])
+        return nodes
+
+    def remove(self, quest_id) -> Optional[ET.Element]:
+        name = str(quest_id)
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        node = self._pinned.get(name)
+        if node is None:
+            node = self._cache.get(name)
+        if node is None and entry.start >= 0:
+            node = self._materialize(entry)
+        self.remove_all([name])
+        return node
+
+    def remove_all(self, ids) -> int:
+        """Like QuestIndex.remove_all(), without parsing the removed quests."""
+        gone = {}
+        for quest_id in ids:
+            entry = self._entries.pop(str(quest_id), None)
+            if entry is not None:
+                gone[entry] = entry.name
+                self._forget(entry.name)
+        if not gone:
+            return 0
+        if len(gone) == 1:
+            self._order.remove(next(iter(gone)))
+        else:
+            self._order = [e for e in self._order if e not in gone]
+        names = list(gone.values())
+        self._reveal(names)
+        for name in names:
+            self._changed(name)
+        return len(names)
+
+    def _forget(self, name: str):
+        """Drop what is held in memory for a removed quest."""
+        self._pinned.pop(name, None)
+        self._cache.pop(name, None)
+
+    def _reveal(self, names: List[str]):
+        names = [name for name in names if name in self.duplicates]
+        if not names:
+            return
+        wanted = set(names)
+        for other in self._order:
+            if other.name in wanted:
+                self._entries[other.name] = other
+                wanted.discard(other.name)
+                if not wanted:
+                    break
+        self._drop_duplicates(names)
+
+    # ---------------- Transactions ----------------
+
+    def _tables(self):
+        return list(self._order), dict(self._entries), dict(self._pinned), dict(self.duplicates)
+
+    def _set_tables(self, tables):
+        order, entries, pinned, self.duplicates = tables
+        with self._lock:
+            self._order, self._entries, self._pinned = order, entries, pinned
+            self._cache.clear()
+        self._in_order = False
+
+    # ---------------- Saving ----------------
+
+    def _source(self):
+        """Buffer holding the original file bytes (the live map here)."""
+        return self._mm
+
+    def _release_source(self, buf):
+        """Counterpart of _source(); nothing to do for the live map."""
+
+    def write(self, path: str, progress: Optional[atomic_file.WriteProgress] = None):
+        """
+        Write the file: untouched quests are copied byte-for-byte from the
+        original, only dirty quests are serialized (see splice_writer).
+        The new file goes to a temp file first and replaces `path` only once
+        it is complete (see atomic_file). Entry offsets are then updated to
+        the new file.
+        """
+        buf = self._source()
+        tmp = atomic_file.temp_path(path)
+        try:
+            sep = splice_writer.separator(
+                buf, ((e.gap_start, e.start, e.end) for e in self._order if e.start >= 0)
+            )
+            pieces = []
+            for entry in self._order:
+                node = self._pinned.get(entry.name)
+                # Copied unless this is the visible, edited copy of a quest
+                # (a hidden duplicate of a dirty quest was not edited).
+                if entry.start >= 0 and (
+                    node is None
+                    or entry.name not in self.dirty
+                    or self._entries.get(entry.name) is not entry
+                ):
+                    pieces.append((entry.gap_start, entry.start, entry.end))
+                else:
+                    pieces.append((sep, node))
+            src_fd = self._file.fileno() if self._file is not None else None
+            with atomic_file.temp_file(path, progress, len(buf)) as out:
+                offsets, tail_start = splice_writer.write_pieces(
+                    out, src_fd, buf, self._root_open_end, pieces, self._tail_start
+                )
+        finally:
+            self._release_source(buf)
+
+        with self._lock:
+            self._written(path, tmp, offsets, tail_start)
+
+    def _written(self, path: str, tmp: str, offsets, tail_start: int):
+        """Swap the new file in and point every entry at its new byte range."""
+        self.close()
+        try:
+            atomic_file.replace(tmp, path)
+        except OSError:
+            self._reopen()  # still on the original file
+            raise
+        self.path = path
+
+        for entry, (gap_start, start, end) in zip(self._order, offsets):
+            entry.gap_start, entry.start, entry.end = gap_start, start, end
+        self._tail_start = tail_start
+
+        self._pinned.clear()
+        self._cache.clear()
+        self._reopen()
+
+    def _reopen(self):
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def open_lazy(path: str) -> ET.ElementTree:
+    """
+    Map `path` and return an ElementTree whose root has no children: the
+    quests live in the LazyQuestIndex registered for that root and are
+    reached through get_index(root) like any other file.
+    """
+    root = ET.Element("imgdir")
+    index = LazyQuestIndex(root, path)
+    root.attrib.update(index.root_attrib)
+    set_index(root, index)
+    return ET.ElementTree(root)
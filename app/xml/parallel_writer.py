@@ -0,0 +1,262 @@
+"""
+Serialize top-level quests on several cores.
+
+lxml releases the GIL while it serializes, so chunks of quests can be
+turned into bytes on a thread pool and written out in document order. The
+result is byte-for-byte what tree.write() produces (the root's start / end
+tags come from serializing an empty copy of the root the same way).
+
+Work that holds the GIL (wz_writer's dialect walk) gains nothing from
+threads unless the interpreter is free-threaded. With lxml it goes to
+worker processes instead (map_python): each chunk is handed over as the
+bytes lxml's C serializer gives (a fifth to an eighth of the walk's time)
+and parsed again in the worker. xml.etree's serializer is pure Python, so
+without lxml there is nothing cheap to hand over and the work stays on the
+calling thread. benchmarks/bench_parallel_writer.py measures all of them.
+"""
+
+import io
+import multiprocessing
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Iterator, List, Optional, Sequence
+
+from .backend import ET, HAVE_LXML
+
+# Quests per task: large enough to hide the pool overhead, small enough to
+# keep every worker busy until the end.
+CHUNK_QUESTS = 256
+
+# Chunks in flight per worker; bounds how much serialized output waits in memory.
+WINDOW_PER_WORKER = 4
+
+# Below this many quests the pool is not worth starting.
+MIN_PARALLEL = 2 * CHUNK_QUESTS
+
+# A worker parses its chunk again, which costs about 0.6x the walk itself:
+# on two cores that barely breaks even.
+MIN_CORES_FOR_PROCESSES = 3
+
+# Below this many quests the worker processes are not worth starting (or
+# waking: the pool is kept for later saves once started).
+MIN_PROCESSES = 8 * CHUNK_QUESTS
+
+_PLACEHOLDER = "quest-editor-children"
+
+# Spawn everywhere, as regex_search does: forking the GUI process with its
+# Qt and worker threads running is not safe.
+_MP = multiprocessing.get_context("spawn")
+
+_pool_lock = threading.Lock()
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_count = 0
+
+
+# No GIL (a free-threaded build with every loaded extension supporting it):
+# Python-level serializers scale on threads too.
+FREE_THREADED = not getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+def workers(releases_gil: bool = True) -> int:
+    """
+    Serializer threads to use (1 = serialize on the calling thread).
+    releases_gil=False is for Python-level work (wz_writer.quest_bytes).
+    """
+    if FREE_THREADED or (releases_gil and HAVE_LXML):
+        return os.cpu_count() or 1
+    return 1
+
+
+def processes() -> int:
+    """
+    Worker processes for Python-level work (1 = run it in this process);
+    see map_python(). Needs lxml to hand the quests over cheaply.
+    """
+    cores = os.cpu_count() or 1
+    if FREE_THREADED or not HAVE_LXML or cores < MIN_CORES_FOR_PROCESSES:
+        return 1
+    return cores
+
+
+def tostring(node: ET.Element, with_tail: bool) -> bytes:
+    if HAVE_LXML:
+        return ET.tostring(node, encoding="utf-8", xml_declaration=False, with_tail=with_tail)
+    if with_tail:
+        return ET.tostring(node, encoding="utf-8", xml_declaration=False)
+    tail = node.tail
+    node.tail = None
+    try:
+        return ET.tostring(node, encoding="utf-8", xml_declaration=False)
+    finally:
+        node.tail = tail
+
+
+def _chunk(fn: Callable[[ET.Element], bytes], nodes: Sequence[ET.Element]) -> List[bytes]:
+    return [fn(node) for node in nodes]
+
+
+def _chunks(nodes: Sequence[ET.Element]) -> Iterator[Sequence[ET.Element]]:
+    return (nodes[i:i + CHUNK_QUESTS] for i in range(0, len(nodes), CHUNK_QUESTS))
+
+
+def map_ordered(
+    fn: Callable[[ET.Element], bytes],
+    nodes: Sequence[ET.Element],
+    count: Optional[int] = None,
+) -> Iterator[bytes]:
+    """fn(node) for each node, in order, on `count` threads (default: workers())."""
+    if count is None:
+        count = workers()
+    if count < 2 or len(nodes) < MIN_PARALLEL:
+        for node in nodes:
+            yield fn(node)
+        return
+
+    window = count * WINDOW_PER_WORKER
+    with ThreadPoolExecutor(max_workers=count, thread_name_prefix="xml-serialize") as pool:
+        pending = deque()
+        for chunk in _chunks(nodes):
+            pending.append(pool.submit(_chunk, fn, chunk))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        for future in pending:
+            yield from future.result()
+
+
+def map_python(fn: Callable[[ET.Element], bytes], nodes: Sequence[ET.Element]) -> Iterator[bytes]:
+    """
+    fn(node) for each node, in order, for an `fn` that holds the GIL
+    (wz_writer.quest_bytes): on threads when the interpreter is
+    free-threaded, else on worker processes (map_reparsed).
+    """
+    if FREE_THREADED:
+        return map_ordered(fn, nodes, workers(releases_gil=False))
+    return map_reparsed(fn, nodes)
+
+
+def _reparsed(fn: Callable[[ET.Element], bytes], blobs: List[bytes]) -> List[bytes]:
+    """Worker process side of map_reparsed()."""
+    return [fn(ET.fromstring(blob)) for blob in blobs]
+
+
+def map_reparsed(
+    fn: Callable[[ET.Element], bytes],
+    nodes: Sequence[ET.Element],
+    count: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    fn(node) for each node, in order, on `count` worker processes (default:
+    processes()). Each chunk is sent as XML and parsed again there, so `fn`
+    must be picklable and only look at the node's own subtree. If the pool
+    breaks, the rest is done in this process.
+    """
+    if count is None:
+        count = processes()
+    if count < 2 or len(nodes) < MIN_PROCESSES:
+        yield from _chunk(fn, nodes)
+        return
+
+    pool = _pool(count)
+    window = count * WINDOW_PER_WORKER
+    pending = deque()
+    for chunk in _chunks(nodes):
+        future = None
+        if pool is not None:
+            try:
+                future = pool.submit(_reparsed, fn, [tostring(node, with_tail=False) for node in chunk])
+            except BrokenProcessPool:
+                pool = _drop_pool()
+        pending.append((chunk, future))
+        if len(pending) >= window:
+            yield from _result(fn, *pending.popleft())
+    for chunk, future in pending:
+        yield from _result(fn, chunk, future)
+
+
+def _result(fn, chunk, future) -> List[bytes]:
+    if future is not None:
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            _drop_pool()
+    return _chunk(fn, chunk)
+
+
+def _pool(count: int) -> ProcessPoolExecutor:
+    """The worker processes, started on first use and kept for later saves."""
+    global _process_pool, _process_count
+    with _pool_lock:
+        if _process_pool is not None and _process_count != count:
+            _process_pool.shutdown(wait=False)
+            _process_pool = None
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=count, mp_context=_MP)
+            _process_count = count
+        return _process_pool
+
+
+def _drop_pool() -> None:
+    """Forget a broken pool; the next call starts a new one."""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False)
+        _process_pool = None
+
+
+def serialize_many(nodes: Sequence[ET.Element], with_tail: bool = False) -> Iterator[bytes]:
+    """tostring() of each node, in order, spread over the available cores."""
+    return map_ordered(partial(tostring, with_tail=with_tail), nodes)
+
+
+def _root_shell(root: ET.Element):
+    """
+    (head, foot): the bytes tree.write() puts before the first and after the
+    last child of `root` (XML declaration, start tag and text / end tag).
+    Only used with lxml.
+    """
+    shell = ET.Element(root.tag, dict(root.attrib))
+    shell.text = root.text
+    ET.SubElement(shell, _PLACEHOLDER)
+    buf = io.BytesIO()
+    ET.ElementTree(shell).write(buf, encoding="utf-8", xml_declaration=True)
+    head, _sep, foot = buf.getvalue().partition(f"<{_PLACEHOLDER}/>".encode("ascii"))
+    return head, foot
+
+
+def _plain_tree(tree) -> bool:
+    """
+    True if the document is just a namespace-free root element (no doctype,
+    comments or PIs around it), so _root_shell() reproduces it exactly.
+    """
+    root = tree.getroot()
+    return (
+        root.getprevious() is None
+        and root.getnext() is None
+        and not root.nsmap
+        and not tree.docinfo.doctype
+    )
+
+
+def write_tree(tree, out):
+    """
+    Same bytes as tree.write(out, encoding="utf-8", xml_declaration=True),
+    with the top-level children serialized in parallel.
+    """
+    root = tree.getroot()
+    children = list(root)
+    if workers() < 2 or len(children) < MIN_PARALLEL or not _plain_tree(tree):
+        tree.write(out, encoding="utf-8", xml_declaration=True)
+        return
+
+    head, foot = _root_shell(root)
+    out.write(head)
+    for data in serialize_many(children, with_tail=True):
+        out.write(data)
+    out.write(foot)
+
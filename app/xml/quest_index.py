@@ -0,0 +1,512 @@
+import re
+import weakref
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .backend import ET, HAVE_LXML
+
+
+class QuestIndex:
+    """
+    ID → <imgdir> lookup table for the top level of one quest file
+    (QuestInfo / Check / Act).
+
+    root.find("./imgdir[@name='...']") walks every top-level child, which is
+    slow on full v83 dumps. The index is built once and kept current by
+    append() / remove(), so all helpers should add and delete quests through
+    it instead of touching the root directly.
+
+    Like root.find(), the *first* <imgdir> with a given name wins. Any later
+    duplicates are counted in `duplicates` so the UI can report them.
+
+    `reverse` optionally holds a ReverseIndex (see reverse_index) that is
+    told about every quest added or removed here.
+
+    `dirty` holds the names of quests added, removed or rewritten since the
+    file was last saved; an empty set means the file on disk is current.
+    The apply_* helpers compare a quest's XML before and after (xml_of /
+    touch), so rewriting it with the same data does not count.
+
+    `source_map` optionally holds a splice_writer.SourceMap for fully loaded
+    trees, so saves only re-serialize the dirty quests.
+
+    begin() / rollback() undo every change since a savepoint from memory
+    (transaction mode in the main window).
+    """
+
+    def __init__(self, root: ET.Element):
+        self._root_ref = _ref(root)
+        self._nodes: Dict[str, ET.Element] = {}
+        self.duplicates: Dict[str, int] = {}
+        self.reverse = None
+        self.dirty: Set[str] = set()
+        self.source_map = None
+        # (tables, dirty, {node: XML before its first in-place edit}) while a
+        # transaction is open, see begin().
+        self._savepoint = None
+        # False once _nodes is no longer in document order; see ids().
+        self._in_order = True
+        self._build(root)
+
+    def _build(self, root: ET.Element):
+        nodes = self._nodes
+        for child in root:
+            if child.tag != "imgdir":
+                continue
+            name = child.get("name")
+            if name is None:
+                continue
+            if name in nodes:
+                self.duplicates[name] = self.duplicates.get(name, 1) + 1
+                continue
+            nodes[name] = child
+
+    @property
+    def root(self) -> Optional[ET.Element]:
+        return self._root_ref()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, quest_id) -> bool:
+        return str(quest_id) in self._nodes
+
+    def get(self, quest_id) -> Optional[ET.Element]:
+        """Return <imgdir name='quest_id'> or None."""
+        return self._nodes.get(str(quest_id))
+
+    def ids(self) -> List[str]:
+        """Indexed quest names, in document order."""
+        self._in_document_order()
+        return list(self._nodes)
+
+    def items(self) -> Iterator[Tuple[str, ET.Element]]:
+        """(name, node) pairs in document order."""
+        self._in_document_order()
+        return iter(list(self._nodes.items()))
+
+    def _in_document_order(self):
+        """
+        Lookups by name don't need document order, so quests put back
+        mid-file are only added to `_nodes`; it is re-sorted from the root
+        here, once, when the order is asked for.
+        """
+        if self._in_order:
+            return
+        nodes = self._nodes
+        ordered = {}
+        for child in self.root:
+            if child.tag == "imgdir":
+                name = child.get("name")
+                if nodes.get(name) is child:
+                    ordered[name] = child
+        self._nodes = ordered
+        self._in_order = True
+
+    def close(self):
+        """Release what the index keeps open (a lazy index's mapped file); see drop_index()."""
+
+    def append(self, node: ET.Element) -> ET.Element:
+        """
+        Append a top-level <imgdir> to the root, replacing any existing quest
+        with the same name (old tool behavior when cloning over an ID).
+        """
+        name = node.get("name")
+        self.remove(name)
+        self.root.append(node)
+        self._nodes[name] = node
+        self._changed(name)
+        return node
+
+    def ensure(self, quest_id) -> ET.Element:
+        """Return existing <imgdir name='quest_id'> or create it."""
+        name = str(quest_id)
+        node = self._nodes.get(name)
+        if node is None:
+            node = ET.SubElement(self.root, "imgdir", {"name": name})
+            self._nodes[name] = node
+            self._changed(name)
+        return node
+
+    def previous(self, quest_id) -> Optional[str]:
+        """
+        Name of the quest right before `quest_id` in the file ("" if it is
+        the first), so restore() can put it back there; None if absent.
+        """
+        return self.previous_names([quest_id]).get(str(quest_id))
+
+    def previous_names(self, ids) -> Dict[str, str]:
+        """previous() of each of `ids` that is present, in one pass at most."""
+        wanted = {}
+        for quest_id in ids:
+            node = self._nodes.get(str(quest_id))
+            if node is not None:
+                wanted[node] = str(quest_id)
+        found: Dict[str, str] = {}
+        if not wanted:
+            return found
+        if HAVE_LXML:  # lxml nodes know their siblings
+            for node, name in wanted.items():
+                before = node.getprevious()
+                while before is not None and before.tag != "imgdir":
+                    before = before.getprevious()
+                found[name] = "" if before is None else before.get("name", "")
+            return found
+        last = ""
+        for child in self.root:
+            if child.tag != "imgdir":
+                continue
+            name = wanted.get(child)
+            if name is not None:
+                found[name] = last
+                if len(found) == len(wanted):
+                    break
+            last = child.get("name", "")
+        return found
+
+    def _insert_all(self, inserts: Dict[str, Optional[str]]) -> Dict[str, ET.Element]:
+        """
+        New empty <imgdir>s, each the visible copy of its name, placed by
+        `inserts` ({name: quest to put it right after; "" = first; None or not
+        there = at the end}) in one pass over the root. Returns {name: node}.
+        """
+        nodes = {name: ET.Element("imgdir", {"name": name}) for name in inserts}
+        if not nodes:
+            return nodes
+        visible = self._nodes
+
+        def visible_name(child):
+            name = child.get("name") if child.tag == "imgdir" else None
+            return name if visible.get(name) is child else None
+
+        root = self.root
+        if HAVE_LXML:  # lxml puts a node next to another without moving the rest
+            self._link(root, nodes, inserts)
+        else:
+            root[:] = self._placed(list(root), nodes, inserts, visible_name)
+        self._added(visible, nodes, inserts)
+        visible.update(nodes)
+        return nodes
+
+    @staticmethod
+    def _following(inserts: Dict[str, Optional[str]]) -> Dict[Optional[str], List[str]]:
+        """{after: [names to put right after it, in order]}"""
+        following: Dict[Optional[str], List[str]] = {}
+        for name, after in inserts.items():
+            following.setdefault(after, []).append(name)
+        return following
+
+    @staticmethod
+    def _chain(following: dict, after: Optional[str]) -> Iterator[str]:
+        """The names that go right after `after`, each followed by its own followers."""
+        todo = following.pop(after, [])[::-1]
+        while todo:
+            name = todo.pop()
+            yield name
+            todo.extend(following.pop(name, [])[::-1])
+
+    @classmethod
+    def _placed(cls, items: list, new: dict, inserts: Dict[str, Optional[str]], visible_name) -> list:
+        """
+        `items` (root children or lazy entries) with the `new` {name: item}
+        put in as `inserts` says (see _insert_all). visible_name(item) is the
+        item's quest name if it is the visible copy, else None.
+        """
+        following = cls._following(inserts)
+        out = [new[name] for name in cls._chain(following, "")]
+        for item in items:
+            out.append(item)
+            if following:
+                name = visible_name(item)
+                # A name being put back takes its followers along (_chain).
+                if name is not None and name in following and name not in new:
+                    out.extend(new[n] for n in cls._chain(following, name))
+        for after in list(following):  # None, or anchors that are not there
+            out.extend(new[name] for name in cls._chain(following, after))
+        return out
+
+    def _link(self, root: ET.Element, nodes: dict, inserts: Dict[str, Optional[str]]):
+        """_placed() for lxml, node by node: the same order, no pass over the root."""
+        following = self._following(inserts)
+
+        def put(after, last):
+            for name in self._chain(following, after):
+                if last is None:
+                    root.insert(0, nodes[name])
+                else:
+                    last.addnext(nodes[name])
+                last = nodes[name]
+
+        put("", None)
+        for after in [a for a in following if a is not None and a not in nodes]:
+            anchor = self._nodes.get(after)
+            if anchor is not None:
+                put(after, anchor)
+        for after in list(following):  # None, or anchors that are not there
+            put(after, root[-1] if len(root) else None)
+
+    def _added(self, table: dict, new: dict, inserts: Dict[str, Optional[str]]):
+        """Count the names `new` shadows in `table`; note when it left document order."""
+        for name in new:
+            if name in table:
+                self.duplicates[name] = self.duplicates.get(name, 1) + 1
+                self._in_order = False
+        if any(after is not None for after in inserts.values()):
+            self._in_order = False
+
+    def remove(self, quest_id) -> Optional[ET.Element]:
+        """Remove a quest from root + index. Returns the removed node (or None)."""
+        name = str(quest_id)
+        node = self._nodes.pop(name, None)
+        if node is None:
+            return None
+        self.root.remove(node)
+        self._reveal([name])
+        self._changed(name)
+        return node
+
+    def remove_all(self, ids) -> int:
+        """remove() for many quests at once. Returns how many were there."""
+        if HAVE_LXML:  # removing an lxml node doesn't scan its siblings
+            return sum(self.remove(quest_id) is not None for quest_id in ids)
+        gone = {}
+        for quest_id in ids:
+            node = self._nodes.pop(str(quest_id), None)
+            if node is not None:
+                gone[node] = str(quest_id)
+        if not gone:
+            return 0
+        root = self.root
+        root[:] = [child for child in root if child not in gone]
+        names = list(gone.values())
+        self._reveal(names)
+        for name in names:
+            self._changed(name)
+        return len(names)
+
+    def _reveal(self, names: List[str]):
+        """`names` were removed: a duplicate further down becomes the visible one."""
+        names = [name for name in names if name in self.duplicates]
+        if not names:
+            return
+        wanted = set(names)
+        for child in self.root:
+            name = child.get("name") if child.tag == "imgdir" else None
+            if name in wanted:
+                self._nodes[name] = child
+                wanted.discard(name)
+                if not wanted:
+                    break
+        self._drop_duplicates(names)
+
+    def _drop_duplicates(self, names: List[str]):
+        for name in names:
+            left = self.duplicates[name] - 1
+            if left > 1:
+                self.duplicates[name] = left
+            else:
+                del self.duplicates[name]
+        self._in_order = False  # the revealed copies were added at the end
+
+    def _changed(self, name: str):
+        """
+        Quest `name` was added or removed: mark it dirty and re-read it into
+        the reverse index (drops it if gone).
+        """
+        self.dirty.add(name)
+        if self.reverse is not None:
+            self.reverse.update_node(name, self.get(name))
+
+    # ---------------- Dirty tracking ----------------
+
+    def xml_of(self, quest_id) -> Optional[bytes]:
+        """Serialized quest, to hand to touch() after editing it in place."""
+        node = self.get(quest_id)
+        return None if node is None else ET.tostring(node, encoding="utf-8")
+
+    def touch(self, quest_id, before: Optional[bytes]) -> bool:
+        """
+        Mark the quest dirty if its XML differs from `before` (xml_of() taken
+        before the edit). Indentation doesn't count: the apply_* helpers
+        rebuild a node without it. Returns True if it changed.
+        """
+        name = str(quest_id)
+        if before is not None and _same_xml(self.xml_of(name), before):
+            return False
+        self.dirty.add(name)
+        if self._savepoint is not None and before is not None:
+            self._savepoint[2].setdefault(self.get(name), before)
+        return True
+
+    def restore(self, quest_id, xml: Optional[bytes], after: Optional[str] = None) -> bool:
+        """
+        Set a quest back to `xml` (xml_of() output; None removes it), marking
+        it dirty if that changes anything. Returns True if it did.
+
+        after: previous() of the quest when `xml` was taken, for a quest an
+        edit removed. It is put back there (at the end without it), also
+        when the name is now held by a duplicate from elsewhere in the file.
+        """
+        name = str(quest_id)
+        return self.restore_all({name: xml}, None if after is None else {name: after}) > 0
+
+    def restore_all(
+        self, images: Dict[str, Optional[bytes]], positions: Optional[Dict[str, str]] = None
+    ) -> int:
+        """
+        restore() for many quests: images {name: xml or None}, positions
+        {name: after} for those an edit removed. The quests that go back in
+        are placed together in one pass over the file, each right after its
+        `after` even when that one is being put back too. Returns how many
+        quests changed.
+        """
+        positions = positions or {}
+        images = {str(name): xml for name, xml in images.items()}
+        changed = self.remove_all(name for name, xml in images.items() if xml is None)
+        now = self.previous_names(
+            name for name, xml in images.items() if xml is not None and name in positions
+        )
+        inserts: Dict[str, Optional[str]] = {}
+        for name, xml in images.items():
+            if xml is None:
+                continue
+            after = positions.get(name)
+            if name not in self or (after is not None and now.get(name) != after):
+                inserts[name] = after
+                continue
+            before = self.xml_of(name)
+            if before != xml:
+                self._restored(name, self.ensure(name), xml, before)
+                changed += 1
+        for name, node in self._insert_all(inserts).items():
+            self._restored(name, node, images[name], None)
+        return changed + len(inserts)
+
+    def _restored(self, name: str, node: ET.Element, xml: bytes, before: Optional[bytes]):
+        _restore_node(node, xml)
+        self.touch(name, before)
+        if self.reverse is not None:
+            self.reverse.update_node(name, node)
+
+    def clear_dirty(self):
+        """The file was saved: nothing is pending any more."""
+        self.dirty.clear()
+        if self._savepoint is not None:
+            self.begin()  # the saved state is the new starting point
+
+    # ---------------- Transactions ----------------
+
+    def begin(self):
+        """
+        Open a transaction: rollback() undoes every change made from here on
+        without going back to the file. Only the lookup tables are copied;
+        quests edited in place are kept as XML by touch() when they first
+        change.
+        """
+        self._savepoint = (self._tables(), set(self.dirty), {})
+
+    def in_transaction(self) -> bool:
+        return self._savepoint is not None
+
+    def commit(self):
+        """Close the transaction, keeping its changes (still in `dirty` until saved)."""
+        self._savepoint = None
+
+    def rollback(self) -> Set[str]:
+        """
+        Undo every change since begin() and close the transaction. Returns
+        the names of the quests that changed back.
+        """
+        tables, dirty, originals = self._savepoint
+        self._savepoint = None
+        names = (self.dirty - dirty) | {node.get("name") for node in originals}
+        for node, before in originals.items():
+            _restore_node(node, before)
+        self._set_tables(tables)
+        self.dirty = dirty
+        if self.reverse is not None:
+            for name in names:
+                self.reverse.update_node(name, self.get(name))
+        return names
+
+    def _tables(self):
+        """What begin() saves besides the quests (overridden by the lazy indexes)."""
+        return list(self.root), dict(self._nodes), dict(self.duplicates)
+
+    def _set_tables(self, tables):
+        children, self._nodes, self.duplicates = tables
+        self.root[:] = children
+        self._in_order = False  # the saved table may predate a re-sort
+
+
+# Whitespace between two tags (WZ XML has no other text).
+_BETWEEN_TAGS = re.compile(rb">\s+<")
+
+
+def _same_xml(a: Optional[bytes], b: bytes) -> bool:
+    if a == b:
+        return True
+    return a is not None and _BETWEEN_TAGS.sub(b"><", a).strip() == _BETWEEN_TAGS.sub(b"><", b).strip()
+
+
+def _restore_node(node: ET.Element, before: bytes):
+    """Put xml_of() output back into `node`, keeping the node itself."""
+    saved = ET.fromstring(before)
+    node.attrib.clear()
+    node.attrib.update(saved.attrib)
+    node.text = saved.text
+    node[:] = list(saved)
+
+
+def _ref(root: ET.Element):
+    """Weak reference to root where the backend allows it (lxml nodes don't)."""
+    try:
+        return weakref.ref(root)
+    except TypeError:
+        return lambda: root
+
+
+# One index per loaded root. Weak keys so closing/reloading a file
+# drops its index together with the tree. lxml elements can't be weakly
+# referenced, so those are held strongly until drop_index(): whoever
+# discards a tree must call it.
+_indexes: "weakref.WeakKeyDictionary[ET.Element, QuestIndex]" = weakref.WeakKeyDictionary()
+_strong_indexes: Dict[ET.Element, QuestIndex] = {}
+
+
+def _registry_for(root: ET.Element):
+    try:
+        weakref.ref(root)
+    except TypeError:
+        return _strong_indexes
+    return _indexes
+
+
+def get_index(root: ET.Element) -> QuestIndex:
+    """Return the QuestIndex for `root`, building it on first use."""
+    registry = _registry_for(root)
+    index = registry.get(root)
+    if index is None:
+        index = QuestIndex(root)
+        registry[root] = index
+    return index
+
+
+def peek_index(root: ET.Element) -> Optional[QuestIndex]:
+    """Return the cached index for `root` without building one."""
+    return _registry_for(root).get(root)
+
+
+def set_index(root: ET.Element, index: QuestIndex):
+    """Register a prebuilt index (e.g. a lazy one) for `root`."""
+    _registry_for(root)[root] = index
+
+
+def drop_index(root: ET.Element):
+    """
+    Forget the cached index for `root` and close it, when the tree is
+    discarded (reloaded, replaced, load cancelled). Under lxml the index and
+    with it the whole tree stay in memory until this is called.
+    """
+    index = _registry_for(root).pop(root, None)
+    if index is not None:
+        index.close()
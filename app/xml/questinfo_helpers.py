@@ -1,40 +1,57 @@
 # app/xml/questinfo_helpers.py
-import xml.etree.ElementTree as ET
-from typing import Dict, Any, Optional, List, Tuple
-from .xml_loader import ensure_imgdir
+from array import array
+from bisect import bisect_left
+from typing import Dict, Optional, List, Tuple, Iterator
+from .backend import ET
+from .xml_loader import ensure_imgdir, set_child_value
+from .quest_index import get_index
+from .records import QuestInfo
+
+# <string name="..."> → QuestInfo field, in the order apply_questinfo writes them.
+_STRING_FIELDS: Dict[str, str] = {
+    "name": "name",
+    "summary": "summary",
+    "rewardSummary": "reward_summary",
+    "demandSummary": "demand_summary",
+    "0": "log0",
+    "1": "log1",
+    "2": "log2",
+    "type": "type",
+    "parent": "parent",
+}
+
+# QuestInfo field → (tag, name) of its node, for set_questinfo_fields().
+_FIELD_NODES: Dict[str, Tuple[str, str]] = {
+    field: ("string", name) for name, field in _STRING_FIELDS.items()
+}
+_FIELD_NODES.update({
+    "area": ("int", "area"),
+    "order": ("int", "order"),
+    "auto_start": ("int", "autoStart"),
+    "auto_complete": ("int", "autoComplete"),
+})
 
 
 def get_imgdir(root: Optional[ET.Element], quest_id: int) -> Optional[ET.Element]:
     """Return <imgdir name='quest_id'> node."""
     if root is None:
         return None
-    return root.find(f"./imgdir[@name='{quest_id}']")
+    return get_index(root).get(quest_id)
 
 
-def extract_questinfo(root: Optional[ET.Element], quest_id: int) -> Dict[str, Any]:
+def extract_questinfo(root: Optional[ET.Element], quest_id: int) -> QuestInfo:
     """
     Extract QuestInfo fields for a single quest.
     """
-    data = {
-        "name": "",
-        "summary": "",
-        "rewardSummary": "",
-        "demandSummary": "",
-        "log0": "",
-        "log1": "",
-        "log2": "",
-        "type": "",
-        "parent": "",
-        "area": None,
-        "order": None,
-        "autoStart": None,
-        "autoComplete": None,
-    }
-
     if root is None:
-        return data
+        return QuestInfo()
+    return questinfo_from_node(get_imgdir(root, quest_id))
+
+
+def questinfo_from_node(node: Optional[ET.Element]) -> QuestInfo:
+    """extract_questinfo() for a quest node already in hand."""
+    data = QuestInfo()
 
-    node = get_imgdir(root, quest_id)
     if node is None:
         return data
 
@@ -44,24 +61,9 @@ def extract_questinfo(root: Optional[ET.Element], quest_id: int) -> Dict[str, An
         val = child.get("value", "")
 
         if tag == "string":
-            if name == "name":
-                data["name"] = val
-            elif name == "summary":
-                data["summary"] = val
-            elif name == "rewardSummary":
-                data["rewardSummary"] = val
-            elif name == "demandSummary":
-                data["demandSummary"] = val
-            elif name == "0":
-                data["log0"] = val
-            elif name == "1":
-                data["log1"] = val
-            elif name == "2":
-                data["log2"] = val
-            elif name == "type":
-                data["type"] = val
-            elif name == "parent":
-                data["parent"] = val
+            field = _STRING_FIELDS.get(name)
+            if field is not None:
+                setattr(data, field, val)
 
         elif tag == "int":
             try:
@@ -70,26 +72,28 @@ def extract_questinfo(root: Optional[ET.Element], quest_id: int) -> Dict[str, An
                 continue
 
             if name == "area":
-                data["area"] = iv
+                data.area = iv
             elif name == "order":
-                data["order"] = iv
+                data.order = iv
             elif name == "autoStart":
-                data["autoStart"] = bool(iv)
+                data.auto_start = bool(iv)
             elif name == "autoComplete":
-                data["autoComplete"] = bool(iv)
+                data.auto_complete = bool(iv)
 
     # Fallback summary: use log0 if summary empty
-    if not data["summary"] and data["log0"]:
-        data["summary"] = data["log0"]
+    if not data.summary and data.log0:
+        data.summary = data.log0
 
     return data
 
 
-def apply_questinfo(root: Optional[ET.Element], qid: int, data: Dict[str, Any]):
+def apply_questinfo(root: Optional[ET.Element], qid: int, data: QuestInfo):
     """Write QuestInfo data into QuestInfo.img.xml exactly like your original tool."""
     if root is None:
         return
 
+    index = get_index(root)
+    before = index.xml_of(qid)
     node = ensure_imgdir(root, str(qid))
 
     # Remove everything
@@ -101,44 +105,100 @@ def apply_questinfo(root: Optional[ET.Element], qid: int, data: Dict[str, Any]):
             ET.SubElement(node, "string", {"name": name, "value": str(value)})
 
     def set_int(name, value):
-        if value not in ("", None):
+        if value is not None:
             ET.SubElement(node, "int", {"name": name, "value": str(value)})
 
-    set_string("name", data.get("name"))
-    set_string("summary", data.get("summary"))
-    set_string("rewardSummary", data.get("rewardSummary"))
-    set_string("demandSummary", data.get("demandSummary"))
-    set_string("0", data.get("log0"))
-    set_string("1", data.get("log1"))
-    set_string("2", data.get("log2"))
-    set_string("type", data.get("type"))
-    set_string("parent", data.get("parent"))
+    for name, field in _STRING_FIELDS.items():
+        set_string(name, getattr(data, field))
 
-    set_int("area", data.get("area"))
-    set_int("order", data.get("order"))
-    set_int("autoStart", 1 if data.get("autoStart") else 0)
-    set_int("autoComplete", 1 if data.get("autoComplete") else 0)
+    set_int("area", data.area)
+    set_int("order", data.order)
+    set_int("autoStart", 1 if data.auto_start else 0)
+    set_int("autoComplete", 1 if data.auto_complete else 0)
 
+    index.touch(qid, before)
+    if index.reverse is not None:
+        index.reverse.update(qid, data)
 
-def get_all_quest_ids(root: Optional[ET.Element]) -> List[Tuple[int, str]]:
+
+def set_questinfo_fields(node: ET.Element, values: Dict[str, object]):
+    """
+    Write only the given QuestInfo fields ({field: value}) into a quest
+    node; everything else in it stays as it is. "" / None removes a field.
+    """
+    for field, value in values.items():
+        tag, name = _FIELD_NODES[field]
+        set_child_value(node, tag, name, int(value) if isinstance(value, bool) else value)
+
+
+class QuestList:
+    """
+    Sorted quest list for the UI: parallel arrays of IDs and names.
+
+    ids is an array('i') kept in ascending order, so lookups by ID are a
+    bisect instead of a scan. Iterating yields (questId, name) pairs.
+    """
+
+    __slots__ = ("ids", "names")
+
+    def __init__(self, ids: Optional[array] = None, names: Optional[List[str]] = None):
+        self.ids = ids if ids is not None else array("i")
+        self.names = names if names is not None else []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        return zip(self.ids, self.names)
+
+    def position(self, quest_id: int) -> int:
+        """Row of quest_id, or -1 if it is not in the list."""
+        pos = bisect_left(self.ids, quest_id)
+        if pos < len(self.ids) and self.ids[pos] == quest_id:
+            return pos
+        return -1
+
+    def name_of(self, quest_id: int) -> Optional[str]:
+        pos = self.position(quest_id)
+        return self.names[pos] if pos >= 0 else None
+
+
+def build_quest_list(root: Optional[ET.Element]) -> QuestList:
     """
-    Return a sorted list of (questId, name) using extract_questinfo(),
-    so the UI always sees real quest info.
+    Single pass over QuestInfo: read each quest's <string name="name"> straight
+    from the node we are already holding (no per-quest lookup), then sort once.
     """
-    results: List[Tuple[int, str]] = []
+    ids = array("i")
+    names: List[str] = []
 
     if root is None:
-        return results
+        return QuestList(ids, names)
 
-    for imgdir in root.findall("./imgdir"):
-        qid_str = imgdir.get("name")
-        if not (qid_str and qid_str.isdigit()):
+    for qid_str, node in get_index(root).items():
+        if not qid_str.isdigit():
             continue
 
-        qid = int(qid_str)
-        info = extract_questinfo(root, qid)
-        name = info.get("name", "") or ""
+        name = ""
+        for child in node:
+            if child.tag == "string" and child.get("name") == "name":
+                name = child.get("value", "")
+                break
+
+        ids.append(int(qid_str))
+        names.append(name)
+
+    # Dumps are normally already in ID order; only sort when they are not.
+    if any(ids[i] > ids[i + 1] for i in range(len(ids) - 1)):
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        ids = array("i", (ids[i] for i in order))
+        names = [names[i] for i in order]
+
+    return QuestList(ids, names)
 
-        results.append((qid, name))
 
-    return sorted(results, key=lambda x: x[0])
+def get_all_quest_ids(root: Optional[ET.Element]) -> List[Tuple[int, str]]:
+    """
+    Return a sorted list of (questId, name).
+    Kept for callers that want plain tuples; see build_quest_list().
+    """
+    return list(build_quest_list(root))
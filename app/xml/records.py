@@ -0,0 +1,198 @@
+"""
+Typed per-quest records returned by the extract_* helpers and taken by
+the apply_* helpers:
+
+- QuestInfo      (QuestInfo.img.xml)
+- Requirements   (Check.img.xml)
+- Rewards        (Act.img.xml)
+
+Numbers stay numbers and (id, count/state) lists are PairLists backed by
+array('i'); WZ <int> nodes are 32-bit, so every value fits. Text is only
+produced at the UI edge (PairList.format / PairList.parse).
+"""
+
+from array import array
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+class PairList:
+    """
+    (id, value) pairs as two parallel array('i') columns: item/mob id + count,
+    or quest id + state.
+    """
+
+    __slots__ = ("ids", "values")
+
+    def __init__(self, ids: Optional[array] = None, values: Optional[array] = None):
+        self.ids = ids if ids is not None else array("i")
+        self.values = values if values is not None else array("i")
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[int, int]]) -> "PairList":
+        out = cls()
+        for a, b in pairs:
+            out.append(a, b)
+        return out
+
+    @classmethod
+    def parse(cls, text: Optional[str]) -> "PairList":
+        """
+        Read "id count" lines as typed in the forms. "2000000 x10" and
+        "2000000x10" are accepted too; anything else on a line skips it.
+        """
+        out = cls()
+        if not text:
+            return out
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            parts = line.replace("x", " ").replace("X", " ").split()
+            if len(parts) != 2:
+                continue
+            try:
+                out.append(int(parts[0]), int(parts[1]))
+            except (ValueError, OverflowError):
+                pass
+        return out
+
+    def format(self) -> str:
+        """One "id value" pair per line (the form text)."""
+        return "\n".join(f"{a} {b}" for a, b in zip(self.ids, self.values))
+
+    def append(self, a: int, b: int):
+        self.ids.append(a)
+        self.values.append(b)
+
+    def copy(self) -> "PairList":
+        return PairList(array("i", self.ids), array("i", self.values))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.ids, self.values)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PairList):
+            return NotImplemented
+        return self.ids == other.ids and self.values == other.values
+
+    def __repr__(self) -> str:
+        return f"PairList({list(self)!r})"
+
+
+class _Record:
+    """
+    Shared plumbing: every field is a slot; fields listed in _PAIRS hold
+    PairLists. to_tuple() / from_tuple() give a marshal-friendly form for
+    the snapshot cache.
+    """
+
+    __slots__ = ()
+    _PAIRS: Tuple[str, ...] = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, PairList() if name in self._PAIRS else None)
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def copy(self):
+        out = type(self).__new__(type(self))
+        for name in self.__slots__:
+            value = getattr(self, name)
+            setattr(out, name, value.copy() if name in self._PAIRS else value)
+        return out
+
+    def to_tuple(self) -> tuple:
+        out = []
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name in self._PAIRS:
+                value = (value.ids.tobytes(), value.values.tobytes())
+            out.append(value)
+        return tuple(out)
+
+    @classmethod
+    def from_tuple(cls, values: tuple):
+        out = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            if name in cls._PAIRS:
+                ids, vals = array("i"), array("i")
+                ids.frombytes(value[0])
+                vals.frombytes(value[1])
+                value = PairList(ids, vals)
+            setattr(out, name, value)
+        return out
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{n}={getattr(self, n)!r}" for n in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class QuestInfo(_Record):
+    """
+    QuestInfo.img fields. Strings are "" when absent; area / order are int
+    or None; auto_start / auto_complete are bool or None.
+    """
+
+    __slots__ = (
+        "name",
+        "summary",
+        "reward_summary",
+        "demand_summary",
+        "log0",
+        "log1",
+        "log2",
+        "type",
+        "parent",
+        "area",
+        "order",
+        "auto_start",
+        "auto_complete",
+    )
+
+    _STRINGS = __slots__[:9]
+
+    def __init__(self, **fields):
+        super().__init__(**fields)
+        for name in self._STRINGS:
+            if getattr(self, name) is None:
+                setattr(self, name, "")
+
+
+class Requirements(_Record):
+    """Check.img fields. NPC ids and lvmin are int or None."""
+
+    __slots__ = ("start_npc", "end_npc", "lvmin", "items", "mobs", "prereq")
+    _PAIRS = ("items", "mobs", "prereq")
+
+
+class Rewards(_Record):
+    """
+    Act.img fields. exp is int or None; lose_items holds positive counts
+    (written back as negative counts).
+    """
+
+    __slots__ = ("exp", "gain_items", "lose_items")
+    _PAIRS = ("gain_items", "lose_items")
+
+
+def parse_int(text: Optional[str]) -> Optional[int]:
+    """Form text → int, or None when empty / not a number."""
+    text = (text or "").strip()
+    try:
+        return int(text)
+    except ValueError:
+        return None
+
+
+def format_int(value: Optional[int]) -> str:
+    """int → form text ("" for None)."""
+    return "" if value is None else str(value)
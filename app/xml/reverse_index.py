@@ -0,0 +1,307 @@
+"""
+Reverse lookups over Check / Act: which quests use a given NPC, mob, item
+or prerequisite quest, plus sorted numeric columns (lvmin, exp) for range
+queries.
+
+Built once per loaded file (in the load worker) and attached to that
+file's QuestIndex as `index.reverse`. From then on the quest index and the
+apply_* helpers keep it current one quest at a time, so a lookup is a dict
+hit instead of extracting every quest.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from .backend import ET
+from .quest_index import get_index, peek_index
+from .records import Requirements, Rewards
+from .check_helpers import requirements_from_node
+from .act_helpers import rewards_from_node
+
+# Check.img tables
+NPC_START = "npc_start"
+NPC_END = "npc_end"
+MOB = "mob"
+ITEM_REQUIRED = "item"
+PREREQ = "prereq"  # prerequisite quest id → quests that depend on it
+
+# Act.img tables
+ITEM_GAIN = "item_gain"
+ITEM_LOSE = "item_lose"
+
+# Numeric columns
+LVMIN = "lvmin"  # Check.img
+EXP = "exp"  # Act.img
+
+_EMPTY: FrozenSet[int] = frozenset()
+
+
+class SortedColumn:
+    """
+    quest id → int value for one numeric field. Range queries bisect a
+    value-sorted copy that is rebuilt lazily after the column changes.
+    """
+
+    def __init__(self):
+        self.values: Dict[int, int] = {}
+        self._keys: List[int] = []
+        self._ids: List[int] = []
+        self._stale = False
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def set(self, quest_id: int, value: Optional[int]):
+        if value is None:
+            self.discard(quest_id)
+        elif self.values.get(quest_id) != value:
+            self.values[quest_id] = value
+            self._stale = True
+
+    def discard(self, quest_id: int):
+        if self.values.pop(quest_id, None) is not None:
+            self._stale = True
+
+    def reset(self, values: Dict[int, int]):
+        """Replace the whole column (e.g. from a snapshot); sorted on next use."""
+        self.values = values
+        self._stale = True
+
+    def sort(self):
+        """Re-sort now if the column changed (otherwise the next query does)."""
+        if self._stale:
+            values = self.values
+            self._ids = sorted(values, key=values.__getitem__)
+            self._keys = [values[q] for q in self._ids]
+            self._stale = False
+
+    def _bounds(self, low: Optional[int], high: Optional[int]) -> Tuple[int, int]:
+        self.sort()
+        start = 0 if low is None else bisect_left(self._keys, low)
+        end = len(self._keys) if high is None else bisect_right(self._keys, high)
+        return start, max(start, end)
+
+    def count(self, low: Optional[int], high: Optional[int]) -> int:
+        """Number of quests with low <= value <= high (None = unbounded)."""
+        start, end = self._bounds(low, high)
+        return end - start
+
+    def range(self, low: Optional[int], high: Optional[int]) -> Set[int]:
+        """Quest IDs with low <= value <= high (None = unbounded)."""
+        start, end = self._bounds(low, high)
+        return set(self._ids[start:end])
+
+    def contains(self, quest_id: int, low: Optional[int], high: Optional[int]) -> bool:
+        value = self.values.get(quest_id)
+        return (
+            value is not None
+            and (low is None or value >= low)
+            and (high is None or value <= high)
+        )
+
+
+class ReverseIndex:
+    """
+    key → set of quest IDs, one table per field. Each quest also remembers
+    the (table, key) postings it added, so changing or removing it only
+    touches those entries. COLUMNS are numeric fields kept as SortedColumns.
+    """
+
+    TABLES: Tuple[str, ...] = ()
+    COLUMNS: Tuple[str, ...] = ()
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[int, Set[int]]] = {t: {} for t in self.TABLES}
+        self.columns: Dict[str, SortedColumn] = {c: SortedColumn() for c in self.COLUMNS}
+        self._postings: Dict[int, List[Tuple[str, int]]] = {}
+
+    # Subclasses: record type for this file and where its keys come from.
+    def record_from_node(self, node: Optional[ET.Element]):
+        raise NotImplementedError
+
+    def postings(self, record) -> Iterable[Tuple[str, int]]:
+        raise NotImplementedError
+
+    def column_values(self, record) -> Iterable[Tuple[str, Optional[int]]]:
+        return ()
+
+    def build(self, root: ET.Element) -> "ReverseIndex":
+        for name, node in get_index(root).items():
+            if name.isdigit():
+                self.update(int(name), self.record_from_node(node))
+        for column in self.columns.values():
+            column.sort()
+        return self
+
+    def update(self, quest_id: int, record):
+        """Replace whatever quest_id contributed with `record`'s keys."""
+        quest_id = int(quest_id)
+        self.discard(quest_id)
+        added = []
+        for table, key in self.postings(record):
+            quests = self.tables[table].setdefault(key, set())
+            if quest_id not in quests:
+                quests.add(quest_id)
+                added.append((table, key))
+        if added:
+            self._postings[quest_id] = added
+        for column, value in self.column_values(record):
+            self.columns[column].set(quest_id, value)
+
+    def update_node(self, quest_id, node: Optional[ET.Element]):
+        """update() from a quest node (None just removes the quest)."""
+        if not str(quest_id).isdigit():
+            return
+        if node is None:
+            self.discard(int(quest_id))
+        else:
+            self.update(int(quest_id), self.record_from_node(node))
+
+    def discard(self, quest_id: int):
+        for table, key in self._postings.pop(int(quest_id), ()):
+            quests = self.tables[table][key]
+            quests.discard(int(quest_id))
+            if not quests:
+                del self.tables[table][key]
+        for column in self.columns.values():
+            column.discard(int(quest_id))
+
+    # ---------------- Snapshot ----------------
+
+    def state(self) -> tuple:
+        """The tables as plain dicts / sets / tuples, for snapshot_cache to marshal."""
+        return (
+            self.tables,
+            self._postings,
+            {name: column.values for name, column in self.columns.items()},
+        )
+
+    def load_state(self, state: tuple) -> "ReverseIndex":
+        """Take over tables produced by state() instead of building them."""
+        tables, postings, columns = state
+        self.tables = {table: tables.get(table, {}) for table in self.TABLES}
+        self._postings = postings
+        for name, values in columns.items():
+            self.columns[name].reset(values)
+        for column in self.columns.values():
+            column.sort()
+        return self
+
+    def lookup(self, table: str, key: int) -> FrozenSet[int]:
+        """Quest IDs whose `table` field contains `key` (a snapshot, not live)."""
+        quests = self.tables[table].get(key)
+        return frozenset(quests) if quests else _EMPTY
+
+
+class CheckReverseIndex(ReverseIndex):
+    """Check.img: start/end NPC, required mobs and items, prerequisite quests."""
+
+    TABLES = (NPC_START, NPC_END, MOB, ITEM_REQUIRED, PREREQ)
+    COLUMNS = (LVMIN,)
+
+    def record_from_node(self, node: Optional[ET.Element]) -> Requirements:
+        return requirements_from_node(node)
+
+    def postings(self, record: Requirements) -> Iterable[Tuple[str, int]]:
+        if record.start_npc is not None:
+            yield NPC_START, record.start_npc
+        if record.end_npc is not None:
+            yield NPC_END, record.end_npc
+        for mob_id in record.mobs.ids:
+            yield MOB, mob_id
+        for item_id in record.items.ids:
+            yield ITEM_REQUIRED, item_id
+        for quest_id in record.prereq.ids:
+            yield PREREQ, quest_id
+
+    def column_values(self, record: Requirements) -> Iterable[Tuple[str, Optional[int]]]:
+        yield LVMIN, record.lvmin
+
+
+class ActReverseIndex(ReverseIndex):
+    """Act.img: items given and taken, EXP reward."""
+
+    TABLES = (ITEM_GAIN, ITEM_LOSE)
+    COLUMNS = (EXP,)
+
+    def record_from_node(self, node: Optional[ET.Element]) -> Rewards:
+        return rewards_from_node(node)
+
+    def postings(self, record: Rewards) -> Iterable[Tuple[str, int]]:
+        for item_id in record.gain_items.ids:
+            yield ITEM_GAIN, item_id
+        for item_id in record.lose_items.ids:
+            yield ITEM_LOSE, item_id
+
+    def column_values(self, record: Rewards) -> Iterable[Tuple[str, Optional[int]]]:
+        yield EXP, record.exp
+
+
+REVERSE_INDEXES: Dict[str, Callable[[], ReverseIndex]] = {
+    "Check": CheckReverseIndex,
+    "Act": ActReverseIndex,
+}
+
+
+def build_reverse_index(root: ET.Element, kind: str) -> Optional[ReverseIndex]:
+    """
+    Build the reverse index for a loaded Check / Act root and attach it to
+    the root's QuestIndex. Returns None for kinds without one.
+    """
+    factory = REVERSE_INDEXES.get(kind)
+    if factory is None:
+        return None
+    reverse = factory().build(root)
+    get_index(root).reverse = reverse
+    return reverse
+
+
+def peek_reverse_index(root: Optional[ET.Element]) -> Optional[ReverseIndex]:
+    """The reverse index attached to `root`, if it has been built."""
+    index = peek_index(root) if root is not None else None
+    return index.reverse if index is not None else None
+
+
+def peek_column(root: Optional[ET.Element], name: str) -> Optional[SortedColumn]:
+    """
+    Numeric column `name` of the index attached to `root` (a reverse index,
+    or the QuestInfo text index), if it has been built.
+    """
+    columns = getattr(peek_reverse_index(root), "columns", None)
+    return columns.get(name) if columns else None
+
+
+# Search prefix → (file kind, table) pairs whose results are unioned.
+SEARCH_PREFIXES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "npc": (("Check", NPC_START), ("Check", NPC_END)),
+    "mob": (("Check", MOB),),
+    "item": (("Check", ITEM_REQUIRED), ("Act", ITEM_GAIN), ("Act", ITEM_LOSE)),
+    "prereq": (("Check", PREREQ),),
+}
+
+
+def parse_search(text: str) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    "npc:9000028" → ("npc", 9000028). Returns None when `text` is not a
+    reverse search; the key is None if it isn't a number.
+    """
+    prefix, sep, rest = text.partition(":")
+    prefix = prefix.strip().lower()
+    if not sep or prefix not in SEARCH_PREFIXES:
+        return None
+    rest = rest.strip()
+    return prefix, int(rest) if rest.isdigit() else None
+
+
+def reverse_search(roots: Dict[str, Optional[ET.Element]], prefix: str, key: int) -> Set[int]:
+    """
+    Quest IDs matching `prefix:key`, e.g. every quest starting or ending at
+    an NPC. `roots` maps "Check" / "Act" to the loaded roots; files that are
+    missing or not indexed yet contribute nothing.
+    """
+    out: Set[int] = set()
+    for kind, table in SEARCH_PREFIXES[prefix]:
+        reverse = peek_reverse_index(roots.get(kind))
+        if reverse is not None:
+            out |= reverse.lookup(table, key)
+    return out
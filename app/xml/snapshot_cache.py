@@ -0,0 +1,232 @@
+"""
+Warm-start cache of parsed quest data.
+
+For each XML file we keep a small binary snapshot next to the data folder
+(.quest_editor_cache/<file>.snap) with the per-quest records the editor
+shows (extract_questinfo / extract_requirements / extract_rewards output,
+stored as Record.to_tuple()) plus the sorted quest list. If the file's path, size and mtime still match,
+the editor can show the list and Base column from the snapshot immediately
+while the XML itself is parsed in the background.
+
+It also stores the file's derived index (the npc:/mob:/item: reverse index
+of Check / Act, the full-text index of QuestInfo) and a content hash. Once
+the background parse is done the hash is checked: if it matches, the
+stored index is attached instead of being rebuilt from every quest
+(attach_index); a missing / stale snapshot is rewritten. Anything unreadable
+is treated as "no snapshot", so a bad cache only costs a normal parse.
+
+File layout:
+    MAGIC | u32 header length | marshal(header) | zlib(marshal(payload))
+"""
+
+import hashlib
+import marshal
+import os
+import struct
+import zlib
+from array import array
+from typing import Any, Callable, Dict, Optional, Type
+
+from .backend import ET
+from .quest_index import get_index
+from .questinfo_helpers import QuestList, extract_questinfo, questinfo_from_node
+from .check_helpers import extract_requirements, requirements_from_node
+from .act_helpers import extract_rewards, rewards_from_node
+from .records import QuestInfo, Requirements, Rewards
+from .reverse_index import REVERSE_INDEXES
+from .text_index import TextIndex
+
+MAGIC = b"QESNAP\x00\x01"
+CACHE_DIR_NAME = ".quest_editor_cache"
+
+# Bump when the record layout changes so old snapshots are ignored.
+SNAPSHOT_VERSION = 3
+
+_HASH_CHUNK = 1 << 20
+
+# kind → per-quest record extractor
+EXTRACTORS: Dict[str, Callable] = {
+    "QuestInfo": extract_questinfo,
+    "Check": extract_requirements,
+    "Act": extract_rewards,
+}
+
+# kind → the same extractor for a quest node already in hand
+NODE_EXTRACTORS: Dict[str, Callable] = {
+    "QuestInfo": questinfo_from_node,
+    "Check": requirements_from_node,
+    "Act": rewards_from_node,
+}
+
+# kind → record type produced by that extractor
+RECORD_TYPES: Dict[str, Type] = {
+    "QuestInfo": QuestInfo,
+    "Check": Requirements,
+    "Act": Rewards,
+}
+
+
+class QuestSnapshot:
+    """Per-quest records for one file, loaded from the cache."""
+
+    __slots__ = ("kind", "digest", "quest_list", "records", "index")
+
+    def __init__(
+        self,
+        kind: str,
+        digest: str,
+        quest_list: QuestList,
+        records: Dict[int, tuple],
+        index: Optional[tuple] = None,
+    ):
+        self.kind = kind
+        self.digest = digest
+        self.quest_list = quest_list
+        self.records = records
+        # state() of the file's reverse / text index, None if not stored
+        self.index = index
+
+    def get(self, quest_id: int):
+        """Same record as the matching extract_* function (fresh, safe to modify)."""
+        record_type = RECORD_TYPES[self.kind]
+        values = self.records.get(int(quest_id))
+        if values is None:
+            return record_type()
+        return record_type.from_tuple(values)
+
+
+def cache_path_for(path: str) -> str:
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, CACHE_DIR_NAME, name + ".snap")
+
+
+def stat_fingerprint(path: str) -> Dict[str, Any]:
+    """Cheap part of the fingerprint (no file read)."""
+    st = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+
+
+def content_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_snapshot(path: str, kind: str) -> Optional[QuestSnapshot]:
+    """
+    Return the cached snapshot for `path` if its stat fingerprint still
+    matches, else None. Never raises for a missing or corrupt cache.
+    """
+    try:
+        fp = stat_fingerprint(path)
+        with open(cache_path_for(path), "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = marshal.loads(f.read(header_len))
+            if (
+                header.get("version") != SNAPSHOT_VERSION
+                or header.get("kind") != kind
+                or header.get("fingerprint") != fp
+            ):
+                return None
+            payload = marshal.loads(zlib.decompress(f.read()))
+
+        ids = array("i")
+        ids.frombytes(payload["ids"])
+        quest_list = QuestList(ids, payload["names"])
+        return QuestSnapshot(
+            kind, header["digest"], quest_list, payload["records"], payload.get("index")
+        )
+    except Exception:
+        return None
+
+
+def attach_index(root: ET.Element, kind: str, snapshot: QuestSnapshot) -> bool:
+    """
+    Attach the reverse / text index stored in `snapshot` to root's
+    QuestIndex instead of building it. Only valid when the snapshot's digest
+    matches the file `root` was parsed from. False if there is none to attach.
+    """
+    if snapshot.index is None:
+        return False
+    try:
+        if kind == "QuestInfo":
+            index = TextIndex().load_state(snapshot.index)
+        else:
+            index = REVERSE_INDEXES[kind]().load_state(snapshot.index)
+    except Exception:
+        return False
+    snapshot.index = None  # now owned (and edited) by the live index
+    get_index(root).reverse = index
+    return True
+
+
+def write_snapshot(path: str, kind: str, root: ET.Element, digest: Optional[str] = None) -> bool:
+    """
+    Build and store a snapshot of `root` (already parsed from `path`),
+    including its reverse / text index if that has been built. Each quest
+    is read once, from the node items() hands out (lazy files parse it only
+    then). Returns False (and leaves no partial file) if the cache can't be
+    written.
+    """
+    from_node = NODE_EXTRACTORS[kind]
+    try:
+        fp = stat_fingerprint(path)
+        if digest is None:
+            digest = content_hash(path)
+
+        index = get_index(root)
+        records: Dict[int, tuple] = {}
+        names: Dict[int, str] = {}
+        for name, node in index.items():
+            if name.isdigit():
+                record = from_node(node)
+                records[int(name)] = record.to_tuple()
+                if kind == "QuestInfo":
+                    names[int(name)] = record.name
+
+        ids = sorted(records)
+        quest_list = QuestList(array("i", ids), [names.get(qid, "") for qid in ids])
+        derived = index.reverse.state() if index.reverse is not None else None
+
+        header = marshal.dumps(
+            {"version": SNAPSHOT_VERSION, "kind": kind, "fingerprint": fp, "digest": digest}
+        )
+        payload = zlib.compress(
+            marshal.dumps(
+                {
+                    "ids": quest_list.ids.tobytes(),
+                    "names": quest_list.names,
+                    "records": records,
+                    "index": derived,
+                }
+            ),
+            1,
+        )
+
+        target = cache_path_for(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(payload)
+        os.replace(tmp, target)
+        return True
+    except Exception:
+        try:
+            os.remove(cache_path_for(path) + ".tmp")
+        except OSError:
+            pass
+        return False
@@ -0,0 +1,244 @@
+"""
+Splice saves: rewrite only the quests that changed.
+
+A quest file is a header, the top-level <imgdir name="N"> quests with some
+whitespace between them, and a tail. When a few quests changed, the new
+file is the old one with those quests' byte ranges replaced, so everything
+else is copied byte-for-byte (keeping HaRepacker's formatting) and only
+the dirty quests are serialized, in the file's own formatting (see
+wz_writer). Runs of untouched quests are copied as one range, by the
+kernel where it can (copy_file_range / sendfile), otherwise in large chunks.
+
+LazyQuestIndex.write() splices from its mapped file. Fully loaded trees get
+a SourceMap (see map_source) that remembers where each top-level element
+sat in the file they were parsed from; write_tree() uses it and keeps it
+current across saves.
+"""
+
+import mmap
+import os
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from . import atomic_file, wz_writer
+from .backend import ET
+from .quest_index import get_index, peek_index
+
+# Runs shorter than this are written from the mapped buffer; a kernel copy
+# costs a flush and a couple of system calls.
+KERNEL_COPY_MIN = 64 * 1024
+
+# Chunk size when copying through Python.
+COPY_CHUNK = 8 * 1024 * 1024
+
+# (gap_start, start, end) — copy the quest and the whitespace in front of it
+# from the source; (gap, node) — write `gap`, then serialize the node.
+Piece = Union[Tuple[int, int, int], Tuple[bytes, ET.Element]]
+
+# (gap_start, start, end) in the new file, one per piece.
+Span = Tuple[int, int, int]
+
+_copy_file_range = getattr(os, "copy_file_range", None)
+_sendfile = getattr(os, "sendfile", None) if sys.platform.startswith("linux") else None
+
+
+def _kernel_copy(out, src_fd: int, start: int, count: int) -> int:
+    """Copy [start, start + count) of src_fd to the end of `out`. Returns bytes copied."""
+    global _copy_file_range, _sendfile
+    out.flush()
+    dst_fd = out.fileno()
+    done = 0
+    try:
+        while done < count and (_copy_file_range or _sendfile):
+            try:
+                if _copy_file_range is not None:
+                    n = _copy_file_range(src_fd, dst_fd, count - done, start + done)
+                else:
+                    n = _sendfile(dst_fd, src_fd, start + done, count - done)
+            except OSError:
+                # Not supported for these files (old kernel, other filesystem, ...):
+                # fall back to the next method for the rest of the session.
+                if _copy_file_range is not None:
+                    _copy_file_range = None
+                else:
+                    _sendfile = None
+                continue
+            if n == 0:
+                break
+            done += n
+    finally:
+        # The copies moved the descriptor's offset; resync the buffered file.
+        out.seek(0, os.SEEK_END)
+        out.advance(done)
+    return done
+
+
+def copy_range(out, src_fd: Optional[int], buf, start: int, end: int):
+    """Append buf[start:end] (the contents of src_fd) to `out`."""
+    if end - start >= KERNEL_COPY_MIN and src_fd is not None:
+        start += _kernel_copy(out, src_fd, start, end - start)
+    for pos in range(start, end, COPY_CHUNK):
+        out.write(buf[pos:min(pos + COPY_CHUNK, end)])
+
+
+def write_pieces(
+    out,
+    src_fd: Optional[int],
+    buf,
+    head_end: int,
+    pieces: Sequence[Piece],
+    tail_start: int,
+) -> Tuple[List[Span], int]:
+    """
+    Write buf[:head_end], the pieces, then buf[tail_start:]. Adjacent copy
+    pieces are merged into one range; nodes are serialized in the format of
+    buf (wz_writer.detect_format). Returns the (gap_start, start, end) of
+    every piece in the new file and where the tail starts.
+    """
+    nodes = [piece[1] for piece in pieces if len(piece) == 2]
+    fmt = wz_writer.detect_format(buf) if nodes else None
+    serialized = wz_writer.serialize_quests(nodes, fmt)
+    spans: List[Span] = []
+    run_start, run_end = 0, head_end
+    pos = head_end
+    for piece in pieces:
+        if len(piece) == 3:
+            gap_start, start, end = piece
+            if gap_start != run_end:
+                copy_range(out, src_fd, buf, run_start, run_end)
+                run_start = gap_start
+            run_end = end
+            spans.append((pos, pos + start - gap_start, pos + end - gap_start))
+            pos += end - gap_start
+        else:
+            gap = piece[0]
+            xml = next(serialized)
+            copy_range(out, src_fd, buf, run_start, run_end)
+            run_start = run_end = -1
+            out.write(gap)
+            out.write(xml)
+            spans.append((pos, pos + len(gap), pos + len(gap) + len(xml)))
+            pos += len(gap) + len(xml)
+    if tail_start != run_end:
+        copy_range(out, src_fd, buf, run_start, run_end)
+        run_start = tail_start
+    copy_range(out, src_fd, buf, run_start, len(buf))
+    return spans, pos
+
+
+def separator(buf, spans) -> bytes:
+    """Whitespace to put in front of quests that were not in the file."""
+    for gap_start, start, _end in spans:
+        return buf[gap_start:start]
+    # Nothing is copied (every quest is new): go by the file's format.
+    fmt = wz_writer.detect_format(buf)
+    return b"\n" if fmt is None else fmt.line(1).encode("ascii")
+
+
+# ---------------- Fully loaded trees ----------------
+
+
+def stat_key(path: str) -> Tuple[int, int, int]:
+    """Identifies one version of a file: a SourceMap is only used against it."""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class SourceMap:
+    """
+    Byte range of every top-level <imgdir> of a fully loaded tree in the
+    file it was parsed from (or last saved to). Held by the tree's
+    QuestIndex as `source_map`.
+    """
+
+    def __init__(self, path: str, key, head_end: int, tail_start: int, spans: Dict[ET.Element, Span]):
+        self.path = path
+        self.key = key
+        self.head_end = head_end
+        self.tail_start = tail_start
+        self.spans = spans
+
+    def matches(self, path: str) -> bool:
+        """True if `path` is still exactly the file the spans describe."""
+        try:
+            return os.path.abspath(path) == os.path.abspath(self.path) and stat_key(path) == self.key
+        except OSError:
+            return False
+
+    def quest_ranges(self) -> List[Tuple[int, int]]:
+        """(gap_start, end) of each mapped element, in file order."""
+        return sorted((gap_start, end) for gap_start, _start, end in self.spans.values())
+
+
+def map_source(root: ET.Element, path: str, key, children: Sequence[ET.Element]) -> Optional[SourceMap]:
+    """
+    Scan `path` for its top-level quests and pair them with `children`
+    (root's top-level <imgdir> elements right after parsing, before any
+    edit). `key` is stat_key(path) from before the parse. The map is
+    attached to root's QuestIndex; None if the file changed since or does
+    not line up with the tree.
+    """
+    from .lazy_loader import ScanError, scan_top_level
+
+    try:
+        with open(path, "rb") as f:
+            if stat_key(path) != key:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                head_end, last_end, found, _attrib = scan_top_level(buf)
+    except (OSError, ValueError, ScanError):
+        return None
+    if len(found) != len(children):
+        return None
+
+    spans: Dict[ET.Element, Span] = {}
+    gap_start = head_end
+    for node, (name, start, end) in zip(children, found):
+        if node.get("name") != name:
+            return None
+        spans[node] = (gap_start, start, end)
+        gap_start = end
+    source = SourceMap(path, key, head_end, last_end, spans)
+    get_index(root).source_map = source
+    return source
+
+
+def write_tree(tree, path: str, progress: Optional[atomic_file.WriteProgress] = None) -> bool:
+    """
+    Splice-save a fully loaded tree over the file its SourceMap describes.
+    Returns False (nothing written) if there is no usable map; the caller
+    then writes the whole tree.
+    """
+    root = tree.getroot()
+    index = peek_index(root)
+    source = getattr(index, "source_map", None)
+    if source is None or not source.matches(path):
+        return False
+
+    dirty = index.dirty
+    nodes = []
+    pieces: List[Piece] = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        sep = separator(buf, source.spans.values())
+        for child in root:
+            if child.tag != "imgdir":
+                continue  # comments and the like stay in the copied gaps
+            span = source.spans.get(child)
+            name = child.get("name")
+            # A hidden duplicate of a dirty quest was not edited.
+            if span is not None and (name not in dirty or index.get(name) is not child):
+                pieces.append(span)
+            else:
+                pieces.append((sep, child))
+            nodes.append(child)
+
+        with atomic_file.temp_file(path, progress, len(buf)) as out:
+            spans, tail_start = write_pieces(
+                out, f.fileno(), buf, source.head_end, pieces, source.tail_start
+            )
+
+    atomic_file.replace(atomic_file.temp_path(path), path)
+    index.source_map = SourceMap(
+        path, stat_key(path), source.head_end, tail_start, dict(zip(nodes, spans))
+    )
+    return True
@@ -0,0 +1,231 @@
+"""
+Streaming loader that keeps every quest as a compact record.
+
+The file is read once with an iterparse-style pull parser. Each top-level
+<imgdir name="N"> is turned into a QuestRecord as soon as its end tag is
+seen, and the element is dropped straight away, so the full ElementTree
+never exists. A record is a marshal blob of nested tuples with shared
+strings, roughly 15-20x smaller than the equivalent Elements.
+
+Quests are rebuilt into Elements on demand through the quest index. On
+save, quests that were not handed out for writing are copied byte-for-byte
+from the original file; only the others are re-serialized.
+"""
+
+import marshal
+import mmap
+import os
+import sys
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from . import atomic_file
+from .backend import ET
+from .lazy_loader import LazyQuestIndex, ScanError, scan_top_level
+from .quest_index import set_index
+
+# progress(bytes_read, total_bytes, quests_seen)
+ProgressCallback = Callable[[int, int, int], None]
+
+CHUNK_SIZE = 1 << 20
+
+_NO_CHILDREN: tuple = ()
+
+
+class QuestRecord:
+    """
+    One quest, stored as marshal(nested tuples):
+        node = (tag, (k1, v1, k2, v2, ...), text, (child, child, ...))
+    Whitespace-only text is dropped; formatting comes from the original
+    bytes (unchanged quests) or the serializer (changed ones).
+    """
+
+    __slots__ = ("name", "blob")
+
+    def __init__(self, name: str, blob: bytes):
+        self.name = name
+        self.blob = blob
+
+    @classmethod
+    def from_element(cls, elem: ET.Element, strings: Optional[Dict[str, str]] = None) -> "QuestRecord":
+        if strings is None:
+            strings = {}
+        return cls(elem.get("name", ""), marshal.dumps(_encode(elem, strings)))
+
+    def to_element(self) -> ET.Element:
+        return _decode(marshal.loads(self.blob))
+
+
+def _encode(elem: ET.Element, strings: Dict[str, str]) -> tuple:
+    share = strings.setdefault
+    attrs = []
+    for k, v in elem.attrib.items():
+        attrs.append(sys.intern(k))
+        attrs.append(share(v, v))
+    text = elem.text
+    if text is not None and not text.strip():
+        text = None
+    children = tuple(_encode(c, strings) for c in elem) if len(elem) else _NO_CHILDREN
+    return (sys.intern(elem.tag), tuple(attrs), text, children)
+
+
+def _decode(node: tuple, parent: Optional[ET.Element] = None) -> ET.Element:
+    tag, attrs, text, children = node
+    attrib = dict(zip(attrs[::2], attrs[1::2]))
+    elem = ET.Element(tag, attrib) if parent is None else ET.SubElement(parent, tag, attrib)
+    if text is not None:
+        elem.text = text
+    for child in children:
+        _decode(child, elem)
+    return elem
+
+
+class RecordQuestIndex(LazyQuestIndex):
+    """
+    QuestIndex backed by QuestRecords held in memory.
+
+    Unlike LazyQuestIndex the file is not kept mapped between saves; it is
+    only opened again to copy unchanged quests when writing.
+    """
+
+    def __init__(
+        self,
+        root: ET.Element,
+        path: str,
+        progress: Optional[ProgressCallback] = None,
+        cancel: Optional[threading.Event] = None,
+    ):
+        self._records: Dict[str, QuestRecord] = {}
+        self._progress = progress
+        self._cancel = cancel
+        super().__init__(root, path)
+
+    # ---------------- Building ----------------
+
+    def _map(self):
+        # Byte ranges first (cheap regex pass), then the records.
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                root_open_end, last_end, found, self.root_attrib = scan_top_level(mm)
+        self._index_entries(root_open_end, last_end, found)
+        self._records = self._stream_records()
+
+    def _stream_records(self) -> Dict[str, QuestRecord]:
+        from .xml_loader import LoadCancelled
+
+        records: Dict[str, QuestRecord] = {}
+        strings: Dict[str, str] = {}
+        total = os.path.getsize(self.path)
+        done = 0
+        depth = 0
+        root = None
+        seen = 0
+
+        parser = ET.XMLPullParser(events=("start", "end"))
+        with open(self.path, "rb") as f:
+            while True:
+                if self._cancel is not None and self._cancel.is_set():
+                    raise LoadCancelled(self.path)
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                parser.feed(chunk)
+                done += len(chunk)
+
+                for event, elem in parser.read_events():
+                    if event == "start":
+                        if root is None:
+                            root = elem
+                        depth += 1
+                        continue
+
+                    depth -= 1
+                    if depth != 1:
+                        continue
+
+                    # A complete top-level quest: keep the record, drop the tree.
+                    if elem.tag == "imgdir":
+                        seen += 1
+                        name = elem.get("name", "")
+                        if name not in records:
+                            records[name] = QuestRecord.from_element(elem, strings)
+                    root.clear()
+
+                if self._progress is not None:
+                    self._progress(done, total, seen)
+        parser.close()
+
+        if seen != len(self._order):
+            raise ScanError("streamed quest count does not match the byte index")
+        return records
+
+    # ---------------- Lookup ----------------
+
+    def _materialize(self, entry) -> ET.Element:
+        record = self._records.get(entry.name)
+        if record is not None and self._entries.get(entry.name) is entry:
+            return record.to_element()
+        # Duplicate that just became visible: read it back from the file.
+        with open(self.path, "rb") as f:
+            f.seek(entry.start)
+            return ET.fromstring(f.read(entry.end - entry.start))
+
+    def _forget(self, name: str):
+        super()._forget(name)
+        self._records.pop(name, None)
+
+    # ---------------- Transactions ----------------
+
+    def _tables(self):
+        return super()._tables(), dict(self._records)
+
+    def _set_tables(self, tables):
+        base, self._records = tables
+        super()._set_tables(base)
+
+    # ---------------- Saving ----------------
+
+    def _source(self):
+        self._file = open(self.path, "rb")
+        return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _release_source(self, buf):
+        buf.close()
+        self._file.close()
+        self._file = None
+
+    def _written(self, path: str, tmp: str, offsets, tail_start: int):
+        atomic_file.replace(tmp, path)
+        self.path = path
+
+        for entry, (gap_start, start, end) in zip(self._order, offsets):
+            entry.gap_start, entry.start, entry.end = gap_start, start, end
+        self._tail_start = tail_start
+
+        # Quests that were edited now live in the file; fold them back into records.
+        strings: Dict[str, str] = {}
+        for name, node in self._pinned.items():
+            if name in self._entries:
+                self._records[name] = QuestRecord.from_element(node, strings)
+        self._pinned.clear()
+        self._cache.clear()
+
+    def memory_size(self) -> Tuple[int, int]:
+        """(record count, total blob bytes) — handy for checking the footprint."""
+        return len(self._records), sum(len(r.blob) for r in self._records.values())
+
+
+def load_records(
+    path: str,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[threading.Event] = None,
+) -> ET.ElementTree:
+    """
+    Stream `path` into QuestRecords and return an ElementTree whose root has
+    no children; quests are reached through get_index(root).
+    """
+    root = ET.Element("imgdir")
+    index = RecordQuestIndex(root, path, progress, cancel)
+    root.attrib.update(index.root_attrib)
+    set_index(root, index)
+    return ET.ElementTree(root)
@@ -0,0 +1,312 @@
+"""
+Full-text index over the QuestInfo strings (name, summaries, log text).
+
+Words are lower-cased and MapleStory text codes (#b, #k, #t4000000#, ...)
+are stripped before tokenizing. Each word maps to the quests containing it
+with a weight for the field it appeared in, so a hit in the name ranks
+above one in the log text.
+
+Query words are ANDed; each one also matches longer words starting with it
+("pot" finds "potion"). Results come back best first.
+
+The index plugs into QuestIndex.reverse like the Check / Act reverse
+indexes, so clone / delete / apply_questinfo keep it current. It also
+carries the QuestInfo numeric columns (area, order) for range queries, the
+trigram index over names for fuzzy matches, and each quest's raw strings
+for rx.<field>: searches.
+"""
+
+import math
+import re
+from bisect import bisect_left
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+from .backend import ET
+from .quest_index import get_index, peek_index
+from .records import QuestInfo
+from .reverse_index import SortedColumn
+from .trigram_index import TrigramIndex
+
+# <string name="..."> → weight of a word found in it.
+FIELD_WEIGHTS: Dict[str, float] = {
+    "name": 8.0,
+    "summary": 2.0,
+    "rewardSummary": 2.0,
+    "demandSummary": 2.0,
+    "0": 1.0,
+    "1": 1.0,
+    "2": 1.0,
+    "type": 1.0,
+    "parent": 1.0,
+}
+
+# Same fields on the QuestInfo record.
+_RECORD_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("name", "name"),
+    ("summary", "summary"),
+    ("rewardSummary", "reward_summary"),
+    ("demandSummary", "demand_summary"),
+    ("0", "log0"),
+    ("1", "log1"),
+    ("2", "log2"),
+    ("type", "type"),
+    ("parent", "parent"),
+)
+
+# Numeric columns: <int name="..."> → QuestInfo field.
+AREA = "area"
+ORDER = "order"
+COLUMNS: Tuple[str, ...] = (AREA, ORDER)
+
+# Shorter query words only match whole words; "a" would expand to half the
+# vocabulary.
+MIN_PREFIX = 2
+
+# A prefix hit counts for less than the exact word.
+PREFIX_FACTOR = 0.6
+
+_TEXT_CODE = re.compile(r"#[A-Za-z]|#")
+_WORD = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words of `text` with text codes removed."""
+    if not text:
+        return []
+    return _WORD.findall(_TEXT_CODE.sub(" ", text).lower())
+
+
+def node_strings(node: ET.Element) -> Dict[str, str]:
+    """Indexed <string> children of a QuestInfo quest node."""
+    out: Dict[str, str] = {}
+    for child in node:
+        if child.tag == "string":
+            name = child.get("name")
+            if name in FIELD_WEIGHTS:
+                out[name] = child.get("value", "")
+    return out
+
+
+def record_strings(record: QuestInfo) -> Dict[str, str]:
+    """node_strings() of the quest apply_questinfo writes (it skips empty fields)."""
+    out: Dict[str, str] = {}
+    for name, attr in _RECORD_FIELDS:
+        value = getattr(record, attr)
+        if value:
+            out[name] = value
+    return out
+
+
+def node_columns(node: ET.Element) -> Dict[str, int]:
+    """Numeric COLUMNS of a QuestInfo quest node."""
+    out: Dict[str, int] = {}
+    for child in node:
+        if child.tag == "int":
+            name = child.get("name")
+            if name in COLUMNS:
+                try:
+                    out[name] = int(child.get("value", ""))
+                except ValueError:
+                    pass
+    return out
+
+
+def record_columns(record: QuestInfo) -> Dict[str, Optional[int]]:
+    return {AREA: record.area, ORDER: record.order}
+
+
+class TextIndex:
+    """
+    word → {quest id: weight}. Each quest also keeps its own word list so
+    re-indexing it only touches those postings.
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, SortedColumn] = {c: SortedColumn() for c in COLUMNS}
+        self.names = TrigramIndex()
+        self.strings: Dict[int, Dict[str, str]] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._words: Dict[int, Tuple[str, ...]] = {}
+        self._vocab: List[str] = []
+        self._vocab_stale = False
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    # ---------------- Building / updates ----------------
+
+    def build(self, entries: Iterable[Tuple[int, Dict[str, str], Dict[str, int]]]) -> "TextIndex":
+        """
+        Index (quest id, {field: text}, {column: value}) entries, e.g. from
+        collect_fields().
+        """
+        for quest_id, strings, columns in entries:
+            self._add(quest_id, strings, columns)
+        self._vocab_stale = True
+        for column in self.columns.values():
+            column.sort()
+        return self
+
+    def state(self) -> tuple:
+        """Everything build() computed, for snapshot_cache to marshal."""
+        return (
+            self.strings,
+            self._postings,
+            self._words,
+            self.names.state(),
+            {name: column.values for name, column in self.columns.items()},
+        )
+
+    def load_state(self, state: tuple) -> "TextIndex":
+        """Take over an index produced by state() instead of building it."""
+        self.strings, self._postings, self._words, names, columns = state
+        self.names.load_state(names)
+        for name, values in columns.items():
+            self.columns[name].reset(values)
+        for column in self.columns.values():
+            column.sort()
+        self._vocab_stale = True
+        return self
+
+    def update(self, quest_id: int, record: QuestInfo):
+        """Re-index one quest from the record apply_questinfo wrote."""
+        self.discard(quest_id)
+        self._add(int(quest_id), record_strings(record), record_columns(record))
+
+    def update_node(self, quest_id, node: Optional[ET.Element]):
+        """Same as update() from a quest node (None just removes the quest)."""
+        if not str(quest_id).isdigit():
+            return
+        self.discard(int(quest_id))
+        if node is not None:
+            self._add(int(quest_id), node_strings(node), node_columns(node))
+
+    def discard(self, quest_id: int):
+        for word in self._words.pop(int(quest_id), ()):
+            quests = self._postings[word]
+            quests.pop(int(quest_id), None)
+            if not quests:
+                del self._postings[word]
+                self._vocab_stale = True
+        for column in self.columns.values():
+            column.discard(int(quest_id))
+        self.names.discard(int(quest_id))
+        self.strings.pop(int(quest_id), None)
+
+    def _add(self, quest_id: int, strings: Dict[str, str], columns: Dict[str, Optional[int]]):
+        for name, value in columns.items():
+            self.columns[name].set(quest_id, value)
+        self.names.add(quest_id, strings.get("name", ""))
+        self.strings[quest_id] = strings
+
+        weights: Dict[str, float] = {}
+        for field, text in strings.items():
+            weight = FIELD_WEIGHTS[field]
+            for word in set(tokenize(text)):
+                weights[word] = weights.get(word, 0.0) + weight
+        if not weights:
+            return
+
+        postings = self._postings
+        for word, weight in weights.items():
+            quests = postings.get(word)
+            if quests is None:
+                quests = postings[word] = {}
+                self._vocab_stale = True
+            quests[quest_id] = weight
+        self._words[quest_id] = tuple(weights)
+
+    # ---------------- Queries ----------------
+
+    def _expand(self, term: str) -> List[str]:
+        """Indexed words matching `term` (itself, plus longer ones if long enough)."""
+        if len(term) < MIN_PREFIX:
+            return [term] if term in self._postings else []
+        if self._vocab_stale:
+            self._vocab = sorted(self._postings)
+            self._vocab_stale = False
+        vocab = self._vocab
+        out = []
+        for i in range(bisect_left(vocab, term), len(vocab)):
+            if not vocab[i].startswith(term):
+                break
+            out.append(vocab[i])
+        return out
+
+    def _term_scores(self, term: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for word in self._expand(term):
+            factor = 1.0 if word == term else PREFIX_FACTOR
+            for quest_id, weight in self._postings[word].items():
+                score = weight * factor
+                if score > scores.get(quest_id, 0.0):
+                    scores[quest_id] = score
+        return scores
+
+    def search(
+        self,
+        text: str,
+        limit: Optional[int] = None,
+        within: Optional[Collection[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        (quest id, score) for quests containing every word of `text`
+        (prefix match), best first. `within` restricts the result to those
+        quest IDs (used to narrow a previous search).
+        """
+        terms = list(dict.fromkeys(tokenize(text)))
+        if not terms:
+            return []
+
+        per_term = [self._term_scores(t) for t in terms]
+        per_term.sort(key=len)
+        if not per_term[0]:
+            return []
+
+        total = max(len(self._words), 1)
+        result: Dict[int, float] = {}
+        first = True
+        for scores in per_term:
+            idf = math.log(1.0 + total / len(scores))
+            if first:
+                if within is None:
+                    result = {q: s * idf for q, s in scores.items()}
+                else:
+                    result = {q: scores[q] * idf for q in within if q in scores}
+                first = False
+                continue
+            result = {q: acc + scores[q] * idf for q, acc in result.items() if q in scores}
+            if not result:
+                return []
+
+        ranked = sorted(result.items(), key=lambda qs: (-qs[1], qs[0]))
+        return ranked[:limit] if limit is not None else ranked
+
+
+def collect_fields(root: ET.Element) -> List[Tuple[int, Dict[str, str], Dict[str, int]]]:
+    """
+    One pass over a QuestInfo root collecting the indexed strings and
+    columns. Cheap compared to tokenizing, so the loader can do this while
+    it still owns the tree and build the index afterwards.
+    """
+    out = []
+    for name, node in get_index(root).items():
+        if name.isdigit():
+            out.append((int(name), node_strings(node), node_columns(node)))
+    return out
+
+
+def build_text_index(root: ET.Element, fields=None) -> TextIndex:
+    """Build the text index for a QuestInfo root and attach it to its QuestIndex."""
+    if fields is None:
+        fields = collect_fields(root)
+    text_index = TextIndex().build(fields)
+    get_index(root).reverse = text_index
+    return text_index
+
+
+def peek_text_index(root: Optional[ET.Element]) -> Optional[TextIndex]:
+    """The text index attached to a QuestInfo root, if it has been built."""
+    index = peek_index(root) if root is not None else None
+    reverse = index.reverse if index is not None else None
+    return reverse if isinstance(reverse, TextIndex) else None
@@ -0,0 +1,119 @@
+"""
+Trigram index over quest names for typo-tolerant search.
+
+Names are folded before indexing: lower-cased, MapleStory text codes
+removed and everything that is not a letter or digit dropped, so
+"Maple Leaf", "Mapleleaf" and "maple  leaf!" are the same string. Each
+name is cut into overlapping three-character pieces; a query matches the
+names sharing enough of its pieces, so one wrong or missing letter only
+costs a few of them.
+
+Lookups only touch the postings of the query's own trigrams, never the
+whole quest list.
+"""
+
+import math
+import re
+from collections import Counter
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+
+_TEXT_CODE = re.compile(r"#[A-Za-z]|#")
+_NOT_ALNUM = re.compile(r"[\W_]+")
+
+# Queries shorter than this (after folding) are not fuzzy-matched; two
+# letters match half the list.
+MIN_FUZZY = 3
+
+# Share of the query's trigrams a name must contain to count as a match.
+MIN_SIMILARITY = 0.5
+
+
+def fold(text: str) -> str:
+    """Lower-case letters and digits of `text`, text codes removed."""
+    return _NOT_ALNUM.sub("", _TEXT_CODE.sub(" ", text or "").lower())
+
+
+def trigrams(folded: str) -> Set[str]:
+    """
+    Trigrams of a folded string. The start is padded so the first letters
+    count too ("  m", " ma", "map", ...).
+    """
+    padded = "  " + folded
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """trigram → quest IDs whose folded name contains it."""
+
+    def __init__(self):
+        self._postings: Dict[str, Set[int]] = {}
+        self._grams: Dict[int, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def add(self, quest_id: int, name: str):
+        """(Re-)index one quest name."""
+        self.discard(quest_id)
+        folded = fold(name)
+        if not folded:
+            return
+        grams = trigrams(folded)
+        postings = self._postings
+        for gram in grams:
+            quests = postings.get(gram)
+            if quests is None:
+                quests = postings[gram] = set()
+            quests.add(quest_id)
+        self._grams[quest_id] = tuple(grams)
+
+    def state(self) -> tuple:
+        return self._postings, self._grams
+
+    def load_state(self, state: tuple) -> "TrigramIndex":
+        self._postings, self._grams = state
+        return self
+
+    def discard(self, quest_id: int):
+        for gram in self._grams.pop(quest_id, ()):
+            quests = self._postings[gram]
+            quests.discard(quest_id)
+            if not quests:
+                del self._postings[gram]
+
+    def search(
+        self,
+        text: str,
+        limit: Optional[int] = None,
+        min_similarity: float = MIN_SIMILARITY,
+    ) -> List[Tuple[int, float]]:
+        """
+        (quest id, similarity) for names sharing at least `min_similarity`
+        of the query's trigrams, best first. Ties go to the name with fewer
+        extra trigrams (the closer length), then the lower ID.
+        """
+        folded = fold(text)
+        if len(folded) < MIN_FUZZY:
+            return []
+        grams = trigrams(folded)
+        total = len(grams)
+        need = max(1, math.ceil(total * min_similarity))
+
+        postings = [self._postings[g] for g in grams if g in self._postings]
+        if len(postings) < need:
+            return []
+        shared = Counter(chain.from_iterable(postings))
+        sizes = self._grams
+
+        hits = []
+        for quest_id, count in shared.items():
+            if count >= need:
+                # Jaccard as the tie-breaker: penalize long names that merely
+                # contain the query.
+                jaccard = count / (total + len(sizes[quest_id]) - count)
+                hits.append((quest_id, count / total, jaccard))
+        hits.sort(key=lambda h: (-h[1], -h[2], h[0]))
+        if limit is not None:
+            hits = hits[:limit]
+        return [(quest_id, similarity) for quest_id, similarity, _j in hits]
@@ -0,0 +1,132 @@
+"""
+Undo / redo of quest edits.
+
+A step keeps, for every quest an edit changed, its XML before and after the
+edit in each file (QuestIndex.xml_of(); None = not in that file). Undo puts
+the before-images back with QuestIndex.restore(), redo the after-images;
+quests an edit removed go back to where they sat (positions).
+Quests the edit left alone are not stored at all, so memory grows with the
+size of the edits, not of the files: a 500-quest clone is one step holding
+those 500 quests, zlib-compressed.
+
+The stack only stays valid while every change to the trees goes through it;
+anything else (reload, transaction rollback, journal recovery) must clear().
+"""
+
+import marshal
+import zlib
+from typing import Dict, List, Optional
+
+# {file kind: {quest name: xml or None}}, as edit_journal.quest_images() gives.
+Images = Dict[str, Dict[str, Optional[bytes]]]
+
+# Steps kept; the oldest are dropped first.
+MAX_STEPS = 100
+
+# Compressed bytes kept across all steps (the newest step is always kept).
+MAX_BYTES = 32 << 20
+
+COMPRESS_LEVEL = 1
+
+BEFORE = 0
+AFTER = 1
+
+
+# {file kind: {quest name: QuestIndex.previous()}}, as edit_journal.quest_positions() gives.
+Positions = Dict[str, Dict[str, str]]
+
+
+class UndoStep:
+    """One edit: {kind: {name: (before xml, after xml)}} and positions, compressed."""
+
+    __slots__ = ("label", "quests", "_data")
+
+    def __init__(self, label: str, changes: Dict[str, Dict[str, tuple]], positions: Optional[Positions] = None):
+        self.label = label
+        self.quests = len({name for quests in changes.values() for name in quests})
+        self._data = zlib.compress(marshal.dumps((changes, positions or {})), COMPRESS_LEVEL)
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    def images(self, side: int) -> Images:
+        """XML of the changed quests before (BEFORE) or after (AFTER) the edit."""
+        changes, _positions = marshal.loads(zlib.decompress(self._data))
+        return {
+            kind: {name: pair[side] for name, pair in quests.items()}
+            for kind, quests in changes.items()
+        }
+
+    def positions(self) -> Positions:
+        """Where the quests the edit removed sat in each file."""
+        return marshal.loads(zlib.decompress(self._data))[1]
+
+
+class UndoStack:
+    def __init__(self, max_steps: int = MAX_STEPS, max_bytes: int = MAX_BYTES):
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        self._undo: List[UndoStep] = []
+        self._redo: List[UndoStep] = []
+
+    def push(self, label: str, before: Images, after: Images, positions: Optional[Positions] = None) -> Optional[UndoStep]:
+        """
+        Record an edit from the quest_images() of the quests it could touch,
+        taken before and after applying it. positions: quest_positions() of
+        the quests it removed, taken before; those count as gone after it
+        even where a duplicate now has the name, so redo removes them again.
+        Quests that came out the same are left out; None (and nothing
+        recorded) if none changed. Clears redo.
+        """
+        removed = positions or {}
+        changes = {}
+        for kind, quests in before.items():
+            after_quests = after.get(kind, {})
+            gone = removed.get(kind, {})
+            pairs = {}
+            for name, xml in quests.items():
+                now = None if name in gone else after_quests.get(name)
+                if xml != now:
+                    pairs[name] = (xml, now)
+            if pairs:
+                changes[kind] = pairs
+        if not changes:
+            return None
+        kept = {
+            kind: {name: prev for name, prev in quests.items() if name in changes.get(kind, {})}
+            for kind, quests in removed.items()
+        }
+        step = UndoStep(label, changes, kept)
+        self._undo.append(step)
+        self._redo.clear()
+        self._trim()
+        return step
+
+    def _trim(self):
+        total = sum(step.size for step in self._undo) + sum(step.size for step in self._redo)
+        while len(self._undo) > 1 and (len(self._undo) > self.max_steps or total > self.max_bytes):
+            total -= self._undo.pop(0).size
+
+    # ---------------- Undo / redo ----------------
+    # undo_step() / redo_step() only look; once the step has been applied,
+    # undone() / redone() move it to the other stack.
+
+    def undo_step(self) -> Optional[UndoStep]:
+        return self._undo[-1] if self._undo else None
+
+    def redo_step(self) -> Optional[UndoStep]:
+        return self._redo[-1] if self._redo else None
+
+    def undone(self):
+        self._redo.append(self._undo.pop())
+
+    def redone(self):
+        self._undo.append(self._redo.pop())
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    def __len__(self) -> int:
+        return len(self._undo)
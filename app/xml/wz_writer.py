@@ -0,0 +1,222 @@
+"""
+Serializer for the XML dialect HaRepacker exports (classic XML dump).
+
+    <?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+    <imgdir name="Act.img">
+      <imgdir name="1000">
+        <imgdir name="0">
+        </imgdir>
+        <imgdir name="1">
+          <int name="exp" value="100"/>
+        </imgdir>
+      </imgdir>
+    </imgdir>
+
+One element per line, indented by depth, no space before "/>", <imgdir>
+always written as an open / close pair (even when empty), leaves always
+self-closing, attributes in document order with " ' & < > escaped the way
+HaRepacker does. The newline, indent, XML declaration and whatever follows
+the root's end tag are taken from the file being saved (detect_format), so
+an unmodified file comes out byte for byte as it went in.
+
+Files without line breaks (e.g. saved by older versions of this editor
+through ElementTree) keep that style: detect_format() returns None and the
+ElementTree serializer is used (parallel_writer).
+
+This walks the tree in Python, which beats xml.etree's own writer by about
+3x; lxml's C writer is faster still, but normal saves only serialize the
+quests that changed (splice_writer), so this only matters for full
+rewrites. The walk holds the GIL, so large rewrites are spread over worker
+processes (threads on a free-threaded interpreter; parallel_writer.map_python).
+"""
+
+import os
+import re
+from functools import partial
+from typing import Iterator, List, Optional, Sequence
+
+from . import parallel_writer
+from .backend import ET
+
+DEFAULT_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+
+# Attribute escapes. HaRepacker escapes the first five; the control
+# characters become character references so they survive a re-parse.
+_ESCAPES = str.maketrans({
+    '"': "&quot;",
+    "'": "&apos;",
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    "\n": "&#10;",
+    "\r": "&#13;",
+    "\t": "&#9;",
+})
+_NEEDS_ESCAPE = re.compile(r"[\"'&<>\n\r\t]").search
+
+# Bytes of a file's head detect_format() needs (declaration, root, first quest line).
+HEAD_BYTES = 4096
+
+# Bytes of a file's end read for what follows the root's end tag.
+TAIL_BYTES = 64
+
+_DECLARATION = re.compile(rb"<\?xml[^>]*\?>")
+_FIRST_CHILD = re.compile(rb"<imgdir\b[^>]*>(\r?\n)([ \t]*)<(?!/)")
+
+
+class WzFormat:
+    """Newline, indent unit, XML declaration and ending of one file."""
+
+    def __init__(
+        self,
+        newline: str = "\r\n",
+        indent: str = "  ",
+        declaration: str = DEFAULT_DECLARATION,
+        ending: Optional[str] = None,
+    ):
+        self.newline = newline
+        self.indent = indent
+        self.declaration = declaration
+        # Whitespace after the root's end tag (None: one newline).
+        self.ending = newline if ending is None else ending
+        # newline + indent for each depth, built once.
+        self._lines: List[str] = []
+
+    def line(self, depth: int) -> str:
+        lines = self._lines
+        if depth >= len(lines):
+            # Replaced, not appended to: serializer threads share the format.
+            lines = [self.newline + self.indent * d for d in range(depth + 8)]
+            self._lines = lines
+        return lines[depth]
+
+
+def detect_format(head, tail=None) -> Optional[WzFormat]:
+    """
+    WzFormat of a file from its first bytes (the declaration, root start tag
+    and the start of the first quest) and, if given, its last bytes (what
+    follows the root's end tag; without them a newline is assumed). None if
+    the root's children are not on lines of their own.
+    """
+    fmt = _detect_head(bytes(head[:HEAD_BYTES]))
+    if fmt is not None and tail is not None:
+        tail = bytes(tail[-TAIL_BYTES:])
+        fmt.ending = tail[len(tail.rstrip()):].decode("ascii")
+    return fmt
+
+
+def _detect_head(head: bytes) -> Optional[WzFormat]:
+    decl = _DECLARATION.match(head)
+    start = decl.end() if decl else 0
+    m = _FIRST_CHILD.search(head, start)
+    if m is None:
+        if re.match(rb"\s*<imgdir\b[^>]*>(\r?\n)</imgdir>", head[start:]):
+            # No quests at all, but the file has line breaks.
+            nl = b"\r\n" if b"\r\n" in head else b"\n"
+            return WzFormat(nl.decode("ascii"), "  ", _declaration(decl))
+        return None
+    newline, indent = m.group(1).decode("ascii"), m.group(2).decode("ascii")
+    if not indent:
+        return None
+    return WzFormat(newline, indent, _declaration(decl))
+
+
+def file_format(path: str) -> Optional[WzFormat]:
+    """detect_format() of the file at `path`; None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEAD_BYTES)
+            f.seek(max(0, os.fstat(f.fileno()).st_size - TAIL_BYTES))
+            return detect_format(head, f.read(TAIL_BYTES))
+    except OSError:
+        return None
+
+
+def _declaration(decl) -> Optional[str]:
+    return decl.group(0).decode("utf-8") if decl else None
+
+
+class _NotDialect(ValueError):
+    """Text content, comments, ... — something HaRepacker never writes."""
+
+
+def _start_tag(el, parts: list):
+    tag = el.tag
+    if not isinstance(tag, str):
+        raise _NotDialect(tag)
+    parts.append("<")
+    parts.append(tag)
+    for key, value in el.items():
+        if _NEEDS_ESCAPE(value):
+            value = value.translate(_ESCAPES)
+        parts.append(" ")
+        parts.append(key)
+        parts.append('="')
+        parts.append(value)
+        parts.append('"')
+
+
+def _walk(el, depth: int, fmt: WzFormat, parts: list):
+    _start_tag(el, parts)
+    text = el.text
+    if text and not text.isspace():
+        raise _NotDialect("text")
+    children = len(el)
+    if children or el.tag == "imgdir":
+        parts.append(">")
+        inner = fmt.line(depth + 1)
+        for child in el:
+            parts.append(inner)
+            _walk(child, depth + 1, fmt, parts)
+            tail = child.tail
+            if tail and not tail.isspace():
+                raise _NotDialect("tail")
+        parts.append(fmt.line(depth))
+        parts.append("</")
+        parts.append(el.tag)
+        parts.append(">")
+    else:
+        parts.append("/>")
+
+
+def quest_bytes(node: ET.Element, fmt: WzFormat, depth: int = 1) -> bytes:
+    """
+    One element and its subtree, from "<" of its start tag to ">" of its end
+    tag (the newline + indent in front of it is the caller's). Falls back to
+    ElementTree's serialization for anything outside the dialect.
+    """
+    parts: list = []
+    try:
+        _walk(node, depth, fmt, parts)
+    except _NotDialect:
+        return parallel_writer.tostring(node, with_tail=False)
+    return "".join(parts).encode("utf-8")
+
+
+def serialize_quests(nodes: Sequence[ET.Element], fmt: Optional[WzFormat]) -> Iterator[bytes]:
+    """Top-level quests as they go into a file of format `fmt` (None: ElementTree style)."""
+    if fmt is None:
+        return parallel_writer.serialize_many(nodes)
+    return parallel_writer.map_python(partial(quest_bytes, fmt=fmt), nodes)
+
+
+def write_tree(tree, out, fmt: Optional[WzFormat]):
+    """Write the whole document in format `fmt` (None: exactly what tree.write() gives)."""
+    if fmt is None:
+        parallel_writer.write_tree(tree, out)
+        return
+    root = tree.getroot()
+    nl = fmt.newline
+    head: list = []
+    if fmt.declaration:
+        head.append(fmt.declaration)
+        head.append(nl)
+    _start_tag(root, head)
+    head.append(">")
+    out.write("".join(head).encode("utf-8"))
+
+    line = fmt.line(1).encode("utf-8")
+    for data in serialize_quests(list(root), fmt):
+        out.write(line)
+        out.write(data)
+    out.write(f"{nl}</{root.tag}>{fmt.ending}".encode("utf-8"))
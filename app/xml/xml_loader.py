@@ -1,32 +1,203 @@
 import os
-import shutil
-import xml.etree.ElementTree as ET
+import threading
+from typing import Callable, List, Optional
 
+from . import atomic_file, backup_store, splice_writer, wz_writer
+from .backend import ET, ChunkParser
+from .quest_index import get_index, peek_index
+from .lazy_loader import LazyQuestIndex, ScanError, open_lazy
+from .stream_loader import load_records
 
-def load_xml(path: str):
-    """Load XML and return ElementTree or None."""
+# Bytes fed to the parser between progress callbacks / cancel checks.
+CHUNK_SIZE = 1 << 20
+
+# progress(bytes_read, total_bytes, quests_seen)
+ProgressCallback = Callable[[int, int, int], None]
+
+# load_xml() modes
+LOAD_FULL = "full"        # plain ElementTree
+LOAD_LAZY = "lazy"        # memory-mapped, quests parsed on demand (lazy_loader)
+LOAD_RECORDS = "records"  # streamed into compact per-quest records (stream_loader)
+
+
+class LoadCancelled(Exception):
+    """Raised by load_xml() when its cancel event is set mid-parse."""
+
+
+def load_xml(
+    path: str,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[threading.Event] = None,
+    mode: str = LOAD_FULL,
+):
+    """
+    Load XML and return ElementTree or None.
+
+    With `progress` and/or `cancel` the file is fed to the parser in
+    CHUNK_SIZE pieces so a worker thread can report how far it got and
+    stop early (LoadCancelled) when `cancel` is set.
+
+    LOAD_LAZY / LOAD_RECORDS return a root with no children; the quests are
+    held by the index registered for it and reached through get_index(root).
+    Both fall back to a full parse if the file can't be indexed that way.
+    """
     if not os.path.exists(path):
         return None
     try:
-        return ET.parse(path)
+        if mode == LOAD_LAZY:
+            if cancel is not None and cancel.is_set():
+                raise LoadCancelled(path)
+            try:
+                tree = open_lazy(path)
+            except ScanError:
+                tree = None
+            if tree is not None:
+                if progress is not None:
+                    size = os.path.getsize(path)
+                    progress(size, size, len(get_index(tree.getroot())))
+                return tree
+        elif mode == LOAD_RECORDS:
+            try:
+                return load_records(path, progress, cancel)
+            except ScanError:
+                pass
+        if progress is None and cancel is None:
+            return ET.parse(path)
+        return _parse_in_chunks(path, progress, cancel)
+    except LoadCancelled:
+        raise
     except Exception:
         return None
 
 
-def save_xml(tree: ET.ElementTree, path: str):
-    """Save XML back to file (UTF-8)."""
-    tree.write(path, encoding="utf-8", xml_declaration=True)
+def _parse_in_chunks(
+    path: str,
+    progress: Optional[ProgressCallback],
+    cancel: Optional[threading.Event],
+):
+    total = os.path.getsize(path)
+    done = 0
+
+    parser = ChunkParser()
+    with open(path, "rb") as f:
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise LoadCancelled(path)
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total, parser.quests_seen)
+
+    root = parser.close()
+    if progress is not None:
+        progress(done, total, parser.quests_seen)
+    return ET.ElementTree(root)
+
 
+def save_xml(tree, path: str, progress: Optional[atomic_file.WriteProgress] = None):
+    """
+    Save XML back to file (UTF-8). The file is replaced atomically (see
+    atomic_file), so a crash mid-save leaves the previous file intact.
+    Where the original byte layout is known (lazy / record indexes, or a
+    SourceMap on a full tree) only the dirty quests are re-serialized;
+    otherwise the whole tree is, keeping the file's formatting (wz_writer).
+    progress(bytes_written, total_bytes) is called every megabyte or so; the
+    total is an estimate (the current file size).
+    """
+    index = peek_index(tree.getroot())
+    if isinstance(index, LazyQuestIndex):
+        # Lazily loaded: the root is only a stub, the index owns the file.
+        index.write(path, progress)
+        return
+    if splice_writer.write_tree(tree, path, progress):
+        return
+    if index is not None:
+        index.source_map = None  # offsets no longer match the file
+    total = os.path.getsize(path) if os.path.exists(path) else 0
+    fmt = wz_writer.file_format(path)
+    atomic_file.write_atomic(
+        path,
+        lambda out: wz_writer.write_tree(tree, out, fmt),
+        progress,
+        total,
+    )
 
-def backup(path: str):
-    """Create .bak backup next to the target file."""
-    if os.path.exists(path):
-        shutil.copy2(path, path + ".bak")
+
+def backup(path: str, tree=None):
+    """
+    Store the current file as a new version in the backup store (see
+    backup_store). If `tree` was loaded from (or last saved to) `path`, its
+    index tells where the quests are, so the file needn't be scanned.
+    """
+    index = peek_index(tree.getroot()) if tree is not None else None
+    quests = None
+    if isinstance(index, LazyQuestIndex):
+        if os.path.abspath(index.path) == os.path.abspath(path):
+            quests = index.quest_ranges()
+    elif index is not None and index.source_map is not None and index.source_map.matches(path):
+        quests = index.source_map.quest_ranges()
+    backup_store.backup(path, quests)
+
+
+def _id_order(name: str):
+    return (0, int(name), "") if name.isdigit() else (1, 0, name)
+
+
+def pending_changes(tree) -> List[str]:
+    """IDs of the quests changed in `tree` since it was last saved, in ID order."""
+    index = peek_index(tree.getroot())
+    if index is None:
+        return []
+    return sorted(index.dirty, key=_id_order)
+
+
+def save_changes(tree, path: str, progress: Optional[atomic_file.WriteProgress] = None) -> List[str]:
+    """
+    Back up and save `tree` only if quests in it changed since the last save
+    (see QuestIndex.dirty). Returns the changed quest IDs, in ID order; an
+    empty list means the file was left alone. If the save fails the quests
+    stay dirty, so the next save tries again.
+    """
+    changed = pending_changes(tree)
+    if not changed:
+        return []
+    backup(path, tree)
+    save_xml(tree, path, progress)
+    get_index(tree.getroot()).clear_dirty()
+    return changed
 
 
 def ensure_imgdir(parent: ET.Element, name: str):
-    """Return existing <imgdir name='x'> or create it."""
-    node = parent.find(f"./imgdir[@name='{name}']")
-    if node is None:
-        node = ET.SubElement(parent, "imgdir", {"name": name})
-    return node
+    """Return existing top-level <imgdir name='x'> or create it (via the quest index)."""
+    return get_index(parent).ensure(name)
+
+
+def child_imgdir(parent: ET.Element, name: str, create: bool = True) -> Optional[ET.Element]:
+    """<imgdir name='x'> right under a quest node (a stage, an item list...), created if missing."""
+    for child in parent:
+        if child.tag == "imgdir" and child.get("name") == name:
+            return child
+    return ET.SubElement(parent, "imgdir", {"name": name}) if create else None
+
+
+def set_child_value(parent: Optional[ET.Element], tag: str, name: str, value):
+    """
+    Set <tag name='name' value='value'> right under `parent`, in place if it
+    is there (its other attributes stay); None or "" removes it.
+    """
+    if parent is None:
+        return
+    found = [child for child in parent if child.tag == tag and child.get("name") == name]
+    if value is None or value == "":
+        for child in found:
+            parent.remove(child)
+        return
+    if not found:
+        ET.SubElement(parent, tag, {"name": name, "value": str(value)})
+        return
+    found[0].set("value", str(value))
+    for child in found[1:]:
+        parent.remove(child)
@@ -0,0 +1,97 @@
+"""
+How quest serialization scales with serializer threads (parallel_writer).
+
+Usage:
+    python benchmarks/bench_parallel_writer.py <folder with QuestInfo/Check/Act .img.xml> [threads ...]
+
+For every file, all top-level quests are serialized with 1, 2, 4, ... workers
+(default: powers of two up to the core count) by:
+
+    tostring   lxml's C serializer on threads (what compact files are written with)
+    wz         wz_writer.quest_bytes, the HaRepacker dialect walk (Python), on threads
+    wz-proc    the same walk on worker processes (parallel_writer.map_reparsed);
+               the pool is started before timing, as it is kept between saves
+
+The output of every worker count is checked against the 1-worker run. The
+"used" column is what saves actually pick (parallel_writer.workers() /
+processes()).
+"""
+
+import os
+import sys
+import time
+from functools import partial
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from app.xml import parallel_writer, wz_writer, xml_loader  # noqa: E402
+from app.xml.backend import BACKEND_NAME  # noqa: E402
+
+
+def find_file(folder: str, base_name: str):
+    for fname in (f"{base_name}.img.xml", f"{base_name}.img", f"{base_name}.xml"):
+        path = os.path.join(folder, fname)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def thread_counts(argv) -> list:
+    if argv:
+        return sorted({max(1, int(a)) for a in argv})
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+def run(mapper, fn, nodes, count: int):
+    if mapper is parallel_writer.map_reparsed:
+        list(mapper(fn, nodes[:parallel_writer.MIN_PROCESSES], count))  # start the pool
+    t0 = time.perf_counter()
+    data = list(mapper(fn, nodes, count))
+    return time.perf_counter() - t0, data
+
+
+def main(argv):
+    if not argv:
+        print(__doc__)
+        return 2
+    folder, counts = argv[0], thread_counts(argv[1:])
+    print(
+        f"backend {BACKEND_NAME}, {os.cpu_count()} core(s), "
+        f"free-threaded: {parallel_writer.FREE_THREADED}"
+    )
+    print(f"{'file':<12}{'serializer':<11}" + "".join(f"{f'{n} workers':>16}" for n in counts) + f"{'used':>7}")
+
+    for base_name in ("QuestInfo", "Check", "Act"):
+        path = find_file(folder, base_name)
+        if not path:
+            continue
+        nodes = list(xml_loader.load_xml(path).getroot())
+        fmt = wz_writer.file_format(path) or wz_writer.WzFormat()
+        wz = partial(wz_writer.quest_bytes, fmt=fmt)
+        serializers = (
+            ("tostring", parallel_writer.map_ordered, partial(parallel_writer.tostring, with_tail=False),
+             parallel_writer.workers()),
+            ("wz", parallel_writer.map_ordered, wz, parallel_writer.workers(releases_gil=False)),
+            ("wz-proc", parallel_writer.map_reparsed, wz, parallel_writer.processes()),
+        )
+        for label, mapper, fn, used in serializers:
+            cells, first = [], None
+            for count in counts:
+                seconds, data = run(mapper, fn, nodes, count)
+                if first is None:
+                    first, base = data, seconds
+                elif data != first:
+                    print(f"{base_name}: {label} output differs with {count} workers", file=sys.stderr)
+                    return 1
+                cells.append(f"{seconds * 1000:.0f}ms ({base / seconds:.1f}x)")
+            print(f"{base_name:<12}{label:<11}" + "".join(f"{c:>16}" for c in cells) + f"{used:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
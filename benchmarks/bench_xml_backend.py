@@ -0,0 +1,142 @@
+"""
+Compare the xml.etree and lxml backends operation by operation.
+
+Usage:
+    python benchmarks/bench_xml_backend.py <folder with QuestInfo/Check/Act .img.xml>
+
+Each backend runs in its own subprocess (QUEST_EDITOR_XML_BACKEND picks it),
+so both measure a cold import and a fresh parse. Without lxml installed only
+the xml.etree column is filled in.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Quests touched by the per-quest write benchmarks.
+WRITE_SAMPLE = 500
+
+
+def find_file(folder: str, base_name: str):
+    for fname in (f"{base_name}.img.xml", f"{base_name}.img", f"{base_name}.xml"):
+        path = os.path.join(folder, fname)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def timed(results: dict, label: str, fn):
+    t0 = time.perf_counter()
+    value = fn()
+    results[label] = time.perf_counter() - t0
+    return value
+
+
+def run_benchmarks(folder: str) -> dict:
+    """Runs inside the child process; returns {operation: seconds}."""
+    from app.xml import xml_loader
+    from app.xml.backend import BACKEND_NAME
+    from app.xml.quest_index import get_index
+    from app.xml.questinfo_helpers import build_quest_list
+    from app.xml.check_helpers import extract_requirements, apply_requirements
+    from app.xml.act_helpers import extract_rewards, apply_rewards
+    from app.xml.clone_helpers import clone_node
+
+    results = {"backend": BACKEND_NAME}
+    qi_path = find_file(folder, "QuestInfo")
+    check_path = find_file(folder, "Check")
+    act_path = find_file(folder, "Act")
+
+    if qi_path:
+        qi_tree = timed(results, "parse QuestInfo", lambda: xml_loader.load_xml(qi_path))
+        qi_root = qi_tree.getroot()
+        timed(results, "index QuestInfo", lambda: get_index(qi_root))
+        timed(results, "quest list", lambda: build_quest_list(qi_root))
+
+    for label, path, extract, apply in (
+        ("Check", check_path, extract_requirements, apply_requirements),
+        ("Act", act_path, extract_rewards, apply_rewards),
+    ):
+        if not path:
+            continue
+        tree = timed(results, f"parse {label}", lambda: xml_loader.load_xml(path))
+        root = tree.getroot()
+        index = timed(results, f"index {label}", lambda: get_index(root))
+        ids = [int(q) for q in index.ids() if q.isdigit()]
+
+        records = timed(
+            results, f"extract all {label}", lambda: [extract(root, q) for q in ids]
+        )
+        sample = list(zip(ids[:WRITE_SAMPLE], records[:WRITE_SAMPLE]))
+        timed(results, f"apply x{len(sample)} {label}", lambda: [apply(root, q, d) for q, d in sample])
+
+        base = ids[0]
+        timed(
+            results,
+            f"clone x{WRITE_SAMPLE} {label}",
+            lambda: [clone_node(root, base, 900000 + i) for i in range(WRITE_SAMPLE)],
+        )
+
+        fd, tmp = tempfile.mkstemp(suffix=".xml")
+        os.close(fd)
+        try:
+            timed(results, f"save {label}", lambda: xml_loader.save_xml(tree, tmp))
+        finally:
+            os.remove(tmp)
+
+    return results
+
+
+def run_child(folder: str, backend: str):
+    env = dict(os.environ, QUEST_EDITOR_XML_BACKEND=backend)
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", folder],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr, file=sys.stderr)
+        return None
+    return json.loads(proc.stdout)
+
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == "--child":
+        print(json.dumps(run_benchmarks(argv[1])))
+        return 0
+
+    if len(argv) != 1:
+        print(__doc__)
+        return 2
+
+    folder = argv[0]
+    etree = run_child(folder, "etree")
+    lxml = run_child(folder, "lxml")
+    if etree is None:
+        return 1
+    if lxml is None or lxml.get("backend") != "lxml":
+        lxml = None
+
+    print(f"{'operation':<24}{'xml.etree':>12}{'lxml':>12}{'speedup':>10}")
+    for op, t_etree in etree.items():
+        if op == "backend":
+            continue
+        t_lxml = lxml.get(op) if lxml else None
+        if t_lxml:
+            print(f"{op:<24}{t_etree * 1000:>10.1f}ms{t_lxml * 1000:>10.1f}ms{t_etree / t_lxml:>9.1f}x")
+        else:
+            print(f"{op:<24}{t_etree * 1000:>10.1f}ms{'-':>12}{'-':>10}")
+    if lxml is None:
+        print("\nlxml is not installed; only xml.etree was measured.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
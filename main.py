@@ -1,4 +1,5 @@
 # main.py
+import multiprocessing
 import os
 import sys
 
@@ -54,4 +55,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # rx: searches run in a child process; needed for the frozen EXE.
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,148 @@
+import os
+import shutil
+import time
+
+import pytest
+
+from app.xml import atomic_file, splice_writer, wz_writer, xml_loader
+from app.xml.act_helpers import apply_rewards, extract_rewards
+from app.xml.atomic_file import temp_path, write_atomic
+from app.xml.quest_index import drop_index, get_index
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+def _read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _copy(tmp_path, kind):
+    path = str(tmp_path / f"{kind}.img.xml")
+    shutil.copyfile(os.path.join(DATA, f"{kind}.img.xml"), path)
+    return path
+
+
+def test_the_new_file_replaces_the_old_one(tmp_path):
+    path = str(tmp_path / "quests.xml")
+    write_atomic(path, lambda out: out.write(b"new"))  # no file yet
+    assert _read(path) == b"new"
+    write_atomic(path, lambda out: out.write(b"newer"))
+    assert _read(path) == b"newer"
+    assert os.listdir(tmp_path) == ["quests.xml"]
+
+
+def test_the_temp_file_is_next_to_the_target(tmp_path):
+    path = str(tmp_path / "quests.xml")
+    seen = []
+    write_atomic(path, lambda out: seen.append(os.path.exists(temp_path(path))))
+    assert seen == [True]
+    assert os.path.dirname(temp_path(path)) == str(tmp_path)
+
+
+def test_a_failed_write_leaves_the_old_file_and_no_temp_file(tmp_path):
+    path = str(tmp_path / "quests.xml")
+    write_atomic(path, lambda out: out.write(b"old"))
+
+    def write(out):
+        out.write(b"half of the new")
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        write_atomic(path, write)
+    assert _read(path) == b"old"
+    assert os.listdir(tmp_path) == ["quests.xml"]
+
+
+def test_progress_is_reported_while_writing(tmp_path, monkeypatch):
+    monkeypatch.setattr(atomic_file, "PROGRESS_STEP", 4)
+    calls = []
+
+    def write(out):
+        for _ in range(5):
+            out.write(b"abc")
+
+    write_atomic(str(tmp_path / "quests.xml"), write, lambda done, total: calls.append((done, total)), 10)
+    # Every 4+ bytes; the total grows when the estimate was short; then done.
+    assert calls == [(6, 10), (12, 12), (15, 15)]
+
+
+def test_a_failed_save_keeps_the_file_and_the_pending_changes(tmp_path, monkeypatch):
+    path = _copy(tmp_path, "Act")
+    tree = xml_loader.load_xml(path)
+    root = tree.getroot()
+    rewards = extract_rewards(root, 1000)
+    rewards.exp = 12345
+    apply_rewards(root, 1000, rewards)
+
+    def write_tree(tree, out, fmt):
+        out.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n<imgdir')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(splice_writer, "write_tree", lambda *args: False)
+    monkeypatch.setattr(wz_writer, "write_tree", write_tree)
+    with pytest.raises(OSError):
+        xml_loader.save_changes(tree, path)
+    assert _read(path) == _read(os.path.join(DATA, "Act.img.xml"))
+    assert not os.path.exists(temp_path(path))
+    assert xml_loader.pending_changes(tree) == ["1000"]
+
+    monkeypatch.undo()
+    assert xml_loader.save_changes(tree, path) == ["1000"]
+    assert b'value="12345"' in _read(path)
+    drop_index(root)
+
+
+def _run_save_job(files):
+    """Run an XmlSaveJob to the end: (progress calls, finished results)."""
+    QCoreApplication = pytest.importorskip("PySide6.QtCore").QCoreApplication
+    from app.ui.xml_save_job import XmlSaveJob
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    progress, finished = [], []
+    job = XmlSaveJob(files)
+    job.progress.connect(lambda done, total, label: progress.append((done, total, label)))
+    job.finished.connect(finished.append)
+    job.start()
+    # Signals from the worker are queued onto this thread.
+    deadline = time.monotonic() + 10
+    while not finished and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    job.wait()
+    assert finished, "save job did not finish"
+    return progress, finished[0]
+
+
+def test_the_save_job_writes_the_changed_files_in_the_background(tmp_path, monkeypatch):
+    files = []
+    for kind in ("Act", "Check"):
+        path = _copy(tmp_path, kind)
+        files.append((kind, xml_loader.load_xml(path), path))
+    act_root = files[0][1].getroot()
+    rewards = extract_rewards(act_root, 1001)
+    rewards.exp = 999
+    apply_rewards(act_root, 1001, rewards)
+    check_before = _read(files[1][2])
+
+    progress, results = _run_save_job(files)
+    assert results == {"Act": ["1001"]}
+    assert progress[0][:2] == (0, os.path.getsize(os.path.join(DATA, "Act.img.xml")))
+    done, total, label = progress[-1]
+    assert done == total == os.path.getsize(files[0][2]) and label == "Act.img.xml"
+    assert b'value="999"' in _read(files[0][2])
+    assert _read(files[1][2]) == check_before
+    assert not get_index(act_root).dirty
+
+    # A file that fails is reported, and its changes stay pending.
+    apply_rewards(act_root, 1001, extract_rewards(act_root, 1000))
+
+    def save_xml(tree, path, progress=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(xml_loader, "save_xml", save_xml)
+    _progress, results = _run_save_job(files)
+    assert isinstance(results["Act"], OSError)
+    assert xml_loader.pending_changes(files[0][1]) == ["1001"]
+    for _kind, tree, _path in files:
+        drop_index(tree.getroot())
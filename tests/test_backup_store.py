@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from app.xml import backup_store
+from app.xml.backup_store import BackupError
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "Act.img.xml")
+
+
+def _original() -> bytes:
+    with open(FIXTURE, "rb") as f:
+        return f.read()
+
+
+class DataFile:
+    """The XML under test; every write gets a new mtime, as a save would."""
+
+    def __init__(self, folder):
+        self.path = str(folder / "Act.img.xml")
+        self.store = backup_store.store_dir_for(self.path)
+        self._mtime = 1_000_000_000
+
+    def write(self, data: bytes):
+        with open(self.path, "wb") as f:
+            f.write(data)
+        self._mtime += 1
+        os.utime(self.path, (self._mtime, self._mtime))
+
+    def read(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def packs(self):
+        return sorted(name for name in os.listdir(self.store) if name.endswith(".pack"))
+
+
+@pytest.fixture
+def xml(tmp_path):
+    data = DataFile(tmp_path)
+    data.write(_original())
+    return data
+
+
+def test_backup_and_restore(xml):
+    original = _original()
+    assert backup_store.backup(xml.path) == 1
+    assert backup_store.backup(xml.path) == 1  # unchanged: nothing new
+
+    edited = original.replace(b'value="250"', b'value="999"')
+    xml.write(edited)
+    assert backup_store.backup(xml.path) == 2
+    # Only the changed quest is stored again.
+    assert os.path.getsize(os.path.join(xml.store, "000002.pack")) < len(original) / 3
+
+    backup_store.restore(xml.path, 1)
+    assert xml.read() == original
+    listed = backup_store.versions(xml.path)
+    assert [v.seq for v in listed] == [3, 2, 1]
+    assert listed[0].restored_from == 1
+    assert listed[2].quests == 3
+
+    # The restore backed up the file it replaced, so it can be undone.
+    backup_store.restore(xml.path, 2)
+    assert xml.read() == edited
+
+
+def test_shares_blobs_with_every_kept_version(xml):
+    original = _original()
+    backup_store.backup(xml.path)
+    xml.write(original.replace(b'value="250"', b'value="999"'))
+    backup_store.backup(xml.path)
+
+    # Back to the first version's contents: every piece is in version 1.
+    xml.write(original)
+    assert backup_store.backup(xml.path) == 3
+    assert xml.packs() == ["000001.pack", "000002.pack"]
+
+
+def test_claimed_version_numbers_are_skipped(xml):
+    backup_store.backup(xml.path)
+    # Another editor claimed version 2 and hasn't written it yet.
+    open(os.path.join(xml.store, "000002.manifest"), "wb").close()
+
+    xml.write(_original().replace(b'value="250"', b'value="999"'))
+    assert backup_store.backup(xml.path) == 3
+    assert [v.seq for v in backup_store.versions(xml.path)] == [3, 1]
+    backup_store.restore(xml.path, 1)
+    assert [v.seq for v in backup_store.versions(xml.path)] == [4, 3, 1]
+
+    # Two claims never get the same number.
+    assert backup_store._claim_seq(xml.store) == 5
+    assert backup_store._claim_seq(xml.store) == 6
+
+
+def test_damaged_backup_leaves_the_file_alone(xml):
+    backup_store.backup(xml.path)
+    xml.write(_original().replace(b'value="250"', b'value="999"'))
+    current = xml.read()
+
+    pack = os.path.join(xml.store, "000001.pack")
+    with open(pack, "r+b") as f:
+        f.write(b"\0" * 16)
+    with pytest.raises(BackupError):
+        backup_store.restore(xml.path, 1)
+    assert xml.read() == current
+
+    with pytest.raises(BackupError):
+        backup_store.restore(xml.path, 42)
+
+
+def test_prune_keeps_what_kept_versions_need(xml, monkeypatch):
+    monkeypatch.setattr(backup_store, "MAX_VERSIONS", 2)
+    original = _original()
+    for n, value in enumerate((b"1", b"2", b"3"), 1):
+        xml.write(original.replace(b'value="250"', b'value="' + value + b'"'))
+        assert backup_store.backup(xml.path) == n
+
+    assert [v.seq for v in backup_store.versions(xml.path)] == [3, 2]
+    # Version 1's pack still holds the quests 2 and 3 share with it.
+    assert "000001.pack" in xml.packs()
+    backup_store.restore(xml.path, 2)
+    assert xml.read() == original.replace(b'value="250"', b'value="2"')
@@ -0,0 +1,193 @@
+import json
+
+import pytest
+
+from app.logic.bulk_clone import SpecError, apply_clones, clone_images, load_spec, plan_clones
+from app.xml import edit_journal
+from app.xml.act_helpers import apply_rewards, extract_rewards, rewards_from_node
+from app.xml.backend import ET
+from app.xml.check_helpers import apply_requirements, extract_requirements, requirements_from_node
+from app.xml.quest_index import get_index
+from app.xml.questinfo_helpers import apply_questinfo, extract_questinfo, questinfo_from_node
+from app.xml.records import PairList, QuestInfo, Requirements, Rewards
+
+
+def _spec(tmp_path, text, name="spec.csv"):
+    path = tmp_path / name
+    path.write_text(text if isinstance(text, str) else json.dumps(text), encoding="utf-8")
+    return str(path)
+
+
+def _roots():
+    roots = {
+        kind: ET.fromstring(f'<imgdir name="{kind}.img"></imgdir>')
+        for kind in ("QuestInfo", "Check", "Act")
+    }
+    apply_questinfo(roots["QuestInfo"], 1000, QuestInfo(name="Base", area=20, auto_start=True))
+    apply_requirements(roots["Check"], 1000, Requirements(start_npc=9010000, lvmin=10))
+    apply_rewards(roots["Act"], 1000, Rewards(exp=100, gain_items=PairList.from_pairs([(2000000, 5)])))
+    apply_questinfo(roots["QuestInfo"], 2000, QuestInfo(name="Taken"))
+    return roots
+
+
+def test_csv_cells_are_parsed_by_field_type(tmp_path):
+    rows = load_spec(_spec(tmp_path, (
+        "base_id,new_id,name,start_npc,auto_start,gain_items,exp\n"
+        "1000,61001,Lost Letter,1012100,no,4031000 1;2000000 x10,\n"
+    )))
+    assert len(rows) == 1
+    row = rows[0]
+    assert (row.line, row.base_id, row.new_id) == (2, 1000, 61001)
+    # The empty exp cell keeps the base value: it is not an override.
+    assert set(row.overrides) == {"name", "start_npc", "auto_start", "gain_items"}
+    assert row.overrides["start_npc"] == 1012100
+    assert row.overrides["auto_start"] is False
+    assert list(row.overrides["gain_items"]) == [(4031000, 1), (2000000, 10)]
+
+
+def test_json_null_clears_and_pairs_may_be_lists(tmp_path):
+    rows = load_spec(_spec(tmp_path, {"clones": [
+        {"base_id": 1000, "new_id": "61001", "summary": None, "gain_items": [[4031000, 2]], "area": 5},
+    ]}, "spec.json"))
+    overrides = rows[0].overrides
+    assert overrides["summary"] == ""
+    assert list(overrides["gain_items"]) == [(4031000, 2)]
+    assert overrides["area"] == 5
+
+
+@pytest.mark.parametrize("text, message", [
+    ("base_id,new_id,colour\n1000,61001,red\n", "line 2: unknown column(s) colour"),
+    ("base_id,new_id\n1000,abc\n", "line 2: new_id: expected a quest ID"),
+    ("base_id,new_id,exp\n1000,61001,lots\n", "line 2: exp: expected a number"),
+    ("base_id,new_id,auto_start\n1000,61001,maybe\n", "line 2: auto_start: expected 1/0"),
+    ("base_id,new_id,items\n1000,61001,4031000\n", "line 2: items: expected \"id count\" pairs"),
+    ("base_id,new_id\n1000,61001\n1000,61001\n", "line 3: new_id 61001 already used on line 2"),
+    ("base_id,new_id\n1000,61001,extra\n", "line 2: more cells than header columns"),
+    ("base_id,new_id\n", "The spec has no rows."),
+])
+def test_bad_specs_are_rejected_as_a_whole(tmp_path, text, message):
+    with pytest.raises(SpecError) as exc:
+        load_spec(_spec(tmp_path, text))
+    assert message in str(exc.value)
+
+
+def test_json_must_be_a_list_of_objects(tmp_path):
+    with pytest.raises(SpecError, match="list of objects"):
+        load_spec(_spec(tmp_path, {"clones": [1, 2]}, "spec.json"))
+    with pytest.raises(SpecError, match="entry 1: exp: expected a number"):
+        load_spec(_spec(tmp_path, [{"base_id": 1000, "new_id": 61001, "exp": True}], "spec.json"))
+
+
+def test_errors_are_cut_off(tmp_path):
+    text = "base_id,new_id\n" + "x,1\n" * 25
+    with pytest.raises(SpecError) as exc:
+        load_spec(_spec(tmp_path, text))
+    lines = str(exc.value).splitlines()
+    assert len(lines) == 21 and lines[-1] == "… and 5 more"
+
+
+def test_plans_start_from_the_base_and_chain(tmp_path):
+    roots = _roots()
+    rows = load_spec(_spec(tmp_path, (
+        "base_id,new_id,name,exp\n"
+        "1000,61001,First,500\n"
+        "61001,61002,,\n"
+        "1000,2000,Over,\n"
+        "4242,61003,Missing,\n"
+    )))
+    plans = plan_clones(rows, roots)
+    first, chained, over, missing = plans
+
+    info = questinfo_from_node(ET.fromstring(first.images["QuestInfo"]))
+    assert (info.name, info.area, info.auto_start) == ("First", 20, True)
+    assert requirements_from_node(ET.fromstring(first.images["Check"])).start_npc == 9010000
+    rewards = rewards_from_node(ET.fromstring(first.images["Act"]))
+    assert rewards.exp == 500 and list(rewards.gain_items) == [(2000000, 5)]
+    # A base that is an earlier row's new_id is copied from that row's quest.
+    assert {kind: xml.replace(b"61002", b"61001") for kind, xml in chained.images.items()} == first.images
+    assert over.overwrites and not first.overwrites
+    assert missing.images is None and missing.error == "base quest 4242 not found"
+
+    # Nothing is written until apply_clones().
+    assert extract_questinfo(roots["QuestInfo"], 61001).name == ""
+    assert apply_clones(plans, roots) == 3
+    assert extract_questinfo(roots["QuestInfo"], 61002).name == "First"
+    assert extract_requirements(roots["Check"], 61002).lvmin == 10
+    assert extract_rewards(roots["Act"], 61002).exp == 500
+    assert extract_questinfo(roots["QuestInfo"], 2000).name == "Over"
+
+
+def test_clones_keep_what_the_records_do_not_model(tmp_path):
+    roots = {
+        "QuestInfo": ET.fromstring(
+            '<imgdir name="QuestInfo.img"><imgdir name="1000">'
+            '<string name="name" value="Base"/><int name="blocked" value="1"/>'
+            '</imgdir></imgdir>'
+        ),
+        "Check": ET.fromstring(
+            '<imgdir name="Check.img"><imgdir name="1000">'
+            '<imgdir name="0"><int name="npc" value="9010000"/><int name="job" value="100"/></imgdir>'
+            '<imgdir name="1"><imgdir name="item"><imgdir name="0">'
+            '<int name="id" value="4000000"/><int name="count" value="10"/>'
+            '</imgdir></imgdir></imgdir>'
+            '</imgdir></imgdir>'
+        ),
+        "Act": ET.fromstring(
+            '<imgdir name="Act.img"><imgdir name="1000">'
+            '<imgdir name="0"><int name="npc" value="9010000"/></imgdir>'
+            '<imgdir name="1"><int name="exp" value="100"/><int name="money" value="500"/>'
+            '<imgdir name="item">'
+            '<imgdir name="0"><int name="id" value="2000000"/><int name="count" value="5"/>'
+            '<int name="prop" value="5"/></imgdir>'
+            '<imgdir name="1"><int name="id" value="4000000"/><int name="count" value="-10"/></imgdir>'
+            '</imgdir></imgdir>'
+            '</imgdir></imgdir>'
+        ),
+    }
+    rows = load_spec(_spec(tmp_path, (
+        "base_id,new_id,name,exp,lose_items\n"
+        "1000,60000,Copy,250,\n"
+        "1000,60001,,,4000001 3\n"
+    )))
+    apply_clones(plan_clones(rows, roots), roots)
+
+    def xml(kind, qid):
+        # Same spelling for both backends (etree writes "<int ... />").
+        return ET.tostring(get_index(roots[kind]).get(qid), encoding="unicode").replace(" />", "/>")
+
+    assert xml("QuestInfo", 60000) == (
+        '<imgdir name="60000"><string name="name" value="Copy"/><int name="blocked" value="1"/></imgdir>'
+    )
+    # Fields that were not overridden are copied as they are.
+    assert xml("Check", 60000) == xml("Check", 1000).replace('"1000"', '"60000"')
+    act = xml("Act", 60000)
+    assert '<imgdir name="0"><int name="npc" value="9010000"/></imgdir>' in act
+    assert '<int name="exp" value="250"/>' in act and '<int name="money" value="500"/>' in act
+    assert '<int name="prop" value="5"/>' in act
+
+    # Replacing the lose rows keeps the gain row with its extra value.
+    rewards = extract_rewards(roots["Act"], 60001)
+    assert list(rewards.gain_items) == [(2000000, 5)]
+    assert list(rewards.lose_items) == [(4000001, 3)]
+    assert '<int name="prop" value="5"/>' in xml("Act", 60001)
+
+
+def test_plans_fail_without_questinfo(tmp_path):
+    rows = load_spec(_spec(tmp_path, "base_id,new_id\n1000,61001\n"))
+    plans = plan_clones(rows, {"QuestInfo": None, "Check": None, "Act": None})
+    assert [plan.error for plan in plans] == ["QuestInfo is not loaded"]
+
+
+def test_journal_replays_the_cloned_quests(tmp_path):
+    roots = _roots()
+    rows = load_spec(_spec(tmp_path, "base_id,new_id,exp\n1000,61001,500\n61001,61002,\n"))
+    plans = plan_clones(rows, roots)
+    journal = edit_journal.EditJournal(str(tmp_path))
+    ids = [61001, 61002]
+    journal.log_bulk_clone(edit_journal.quest_images(roots, ids), clone_images(plans), "Bulk clone")
+    apply_clones(plans, roots)
+    journal.close()
+
+    on_disk = _roots()
+    edit_journal.replay(edit_journal.EditJournal(str(tmp_path)).pending(), on_disk)
+    assert edit_journal.quest_images(on_disk, ids) == edit_journal.quest_images(roots, ids)
@@ -0,0 +1,95 @@
+import os
+import shutil
+
+from app.xml import backup_store, xml_loader
+from app.xml.act_helpers import apply_rewards, extract_rewards
+from app.xml.check_helpers import apply_requirements, extract_requirements
+from app.xml.quest_index import get_index
+from app.xml.reverse_index import EXP, build_reverse_index
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+KINDS = ("QuestInfo", "Check", "Act")
+
+
+def _folder(tmp_path):
+    """Copy of the fixture files, loaded: {kind: (tree, path)}."""
+    files = {}
+    for kind in KINDS:
+        path = str(tmp_path / f"{kind}.img.xml")
+        shutil.copyfile(os.path.join(DATA, f"{kind}.img.xml"), path)
+        files[kind] = (xml_loader.load_xml(path), path)
+    return files
+
+
+def _disk(files):
+    out = {}
+    for kind, (_tree, path) in files.items():
+        with open(path, "rb") as f:
+            out[kind] = (f.read(), os.stat(path).st_mtime_ns)
+    return out
+
+
+def test_a_freshly_loaded_file_has_nothing_pending(tmp_path):
+    for tree, _path in _folder(tmp_path).values():
+        assert xml_loader.pending_changes(tree) == []
+
+
+def test_writing_the_same_data_marks_nothing(tmp_path):
+    files = _folder(tmp_path)
+    check = files["Check"][0].getroot()
+    apply_requirements(check, 1000, extract_requirements(check, 1000))
+    assert xml_loader.pending_changes(files["Check"][0]) == []
+
+    data = extract_requirements(check, 1000)
+    data.lvmin = 11
+    apply_requirements(check, 1000, data)
+    assert xml_loader.pending_changes(files["Check"][0]) == ["1000"]
+
+
+def test_only_changed_files_are_backed_up_and_written(tmp_path):
+    files = _folder(tmp_path)
+    before = _disk(files)
+    act = files["Act"][0].getroot()
+    data = extract_rewards(act, 1002)
+    data.exp = 900
+    apply_rewards(act, 1002, data)
+
+    saved = {kind: xml_loader.save_changes(tree, path) for kind, (tree, path) in files.items()}
+    assert saved == {"QuestInfo": [], "Check": [], "Act": ["1002"]}
+    after = _disk(files)
+    for kind in ("QuestInfo", "Check"):
+        assert after[kind] == before[kind]
+        assert backup_store.versions(files[kind][1]) == []
+    assert after["Act"][0] != before["Act"][0]
+    assert len(backup_store.versions(files["Act"][1])) == 1
+    # Saved: nothing is pending any more, so the next save writes nothing.
+    assert xml_loader.save_changes(*files["Act"]) == []
+
+
+def test_deleting_touches_only_the_files_holding_the_quest(tmp_path):
+    files = _folder(tmp_path)
+    get_index(files["Check"][0].getroot()).append(
+        xml_loader.ET.Element("imgdir", {"name": "5000"})
+    )
+    get_index(files["Check"][0].getroot()).clear_dirty()
+
+    removed = {kind: get_index(tree.getroot()).remove(5000) is not None for kind, (tree, _p) in files.items()}
+    assert removed == {"QuestInfo": False, "Check": True, "Act": False}
+    assert {kind: xml_loader.pending_changes(tree) for kind, (tree, _p) in files.items()} == {
+        "QuestInfo": [], "Check": ["5000"], "Act": []
+    }
+
+
+def test_the_reverse_index_sees_what_was_written(tmp_path):
+    files = _folder(tmp_path)
+    act = files["Act"][0].getroot()
+    index = get_index(act)
+    index.reverse = build_reverse_index(act, "Act")
+    assert index.reverse.columns[EXP].values[1000] == 100
+
+    data = extract_rewards(act, 1000)
+    data.exp = -5  # not written: apply_rewards drops a negative exp
+    apply_rewards(act, 1000, data)
+    assert extract_rewards(act, 1000).exp is None
+    assert 1000 not in index.reverse.columns[EXP].values
+    assert index.reverse.columns[EXP].count(None, 0) == 0
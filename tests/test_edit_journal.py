@@ -0,0 +1,149 @@
+import os
+
+import pytest
+
+from app.xml import edit_journal
+from app.xml.act_helpers import apply_rewards
+from app.xml.backend import ET
+from app.xml.check_helpers import apply_requirements
+from app.xml.edit_journal import EditJournal, quest_images
+from app.xml.questinfo_helpers import apply_questinfo, extract_questinfo
+from app.xml.quest_index import get_index
+from app.xml.records import QuestInfo, Requirements, Rewards
+
+
+def _roots():
+    roots = {
+        kind: ET.fromstring(f'<imgdir name="{kind}.img"></imgdir>')
+        for kind in ("QuestInfo", "Check", "Act")
+    }
+    _clone(roots, [1000], "Original", exp=10)
+    for root in roots.values():
+        get_index(root).clear_dirty()
+    return roots
+
+
+def _clone(roots, ids, name, exp=100, journal=None):
+    """Log (if a journal is given), then apply one clone, like the editor does."""
+    records = QuestInfo(name=name), Requirements(start_npc=9010000, lvmin=10), Rewards(exp=exp)
+    if journal is not None:
+        journal.log_clone(quest_images(roots, ids), ids, *records, f"Clone → {ids}")
+    for qid in ids:
+        apply_questinfo(roots["QuestInfo"], qid, records[0])
+        apply_requirements(roots["Check"], qid, records[1])
+        apply_rewards(roots["Act"], qid, records[2])
+
+
+def _state(roots, ids=(1000, 2000, 2001)):
+    return {kind: {qid: get_index(root).xml_of(qid) for qid in ids} for kind, root in roots.items()}
+
+
+def test_replay_applies_pending_edits_again(tmp_path):
+    roots = _roots()
+    journal = EditJournal(str(tmp_path))
+    _clone(roots, [2000, 2001], "New", journal=journal)
+    _clone(roots, [1000], "Renamed", journal=journal)
+    journal.log_delete(quest_images(roots, [2001]), [2001], "Delete 2001")
+    get_index(roots["Check"]).remove(2001)
+    get_index(roots["QuestInfo"]).remove(2001)
+    get_index(roots["Act"]).remove(2001)
+    journal.close()
+
+    # A crash before any file was saved: the files still hold the old state.
+    ops = EditJournal(str(tmp_path)).pending()
+    assert [op["op"] for op in ops] == ["clone", "clone", "delete"]
+    on_disk = _roots()
+    assert edit_journal.replay(ops, on_disk) == 3
+    assert _state(on_disk) == _state(roots)
+    # Applying them twice changes nothing.
+    edit_journal.replay(ops, on_disk)
+    assert _state(on_disk) == _state(roots)
+
+
+def test_roll_back_restores_before_images(tmp_path):
+    roots = _roots()
+    before = _state(roots)
+    journal = EditJournal(str(tmp_path))
+    _clone(roots, [1000, 2000], "Changed", journal=journal)
+    _clone(roots, [2000], "Again", journal=journal)
+    assert _state(roots) != before
+
+    edit_journal.roll_back(journal.pending(), roots)
+    assert _state(roots) == before
+    assert extract_questinfo(roots["QuestInfo"], 1000).name == "Original"
+
+
+def test_torn_tail_is_cut_off(tmp_path):
+    roots = _roots()
+    journal = EditJournal(str(tmp_path))
+    _clone(roots, [2000], "One", journal=journal)
+    _clone(roots, [2001], "Two", journal=journal)
+    journal.close()
+    good = os.path.getsize(journal.path)
+
+    # Crash in the middle of appending a third record.
+    with open(journal.path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x12\x34")
+    reopened = EditJournal(str(tmp_path))
+    assert len(reopened.pending()) == 2
+    assert os.path.getsize(journal.path) == good
+
+    # A damaged record ends the journal there, even with frames after it.
+    with open(journal.path, "r+b") as f:
+        f.seek(good - 1)
+        f.write(b"\xff")
+    reopened = EditJournal(str(tmp_path))
+    assert [op["label"] for op in reopened.pending()] == ["Clone → [2000]"]
+    assert reopened.size == os.path.getsize(journal.path) < good
+
+
+def test_rolled_back_transaction_is_not_pending(tmp_path):
+    roots = _roots()
+    journal = EditJournal(str(tmp_path))
+    _clone(roots, [2000], "Kept", journal=journal)
+    journal.log_begin()
+    _clone(roots, [2001], "Dropped", journal=journal)
+    journal.log_rollback()
+    journal.log_begin()
+    assert [op["label"] for op in journal.pending()] == ["Clone → [2000]"]
+
+    journal.checkpoint()
+    assert journal.pending() == [] and not os.path.exists(journal.path)
+
+
+@pytest.mark.parametrize("in_transaction", [False, True])
+def test_compact_keeps_replay_and_roll_back(tmp_path, in_transaction):
+    roots = _roots()
+    original = _state(roots)
+    journal = EditJournal(str(tmp_path))
+    for n in range(20):
+        _clone(roots, [1000, 2000], f"Edit {n}", exp=n, journal=journal)
+    if in_transaction:
+        journal.log_begin()
+    for n in range(20):
+        _clone(roots, [2000, 2001], f"Tx {n}", exp=n, journal=journal)
+    size = journal.size
+
+    assert not journal.compact(roots, max_bytes=size + 1)
+    assert journal.compact(roots, max_bytes=size // 2)
+    assert journal.size < size / 10
+    # Not again until the journal has doubled.
+    assert not journal.compact(roots, max_bytes=1)
+    journal.close()
+
+    reopened = EditJournal(str(tmp_path))
+    ops = reopened.pending()
+    assert [op["op"] for op in ops] == ["restore"] * (2 if in_transaction else 1)
+    on_disk = _roots()
+    edit_journal.replay(ops, on_disk)
+    assert _state(on_disk) == _state(roots)
+    edit_journal.roll_back(ops, on_disk)
+    assert _state(on_disk) == original
+
+    if in_transaction:
+        # Rolling the transaction back still drops only its own edits.
+        reopened.log_rollback()
+        committed = _roots()
+        edit_journal.replay(reopened.pending(), committed)
+        assert extract_questinfo(committed["QuestInfo"], 2000).name == "Edit 19"
+        assert get_index(committed["QuestInfo"]).get(2001) is None
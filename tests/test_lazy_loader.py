@@ -0,0 +1,84 @@
+import os
+import shutil
+
+from app.xml import lazy_loader, xml_loader
+from app.xml.act_helpers import apply_rewards, extract_rewards
+from app.xml.lazy_loader import LazyQuestIndex, scan_top_level
+from app.xml.quest_index import drop_index, get_index
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "Act.img.xml")
+
+
+def _load(tmp_path):
+    path = str(tmp_path / "Act.img.xml")
+    shutil.copyfile(FIXTURE, path)
+    return path, xml_loader.load_xml(path, mode=xml_loader.LOAD_LAZY)
+
+
+def _read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_scan_finds_every_top_level_quest():
+    buf = _read(FIXTURE)
+    root_open_end, last_end, found, attrib = scan_top_level(buf)
+    assert attrib == {"name": "Act.img"}
+    assert [name for name, _start, _end in found] == ["1000", "1001", "1002"]
+    for name, start, end in found:
+        assert buf[start:end].startswith(f'<imgdir name="{name}">'.encode())
+        assert buf[start:end].endswith(b"</imgdir>")
+    assert buf[:root_open_end].endswith(b'<imgdir name="Act.img">')
+    assert buf[last_end:].strip() == b"</imgdir>"
+
+
+def test_quests_are_parsed_on_demand_and_kept_in_a_small_lru(tmp_path, monkeypatch):
+    monkeypatch.setattr(lazy_loader, "CACHE_SIZE", 1)
+    _path, tree = _load(tmp_path)
+    root = tree.getroot()
+    index = get_index(root)
+    assert isinstance(index, LazyQuestIndex)
+    assert len(root) == 0 and index.ids() == ["1000", "1001", "1002"]
+
+    first = index.get(1000)
+    assert index.get(1000) is first
+    index.get(1001)  # pushes 1000 out
+    assert index.get(1000) is not first
+    assert extract_rewards(root, 1000).to_tuple() == extract_rewards(
+        xml_loader.load_xml(FIXTURE).getroot(), 1000
+    ).to_tuple()
+    drop_index(root)
+
+
+def test_an_unchanged_save_is_byte_for_byte(tmp_path):
+    path, tree = _load(tmp_path)
+    xml_loader.save_xml(tree, path)
+    assert _read(path) == _read(FIXTURE)
+    drop_index(tree.getroot())
+
+
+def test_only_the_edited_quest_is_rewritten(tmp_path):
+    path, tree = _load(tmp_path)
+    root = tree.getroot()
+    rewards = extract_rewards(root, 1000)
+    rewards.exp = 12345
+    apply_rewards(root, 1000, rewards)
+    assert xml_loader.save_changes(tree, path) == ["1000"]
+
+    expected = _read(FIXTURE).replace(b'value="100"', b'value="12345"')
+    assert _read(path) == expected
+    # The index now reads from the new file.
+    assert extract_rewards(root, 1000).exp == 12345
+    assert "Tom &amp; Jerry".encode() in get_index(root).xml_of(1001)
+    xml_loader.save_xml(tree, path)
+    assert _read(path) == expected
+    drop_index(root)
+
+
+def test_files_it_cannot_scan_are_parsed_in_full(tmp_path):
+    path = tmp_path / "Act.img.xml"
+    path.write_bytes(b'<?xml version="1.0"?><quests><quest id="1"/></quests>')
+    tree = xml_loader.load_xml(str(path), mode=xml_loader.LOAD_LAZY)
+    assert not isinstance(get_index(tree.getroot()), LazyQuestIndex)
+    assert tree.getroot()[0].get("id") == "1"
+    drop_index(tree.getroot())
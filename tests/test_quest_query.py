@@ -0,0 +1,104 @@
+from array import array
+
+import pytest
+
+from app.logic.quest_query import (
+    And,
+    KeyTerm,
+    NameTerm,
+    Not,
+    Or,
+    QueryContext,
+    QuerySyntaxError,
+    RangeTerm,
+    is_query,
+    parse_query,
+    parse_range,
+    run_query,
+)
+from app.xml.questinfo_helpers import QuestList
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("30..50", (30, 50)),
+        ("30..", (30, None)),
+        ("..50", (None, 50)),
+        ("20", (20, 20)),
+        ("=20", (20, 20)),
+        (">5000", (5001, None)),
+        (">=5000", (5000, None)),
+        ("<40", (None, 39)),
+        ("<=40", (None, 40)),
+    ],
+)
+def test_parse_range(text, expected):
+    assert parse_range(text) == expected
+
+
+@pytest.mark.parametrize("text", ["..", "a..5", "5..b", "abc", ">", "=>5", "-3"])
+def test_parse_range_rejects(text):
+    with pytest.raises(QuerySyntaxError):
+        parse_range(text)
+
+
+def test_plain_words_are_not_a_query():
+    assert parse_query("blue potion") is None
+    assert parse_query("") is None
+    assert not is_query("maple island")
+
+
+def test_terms_next_to_each_other_are_anded():
+    query = parse_query("lvmin:30..50 npc:9010000 -name:test")
+    assert isinstance(query, And)
+    level, npc, negated = query.children
+    assert isinstance(level, RangeTerm) and (level.field, level.low, level.high) == ("lvmin", 30, 50)
+    assert isinstance(npc, KeyTerm) and (npc.prefix, npc.key) == ("npc", 9010000)
+    assert isinstance(negated, Not) and isinstance(negated.child, NameTerm)
+    assert negated.child.text == "test"
+
+
+def test_or_binds_looser_than_and():
+    query = parse_query("exp:>5000 (area:20 OR area:30)")
+    assert isinstance(query, And)
+    assert isinstance(query.children[1], Or)
+    assert [c.low for c in query.children[1].children] == [20, 30]
+
+    query = parse_query("id:1 id:2 OR id:3")
+    assert isinstance(query, Or)
+    assert isinstance(query.children[0], And)
+
+
+def test_quoted_values_keep_spaces():
+    query = parse_query('name:"Blue Potion"')
+    assert isinstance(query, NameTerm) and query.text == "blue potion"
+
+
+def test_lower_case_operators_are_words():
+    query = parse_query("id:5 or")
+    assert isinstance(query, And)
+    assert query.children[1].text == "or"
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["npc:", "npc:abc", "lvmin:x", "(id:1", "id:1)", "id:1 OR", "NOT", "exp:1..x"],
+)
+def test_malformed_queries_raise(text):
+    with pytest.raises(QuerySyntaxError):
+        parse_query(text)
+    assert is_query(text)
+
+
+def test_run_query_on_ids_and_names():
+    quests = QuestList(array("i", [1000, 1001, 2000, 2001]), ["Alpha", "Beta", "Alpha two", "Gamma"])
+    ctx = QueryContext(quests, {})
+
+    def names(text):
+        return [quests.names[pos] for pos in run_query(parse_query(text), ctx)]
+
+    assert names("id:1000..2000") == ["Alpha", "Beta", "Alpha two"]
+    assert names("name:alpha -id:<2000") == ["Alpha two"]
+    assert names("name:gamma OR id:1001") == ["Beta", "Gamma"]
+    assert names("NOT name:a") == []
@@ -0,0 +1,123 @@
+import os
+import threading
+from array import array
+
+import pytest
+
+from app.logic import quest_search
+from app.logic.quest_search import SearchRequest, SearchResult, narrows, search_rows
+from app.xml import xml_loader
+from app.xml.quest_index import drop_index
+from app.xml.questinfo_helpers import QuestList, build_quest_list
+from app.xml.reverse_index import build_reverse_index
+from app.xml.text_index import build_text_index
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+@pytest.fixture(scope="module")
+def files():
+    """QuestInfo list + text index and the Check root, loaded once."""
+    info = xml_loader.load_xml(os.path.join(DATA, "QuestInfo.img.xml")).getroot()
+    check = xml_loader.load_xml(os.path.join(DATA, "Check.img.xml")).getroot()
+    build_reverse_index(check, "Check")
+    yield build_quest_list(info), build_text_index(info), check
+    drop_index(info)
+    drop_index(check)
+
+
+def _search(text, quests, text_index=None, previous=None, check=None, cancel=None, emit=None):
+    request = SearchRequest(text, quests, check_root=check, text_index=text_index, previous=previous)
+    return search_rows(request, cancel or threading.Event(), emit or (lambda chunk: None))
+
+
+def _ids(result):
+    return [result.quests.ids[pos] for pos in result.rows]
+
+
+def test_words_rank_full_text_hits_first(files):
+    quests, text_index, _check = files
+    result = _search("potion", quests, text_index)
+    assert _ids(result) == [1002, 1001] and not result.ordered
+    # Without the text index: ID / name substrings, in ID order.
+    result = _search("potion", quests)
+    assert _ids(result) == [1002] and result.ordered
+    assert _ids(_search("100", quests)) == [1000, 1001, 1002]
+
+
+def test_structured_queries_use_the_indexes(files):
+    quests, text_index, check = files
+    result = _search("lvmin:10..20", quests, text_index, check=check)
+    assert result.query and _ids(result) == [1000, 1001]
+    result = _search("lvmin:10..", quests, text_index, check=check)
+    assert _ids(result) == [1000, 1001, 1002]
+
+
+@pytest.mark.parametrize(
+    "old, new, expected",
+    [
+        ("sna", "snai", True),
+        ("snail", "snail hu", True),
+        ("snail", "sna", False),
+        ("s", "sl", False),  # one letter only matched the whole word "s"
+        ("10", "100", True),
+        ("10", "10a", False),
+    ],
+)
+def test_narrows(files, old, new, expected):
+    quests, text_index, _check = files
+    previous = _search(old, quests, text_index)
+    assert narrows(previous, SearchRequest(new, quests, text_index=text_index)) is expected
+
+
+def test_narrowing_needs_the_same_list_and_index(files):
+    quests, text_index, _check = files
+    previous = _search("sna", quests, text_index)
+    other = QuestList(array("i", quests.ids), list(quests.names))
+    assert not narrows(previous, SearchRequest("snai", other, text_index=text_index))
+    assert not narrows(previous, SearchRequest("snai", quests))
+    query = _search("lvmin:10..", quests, text_index)
+    assert not narrows(query, SearchRequest("lvmin:10..2", quests, text_index=text_index))
+
+
+def test_a_narrowed_search_only_looks_at_the_previous_rows(files):
+    quests, text_index, _check = files
+    fresh = _search("poti", quests, text_index)
+    previous = _search("pot", quests, text_index)
+    assert _ids(_search("poti", quests, text_index, previous=previous)) == _ids(fresh)
+
+    assert _ids(fresh)[0] == 1002
+
+    # Had "pot" found only 1001, the ranked hits are 1001 alone (1002 can
+    # only come back from the fuzzy name pass, which is not narrowed).
+    only = array("i", [quests.position(1001)])
+    previous = SearchResult("pot", quests, only, True, True)
+    assert _ids(_search("poti", quests, text_index, previous=previous))[0] == 1001
+
+
+def test_rows_are_emitted_in_chunks(files, monkeypatch):
+    quests, _text_index, _check = files
+    monkeypatch.setattr(quest_search, "CHUNK_ROWS", 1)
+    chunks = []
+    result = _search("100", quests, emit=chunks.append)
+    assert [list(chunk) for chunk in chunks] == [[0], [1], [2]]
+    assert list(result.rows) == [0, 1, 2]
+
+
+def test_a_cancelled_search_returns_nothing(files, monkeypatch):
+    quests, text_index, _check = files
+    cancel = threading.Event()
+    cancel.set()
+    assert _search("potion", quests, text_index, cancel=cancel) is None
+
+    # Cancelled by a new keystroke after the first chunk went out.
+    monkeypatch.setattr(quest_search, "CHUNK_ROWS", 1)
+    cancel = threading.Event()
+    chunks = []
+
+    def emit(chunk):
+        chunks.append(chunk)
+        cancel.set()
+
+    assert _search("100", quests, cancel=cancel, emit=emit) is None
+    assert len(chunks) == 1
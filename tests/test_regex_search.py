@@ -0,0 +1,139 @@
+import threading
+import time
+from array import array
+
+import pytest
+
+from app.logic import regex_search
+from app.logic.quest_search import SearchRequest, search_rows
+from app.logic.regex_search import (
+    PATTERN_CACHE_SIZE,
+    RegexScanner,
+    RegexSearchError,
+    compile_pattern,
+    match_items,
+    parse_regex,
+)
+from app.xml.questinfo_helpers import QuestList
+
+# Exponential backtracking on a long run of a's that does not end the string.
+CATASTROPHIC = "(a+)+$"
+SLOW_TEXT = "a" * 40 + "b"
+
+
+@pytest.fixture
+def scanner():
+    scanner = RegexScanner(budget=0.5)
+    yield scanner
+    scanner.close()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("rx:^Sn", (None, "^Sn")),
+        ("RX: snail hunt ", (None, "snail hunt")),
+        ("rx.log:^kill", (("0", "1", "2"), "^kill")),
+        ("rx.Reward:a:b", (("rewardSummary",), "a:b")),
+        ("snail", None),
+        ("rxx:snail", None),
+    ],
+)
+def test_parse_regex(text, expected):
+    assert parse_regex(text) == expected
+
+
+def test_unknown_fields_and_bad_patterns_raise():
+    with pytest.raises(RegexSearchError):
+        parse_regex("rx.bogus:x")
+    with pytest.raises(RegexSearchError):
+        compile_pattern("(unclosed")
+
+
+def test_compiled_patterns_are_cached():
+    compile_pattern.cache_clear()
+    first = compile_pattern("^snail")
+    assert compile_pattern("^snail") is first
+    info = compile_pattern.cache_info()
+    assert (info.hits, info.misses, info.maxsize) == (1, 1, PATTERN_CACHE_SIZE)
+
+
+def test_match_items_ignores_case():
+    items = [(1, ("Snail Hunt",)), (2, ("Lost Letter", "snail shell")), (3, ("Potion",))]
+    assert match_items("^snail", items) == [1, 2]
+    assert match_items("xyz", items) == []
+
+
+def test_scan_finds_every_chunk(scanner, monkeypatch):
+    monkeypatch.setattr(regex_search, "CHUNK_QUESTS", 2)
+    items = [(key, (f"quest {key}",)) for key in range(5)]
+    chunks = []
+    assert scanner.scan(r"[024]$", items, threading.Event(), chunks.append) is True
+    assert chunks == [[0], [2], [4]]
+    # The child is kept for the next search.
+    assert scanner.scan(r"3$", items, threading.Event(), chunks.append) is True
+    assert chunks[-3:] == [[], [3], []]
+
+
+def test_a_catastrophic_pattern_returns_what_it_found(scanner, monkeypatch):
+    monkeypatch.setattr(regex_search, "CHUNK_QUESTS", 1)
+    items = [(1, ("aaa",)), (2, (SLOW_TEXT,)), (3, ("aa",))]
+    chunks = []
+    started = time.monotonic()
+    assert scanner.scan(CATASTROPHIC, items, threading.Event(), chunks.append) is False
+    assert time.monotonic() - started < 10
+    assert chunks == [[1]]
+    # The killed child is replaced for the next search.
+    assert scanner.scan("^a+$", items[:1], threading.Event(), chunks.append) is True
+
+
+def test_a_cancelled_scan_returns_none(scanner):
+    cancel = threading.Event()
+    cancel.set()
+    assert scanner.scan("a", [(1, ("a",))], cancel, lambda keys: None) is None
+
+    # Cancelled while the child is stuck in a match.
+    cancel = threading.Event()
+    timer = threading.Timer(0.1, cancel.set)
+    timer.start()
+    scanner.budget = 30.0
+    started = time.monotonic()
+    assert scanner.scan(CATASTROPHIC, [(1, (SLOW_TEXT,))], cancel, lambda keys: None) is None
+    assert time.monotonic() - started < 10
+    timer.join()
+
+
+def test_a_bad_pattern_is_reported_before_the_child_starts(scanner):
+    with pytest.raises(RegexSearchError):
+        scanner.scan("(", [(1, ("a",))], threading.Event(), lambda keys: None)
+
+
+def _quests(*names):
+    return QuestList(array("i", range(1, len(names) + 1)), list(names))
+
+
+def test_search_rows_matches_id_and_name_lines(scanner):
+    quests = QuestList(array("i", [1000, 1001, 1002]), ["Lost Letter", "Snail Hunt", "Potion"])
+    request = SearchRequest("rx:^100[12]", quests)
+    result = search_rows(request, threading.Event(), lambda chunk: None, scanner)
+    assert list(result.rows) == [1, 2] and result.query and result.error is None
+
+    request = SearchRequest("rx:: snail", quests)
+    assert list(search_rows(request, threading.Event(), lambda chunk: None, scanner).rows) == [1]
+
+
+def test_search_rows_stops_at_the_time_budget(scanner, monkeypatch):
+    monkeypatch.setattr(regex_search, "CHUNK_QUESTS", 1)
+    request = SearchRequest(f"rx:{CATASTROPHIC}", _quests("aaa", SLOW_TEXT))
+    emitted = []
+    result = search_rows(request, threading.Event(), emitted.append, scanner)
+    assert list(result.rows) == [0] and [list(chunk) for chunk in emitted] == [[0]]
+    assert result.error.startswith("rx: stopped after 0.5 s")
+
+
+def test_search_rows_reports_bad_patterns():
+    request = SearchRequest("rx.bogus:x", _quests("a"))
+    result = search_rows(request, threading.Event(), lambda chunk: None)
+    assert result.error and not result.rows
+    request = SearchRequest("rx:(", _quests("a"))
+    assert search_rows(request, threading.Event(), lambda chunk: None).error.startswith("Bad regex")
@@ -0,0 +1,116 @@
+import os
+import shutil
+
+import pytest
+
+from app.xml import xml_loader
+from app.xml.act_helpers import apply_rewards, extract_rewards
+from app.xml.check_helpers import apply_requirements, extract_requirements
+from app.xml.quest_index import drop_index, get_index
+from app.xml.records import PairList
+from app.xml.reverse_index import (
+    ITEM_GAIN,
+    ITEM_LOSE,
+    LVMIN,
+    MOB,
+    NPC_END,
+    NPC_START,
+    PREREQ,
+    build_reverse_index,
+    parse_search,
+    reverse_search,
+)
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+@pytest.fixture
+def roots(tmp_path):
+    """{"Check": root, "Act": root}, loaded from copies with their reverse indexes built."""
+    out = {}
+    for kind in ("Check", "Act"):
+        path = str(tmp_path / f"{kind}.img.xml")
+        shutil.copyfile(os.path.join(DATA, f"{kind}.img.xml"), path)
+        out[kind] = xml_loader.load_xml(path).getroot()
+        build_reverse_index(out[kind], kind)
+    yield out
+    for root in out.values():
+        drop_index(root)
+
+
+def _reverse(root):
+    return get_index(root).reverse
+
+
+def test_lookups_after_a_build(roots):
+    check = _reverse(roots["Check"])
+    assert check.lookup(NPC_START, 1012100) == {1000}
+    assert check.lookup(NPC_END, 1012101) == {1000}
+    assert check.lookup(MOB, 100100) == {1001}
+    assert check.lookup(PREREQ, 1000) == {1001}
+    assert check.lookup(MOB, 999) == frozenset()
+    assert check.columns[LVMIN].range(10, 20) == {1000, 1001}
+    assert _reverse(roots["Act"]).lookup(ITEM_GAIN, 2000000) == {1000}
+
+
+def test_searches_union_the_tables_of_both_files(roots):
+    assert reverse_search(roots, "npc", 1012101) == {1000, 1001}
+    assert reverse_search(roots, "item", 2000000) == {1000}
+    assert reverse_search(roots, "item", 4000000) == {1002}
+    assert reverse_search(roots, "prereq", 1000) == {1001}
+    # A file that is not loaded (or not indexed yet) adds nothing.
+    assert reverse_search({"Check": roots["Check"]}, "item", 2000000) == set()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("npc:9000028", ("npc", 9000028)),
+        (" MOB : 100100 ", ("mob", 100100)),
+        ("item:abc", ("item", None)),
+        ("name:snail", None),
+        ("snail", None),
+    ],
+)
+def test_parse_search(text, expected):
+    assert parse_search(text) == expected
+
+
+def test_apply_keeps_the_index_current(roots):
+    check_root = roots["Check"]
+    data = extract_requirements(check_root, 1001)
+    data.mobs = PairList.from_pairs([(100101, 3)])
+    data.start_npc = 1012100
+    data.lvmin = 40
+    apply_requirements(check_root, 1001, data)
+
+    check = _reverse(check_root)
+    assert check.lookup(MOB, 100100) == frozenset()
+    assert check.lookup(MOB, 100101) == {1001}
+    assert check.lookup(NPC_START, 1012100) == {1000, 1001}
+    assert check.lookup(NPC_START, 1012101) == frozenset()
+    assert check.columns[LVMIN].range(30, None) == {1001, 1002}
+    assert check.columns[LVMIN].range(35, None) == {1001}
+
+    act_root = roots["Act"]
+    rewards = extract_rewards(act_root, 1001)
+    rewards.lose_items = PairList.from_pairs([(2000000, 1)])
+    apply_rewards(act_root, 1001, rewards)
+    assert _reverse(act_root).lookup(ITEM_LOSE, 2000000) == {1001}
+    assert reverse_search(roots, "item", 2000000) == {1000, 1001}
+
+    # Kept current one quest at a time: the same as building it again.
+    for kind, root in roots.items():
+        assert _reverse(root).state() == build_reverse_index(root, kind).state()
+
+
+def test_removed_and_restored_quests_leave_and_rejoin(roots):
+    index = get_index(roots["Check"])
+    xml = index.xml_of(1002)
+    index.remove(1002)
+    assert reverse_search(roots, "item", 4000000) == set()
+    assert 1002 not in index.reverse.columns[LVMIN].values
+
+    index.restore(1002, xml)
+    assert reverse_search(roots, "item", 4000000) == {1002}
+    assert index.reverse.columns[LVMIN].values[1002] == 30
@@ -0,0 +1,83 @@
+import os
+import shutil
+
+import pytest
+
+from app.xml import snapshot_cache, xml_loader
+from app.xml.quest_index import drop_index, get_index
+from app.xml.reverse_index import build_reverse_index
+from app.xml.text_index import build_text_index
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+KINDS = ("QuestInfo", "Check", "Act")
+
+
+def _copy(tmp_path, kind) -> str:
+    path = str(tmp_path / f"{kind}.img.xml")
+    shutil.copyfile(os.path.join(DATA, f"{kind}.img.xml"), path)
+    return path
+
+
+def _parse(path, kind):
+    """Fresh parse with the file's derived index built: (root, index state)."""
+    root = xml_loader.load_xml(path).getroot()
+    if kind == "QuestInfo":
+        index = build_text_index(root)
+    else:
+        index = build_reverse_index(root, kind)
+    return root, index.state()
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_a_cache_hit_gives_what_a_fresh_parse_gives(tmp_path, kind):
+    path = _copy(tmp_path, kind)
+    root, state = _parse(path, kind)
+    assert snapshot_cache.write_snapshot(path, kind, root)
+    drop_index(root)
+
+    snapshot = snapshot_cache.load_snapshot(path, kind)
+    assert snapshot is not None
+    assert snapshot.digest == snapshot_cache.content_hash(path)
+    assert list(snapshot.quest_list.ids) == [1000, 1001, 1002]
+
+    fresh, fresh_state = _parse(path, kind)
+    extract = snapshot_cache.EXTRACTORS[kind]
+    for qid in (1000, 1001, 1002, 4242):
+        assert snapshot.get(qid).to_tuple() == extract(fresh, qid).to_tuple()
+    drop_index(fresh)
+
+    # The stored index stands in for building one.
+    root = xml_loader.load_xml(path).getroot()
+    assert snapshot_cache.attach_index(root, kind, snapshot)
+    assert get_index(root).reverse.state() == fresh_state == state
+    drop_index(root)
+
+
+def test_a_changed_file_misses(tmp_path):
+    path = _copy(tmp_path, "Act")
+    root, _state = _parse(path, "Act")
+    snapshot_cache.write_snapshot(path, "Act", root)
+    drop_index(root)
+    assert snapshot_cache.load_snapshot(path, "Act") is not None
+    assert snapshot_cache.load_snapshot(path, "Check") is None
+
+    with open(path, "ab") as f:
+        f.write(b"\r\n")
+    assert snapshot_cache.load_snapshot(path, "Act") is None
+
+
+def test_a_corrupt_cache_misses(tmp_path):
+    path = _copy(tmp_path, "Check")
+    root, _state = _parse(path, "Check")
+    snapshot_cache.write_snapshot(path, "Check", root)
+    drop_index(root)
+
+    cache = snapshot_cache.cache_path_for(path)
+    with open(cache, "r+b") as f:
+        f.seek(-16, os.SEEK_END)
+        f.write(b"\xff" * 16)
+    assert snapshot_cache.load_snapshot(path, "Check") is None
+
+    with open(cache, "wb") as f:
+        f.write(b"not a snapshot")
+    assert snapshot_cache.load_snapshot(path, "Check") is None
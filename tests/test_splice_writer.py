@@ -0,0 +1,84 @@
+import io
+import os
+import shutil
+
+from app.xml import splice_writer, xml_loader
+from app.xml.act_helpers import apply_rewards, extract_rewards
+from app.xml.backend import ET
+from app.xml.lazy_loader import scan_top_level
+from app.xml.quest_index import get_index
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "Act.img.xml")
+
+
+def _source():
+    with open(FIXTURE, "rb") as f:
+        buf = f.read()
+    head_end, tail_start, found, _attrib = scan_top_level(buf)
+    spans, gap_start = [], head_end
+    for _name, start, end in found:
+        spans.append((gap_start, start, end))
+        gap_start = end
+    return buf, head_end, tail_start, spans
+
+
+def _write(buf, head_end, pieces, tail_start):
+    out = io.BytesIO()
+    spans, new_tail = splice_writer.write_pieces(out, None, buf, head_end, pieces, tail_start)
+    return out.getvalue(), spans, new_tail
+
+
+def test_copying_every_piece_gives_the_same_bytes():
+    buf, head_end, tail_start, spans = _source()
+    data, new_spans, new_tail = _write(buf, head_end, spans, tail_start)
+    assert data == buf
+    assert new_spans == spans
+    assert new_tail == tail_start
+
+
+def test_only_the_replaced_quest_is_serialized():
+    buf, head_end, tail_start, spans = _source()
+    node = ET.fromstring(buf[spans[1][1]:spans[1][2]])
+    node.find("imgdir[@name='1']/int[@name='exp']").set("value", "999")
+    sep = splice_writer.separator(buf, spans)
+    assert sep == b"\r\n  "
+
+    data, new_spans, new_tail = _write(buf, head_end, [spans[0], (sep, node), spans[2]], tail_start)
+    assert data == buf.replace(b'value="250"', b'value="999"')
+    # The returned spans locate every piece in the new file.
+    for (gap_start, start, end), (_g, old_start, old_end) in zip(new_spans, spans):
+        assert data[start:end].startswith(b'<imgdir name="')
+        assert end - start == old_end - old_start
+    assert data[new_tail:] == buf[tail_start:]
+
+
+def test_dropped_quest_leaves_no_gap():
+    buf, head_end, tail_start, spans = _source()
+    data, new_spans, _tail = _write(buf, head_end, [spans[0], spans[2]], tail_start)
+    assert b'name="1001"' not in data
+    assert data == buf[:spans[1][0]] + buf[spans[2][0]:]
+    assert len(new_spans) == 2
+
+
+def test_write_tree_splices_a_full_tree(tmp_path):
+    path = str(tmp_path / "Act.img.xml")
+    shutil.copy(FIXTURE, path)
+    key = splice_writer.stat_key(path)
+    tree = xml_loader.load_xml(path)
+    root = tree.getroot()
+    children = [c for c in root if c.tag == "imgdir"]
+    assert splice_writer.map_source(root, path, key, children) is not None
+
+    rewards = extract_rewards(root, 1000)
+    rewards.exp = 12345
+    apply_rewards(root, 1000, rewards)
+    assert get_index(root).dirty == {"1000"}
+    assert splice_writer.write_tree(tree, path)
+
+    with open(FIXTURE, "rb") as f:
+        original = f.read()
+    with open(path, "rb") as f:
+        assert f.read() == original.replace(b'value="100"', b'value="12345"')
+
+    # The map follows the save, so the next save splices again.
+    assert get_index(root).source_map.matches(path)
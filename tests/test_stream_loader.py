@@ -0,0 +1,76 @@
+import os
+import shutil
+
+from app.xml import xml_loader
+from app.xml.act_helpers import apply_rewards, extract_rewards
+from app.xml.backend import ET
+from app.xml.quest_index import drop_index, get_index
+from app.xml.stream_loader import QuestRecord, RecordQuestIndex
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "Act.img.xml")
+
+
+def _load(tmp_path):
+    path = str(tmp_path / "Act.img.xml")
+    shutil.copyfile(FIXTURE, path)
+    return path, xml_loader.load_xml(path, mode=xml_loader.LOAD_RECORDS)
+
+
+def _read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _shape(el):
+    """Tags, attributes and nesting, without the whitespace a record drops."""
+    return el.tag, dict(el.attrib), [_shape(child) for child in el]
+
+
+def test_records_rebuild_the_same_quests():
+    strings = {}
+    for node in ET.parse(FIXTURE).getroot():
+        record = QuestRecord.from_element(node, strings)
+        assert record.name == node.get("name")
+        assert _shape(record.to_element()) == _shape(node)
+    # Values repeated across quests (stage names "0" / "1") are shared.
+    assert "0" in strings and "1" in strings
+
+
+def test_the_file_is_held_as_records_only(tmp_path):
+    _path, tree = _load(tmp_path)
+    root = tree.getroot()
+    index = get_index(root)
+    assert isinstance(index, RecordQuestIndex)
+    assert len(root) == 0 and index.ids() == ["1000", "1001", "1002"]
+    count, size = index.memory_size()
+    assert count == 3 and size < os.path.getsize(FIXTURE)
+
+    full = xml_loader.load_xml(FIXTURE).getroot()
+    for qid in (1000, 1001, 1002):
+        assert extract_rewards(root, qid).to_tuple() == extract_rewards(full, qid).to_tuple()
+    drop_index(root)
+
+
+def test_an_unchanged_save_is_byte_for_byte(tmp_path):
+    path, tree = _load(tmp_path)
+    xml_loader.save_xml(tree, path)
+    assert _read(path) == _read(FIXTURE)
+    drop_index(tree.getroot())
+
+
+def test_only_the_edited_quest_is_rewritten(tmp_path):
+    path, tree = _load(tmp_path)
+    root = tree.getroot()
+    rewards = extract_rewards(root, 1000)
+    rewards.exp = 12345
+    apply_rewards(root, 1000, rewards)
+    assert xml_loader.save_changes(tree, path) == ["1000"]
+
+    expected = _read(FIXTURE).replace(b'value="100"', b'value="12345"')
+    assert _read(path) == expected
+    # The edit is folded back into the records.
+    assert get_index(root).memory_size()[0] == 3
+    assert extract_rewards(root, 1000).exp == 12345
+    xml_loader.save_xml(tree, path)
+    assert _read(path) == expected
+    drop_index(root)
@@ -0,0 +1,83 @@
+import os
+import shutil
+
+import pytest
+
+from app.xml import xml_loader
+from app.xml.quest_index import drop_index, get_index
+from app.xml.questinfo_helpers import apply_questinfo, extract_questinfo
+from app.xml.text_index import AREA, ORDER, build_text_index, tokenize
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "QuestInfo.img.xml")
+
+
+@pytest.fixture
+def root(tmp_path):
+    path = str(tmp_path / "QuestInfo.img.xml")
+    shutil.copyfile(FIXTURE, path)
+    root = xml_loader.load_xml(path).getroot()
+    build_text_index(root)
+    yield root
+    drop_index(root)
+
+
+def _ids(root, text, **kwargs):
+    return [qid for qid, _score in get_index(root).reverse.search(text, **kwargs)]
+
+
+def test_tokenize_drops_case_and_text_codes():
+    assert tokenize("#bMaya#k's #t4000000# Potion!") == ["maya", "s", "4000000", "potion"]
+    assert tokenize("") == []
+
+
+def test_a_name_hit_ranks_above_a_summary_hit(root):
+    # 1002 has "Potion" in its name, 1001 only in the reward summary.
+    assert _ids(root, "potion") == [1002, 1001]
+    assert _ids(root, "potion", limit=1) == [1002]
+
+
+def test_words_match_as_prefixes(root):
+    assert _ids(root, "sna") == [1001]
+    assert _ids(root, "hen") == [1000]
+    assert set(_ids(root, "pot")) == {1001, 1002}
+    # One letter only matches the whole word ("Jerry's" → "s").
+    assert _ids(root, "h") == []
+    assert _ids(root, "s") == [1001]
+
+
+def test_every_query_word_must_match(root):
+    assert _ids(root, "snail hunt") == [1001]
+    assert _ids(root, "maya letter") == [1000]
+    assert _ids(root, "maya potion") == []
+    assert _ids(root, "potion", within={1001}) == [1001]
+
+
+def test_columns(root):
+    columns = get_index(root).reverse.columns
+    assert columns[AREA].values == {1000: 20}
+    assert columns[ORDER].range(1, 5) == {1002}
+
+
+def test_apply_questinfo_reindexes_the_quest(root):
+    data = extract_questinfo(root, 1001)
+    data.name = "Mushroom Hunt"
+    data.area = 30
+    apply_questinfo(root, 1001, data)
+
+    text = get_index(root).reverse
+    assert _ids(root, "mushroom") == [1001]
+    assert _ids(root, "snail") == [1001]  # still in its log text
+    assert _ids(root, "snail hunt") == [1001]
+    assert text.columns[AREA].range(25, None) == {1001}
+    # The same as building it again.
+    assert text.state() == build_text_index(root).state()
+
+
+def test_removed_quests_drop_out(root):
+    index = get_index(root)
+    xml = index.xml_of(1002)
+    index.remove(1002)
+    assert _ids(root, "delivery") == []
+    assert _ids(root, "potion") == [1001]
+    index.restore(1002, xml)
+    assert _ids(root, "delivery") == [1002]
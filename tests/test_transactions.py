@@ -0,0 +1,118 @@
+import builtins
+import os
+import shutil
+
+import pytest
+
+from app.xml import xml_loader
+from app.xml.act_helpers import apply_rewards, extract_rewards
+from app.xml.quest_index import drop_index, get_index
+from app.xml.reverse_index import ITEM_GAIN, build_reverse_index
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "Act.img.xml")
+MODES = [xml_loader.LOAD_FULL, xml_loader.LOAD_LAZY, xml_loader.LOAD_RECORDS]
+
+
+def _load(tmp_path, mode):
+    path = str(tmp_path / "Act.img.xml")
+    shutil.copyfile(FIXTURE, path)
+    return path, xml_loader.load_xml(path, mode=mode)
+
+
+def _read(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _set_exp(root, qid, exp):
+    rewards = extract_rewards(root, qid)
+    rewards.exp = exp
+    apply_rewards(root, qid, rewards)
+
+
+def _no_disk(*args, **kwargs):
+    raise AssertionError("rollback went back to the file")
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_rollback_undoes_edits_deletes_and_new_quests_from_memory(tmp_path, monkeypatch, mode):
+    path, tree = _load(tmp_path, mode)
+    root = tree.getroot()
+    build_reverse_index(root, "Act")
+    index = get_index(root)
+    images = {name: index.xml_of(name) for name in index.ids()}
+
+    index.begin()
+    assert index.in_transaction()
+    _set_exp(root, 1000, 12345)
+    index.remove(1001)
+    index.restore(1002, images["1000"])  # a clone over an existing quest
+    apply_rewards(root, 2000, extract_rewards(root, 1000))  # a new quest
+    assert index.dirty == {"1000", "1001", "1002", "2000"}
+    assert index.ids() == ["1000", "1002", "2000"]
+    assert index.reverse.lookup(ITEM_GAIN, 2000000) == {1000, 1002, 2000}
+
+    with monkeypatch.context() as patch:
+        patch.setattr(builtins, "open", _no_disk)
+        patch.setattr(xml_loader, "load_xml", _no_disk)
+        assert index.rollback() == {"1000", "1001", "1002", "2000"}
+
+    assert not index.in_transaction() and not index.dirty
+    assert index.ids() == ["1000", "1001", "1002"]
+    assert {name: index.xml_of(name) for name in index.ids()} == images
+    assert index.reverse.lookup(ITEM_GAIN, 2000000) == {1000}
+    assert index.reverse.state() == build_reverse_index(root, "Act").state()
+    # The quests are back where the file has them: an unchanged save.
+    xml_loader.save_xml(tree, path)
+    assert _read(path) == _read(FIXTURE)
+    drop_index(root)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_commit_keeps_the_changes_for_one_save(tmp_path, mode):
+    path, tree = _load(tmp_path, mode)
+    root = tree.getroot()
+    index = get_index(root)
+
+    index.begin()
+    _set_exp(root, 1000, 12345)
+    index.remove(1002)
+    index.commit()
+    assert not index.in_transaction()
+    assert xml_loader.pending_changes(tree) == ["1000", "1002"]
+
+    assert xml_loader.save_changes(tree, path) == ["1000", "1002"]
+    saved = _read(path)
+    assert b'value="12345"' in saved and b'name="1002"' not in saved
+    drop_index(root)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_a_save_inside_a_transaction_moves_the_savepoint(tmp_path, mode):
+    path, tree = _load(tmp_path, mode)
+    root = tree.getroot()
+    index = get_index(root)
+
+    index.begin()
+    _set_exp(root, 1000, 12345)
+    assert xml_loader.save_changes(tree, path) == ["1000"]
+    assert index.in_transaction() and not index.dirty
+
+    _set_exp(root, 1001, 7)
+    index.remove(1002)
+    assert index.rollback() == {"1001", "1002"}
+    # Back to what was saved, not to where the transaction started.
+    assert extract_rewards(root, 1000).exp == 12345
+    assert extract_rewards(root, 1001).exp == 250
+    assert index.ids() == ["1000", "1001", "1002"] and not index.dirty
+    drop_index(root)
+
+
+def test_rolling_back_an_empty_transaction_changes_nothing(tmp_path):
+    _path, tree = _load(tmp_path, xml_loader.LOAD_FULL)
+    index = get_index(tree.getroot())
+    children = list(tree.getroot())
+    index.begin()
+    assert index.rollback() == set()
+    assert list(tree.getroot()) == children and not index.dirty
+    drop_index(tree.getroot())
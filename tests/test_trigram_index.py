@@ -0,0 +1,64 @@
+from app.xml.trigram_index import TrigramIndex, fold
+
+
+def _index(names):
+    index = TrigramIndex()
+    for quest_id, name in names.items():
+        index.add(quest_id, name)
+    return index
+
+
+NAMES = {
+    1000: "Maple Leaf",
+    1001: "The Mapleleaf Collector",
+    1002: "Blue Potion",
+    1003: "#bRed#k Potion",
+    1004: "Snail Hunt",
+}
+
+
+def test_fold_drops_case_codes_and_punctuation():
+    assert fold("Maple  Leaf!") == fold("mapleleaf") == "mapleleaf"
+    assert fold("#bRed#k Potion") == "redpotion"
+
+
+def test_exact_name_ranks_first():
+    hits = _index(NAMES).search("maple leaf")
+    assert [qid for qid, _sim in hits] == [1000, 1001]
+    assert hits[0][1] == 1.0
+
+
+def test_one_typo_still_matches():
+    ids = [qid for qid, _sim in _index(NAMES).search("snial hunt")]
+    assert ids == [1004]
+    assert 1002 in [qid for qid, _sim in _index(NAMES).search("blue potoin")]
+
+
+def test_short_or_unrelated_queries_find_nothing():
+    index = _index(NAMES)
+    assert index.search("ma") == []
+    assert index.search("zzzzzz") == []
+
+
+def test_limit_and_ties_by_id():
+    index = _index({5: "Red Potion", 3: "Red Potion", 4: "Red Potion"})
+    assert [qid for qid, _sim in index.search("red potion")] == [3, 4, 5]
+    assert [qid for qid, _sim in index.search("red potion", limit=2)] == [3, 4]
+
+
+def test_readd_and_discard_update_postings():
+    index = _index(NAMES)
+    index.add(1002, "Green Herb")
+    assert 1002 not in [qid for qid, _sim in index.search("blue potion")]
+    assert [qid for qid, _sim in index.search("green herb")] == [1002]
+
+    index.discard(1002)
+    assert index.search("green herb") == []
+    assert len(index) == len(NAMES) - 1
+    assert all(quests for quests in index.state()[0].values())
+
+
+def test_load_state_round_trip():
+    index = _index(NAMES)
+    copy = TrigramIndex().load_state(index.state())
+    assert copy.search("maple leaf") == index.search("maple leaf")
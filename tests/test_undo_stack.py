@@ -0,0 +1,189 @@
+import os
+
+import pytest
+
+from app.xml import edit_journal, xml_loader
+from app.xml.quest_index import drop_index, get_index
+from app.xml.undo_stack import AFTER, BEFORE, UndoStack
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "Act.img.xml")
+MODES = [xml_loader.LOAD_FULL, xml_loader.LOAD_LAZY, xml_loader.LOAD_RECORDS]
+
+
+def _images(**quests):
+    return {"Act": {name: xml for name, xml in quests.items()}}
+
+
+def test_push_keeps_only_changed_quests():
+    stack = UndoStack()
+    assert stack.push("nothing", _images(a=b"1"), _images(a=b"1")) is None
+    step = stack.push("edit", _images(a=b"1", b=None), _images(a=b"2", b=None))
+    assert step.quests == 1
+    assert step.images(BEFORE) == _images(a=b"1")
+    assert step.images(AFTER) == _images(a=b"2")
+    assert len(stack) == 1
+
+
+def test_undo_redo_move_steps_between_stacks():
+    stack = UndoStack()
+    first = stack.push("one", _images(a=b"0"), _images(a=b"1"))
+    second = stack.push("two", _images(a=b"1"), _images(a=b"2"))
+    assert stack.undo_step() is second and stack.redo_step() is None
+
+    stack.undone()
+    assert stack.undo_step() is first and stack.redo_step() is second
+    stack.redone()
+    assert stack.undo_step() is second
+
+    stack.undone()
+    # A new edit drops what could be redone.
+    stack.push("three", _images(a=b"1"), _images(a=b"3"))
+    assert stack.redo_step() is None
+    assert [stack.undo_step().label, len(stack)] == ["three", 2]
+
+
+def test_oldest_steps_are_dropped_first():
+    stack = UndoStack(max_steps=3)
+    for n in range(5):
+        stack.push(f"step {n}", _images(a=b"%d" % n), _images(a=b"%d" % (n + 1)))
+    assert len(stack) == 3
+    labels = []
+    while stack.undo_step() is not None:
+        labels.append(stack.undo_step().label)
+        stack.undone()
+    assert labels == ["step 4", "step 3", "step 2"]
+
+    # The newest step is kept even when it alone is over the byte budget.
+    stack = UndoStack(max_bytes=1)
+    stack.push("big", _images(a=b"x" * 1000), _images(a=None))
+    stack.push("bigger", _images(b=os.urandom(1000)), _images(b=None))
+    assert len(stack) == 1 and stack.undo_step().label == "bigger"
+
+
+def _load(tmp_path, data: bytes, mode: str):
+    path = str(tmp_path / "Act.img.xml")
+    with open(path, "wb") as f:
+        f.write(data)
+    key = xml_loader.splice_writer.stat_key(path)
+    tree = xml_loader.load_xml(path, mode=mode)
+    if mode == xml_loader.LOAD_FULL:
+        root = tree.getroot()
+        children = [c for c in root if c.tag == "imgdir"]
+        xml_loader.splice_writer.map_source(root, path, key, children)
+    return path, tree
+
+
+def _delete(tree, stack, *ids):
+    """Delete `ids` as the editor does, recording the undo step."""
+    roots = {"Act": tree.getroot()}
+    before = edit_journal.quest_images(roots, ids)
+    positions = edit_journal.quest_positions(roots, ids)
+    for qid in ids:
+        get_index(tree.getroot()).remove(qid)
+    stack.push("Delete", before, edit_journal.quest_images(roots, ids), positions)
+
+
+def _apply(tree, stack, undo=True):
+    step = stack.undo_step() if undo else stack.redo_step()
+    images = step.images(BEFORE if undo else AFTER)
+    edit_journal.restore_images(images, {"Act": tree.getroot()}, step.positions())
+    stack.undone() if undo else stack.redone()
+
+
+def _saved(tree, path) -> bytes:
+    xml_loader.save_changes(tree, path)
+    drop_index(tree.getroot())
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_positions_are_kept_for_removed_quests_only():
+    stack = UndoStack()
+    step = stack.push(
+        "Delete",
+        _images(a=b"1", b=b"2", c=b"3"),
+        _images(a=None, b=b"2", c=b"3"),
+        {"Act": {"a": "", "b": "a"}},
+    )
+    assert step.positions() == {"Act": {"a": "", "b": "a"}}
+    # b was removed too: a duplicate with the same XML now has the name.
+    assert step.images(AFTER) == _images(a=None, b=None)
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("ids", [(1000,), (1001,), (1002,), (1001, 1000), (1002, 1000, 1001)])
+def test_undoing_a_delete_puts_the_quests_back_in_place(tmp_path, mode, ids):
+    with open(FIXTURE, "rb") as f:
+        original = f.read()
+    path, tree = _load(tmp_path, original, mode)
+    stack = UndoStack()
+    _delete(tree, stack, *ids)
+    _apply(tree, stack)
+
+    assert get_index(tree.getroot()).ids() == ["1000", "1001", "1002"]
+    assert _saved(tree, path) == original
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_undoing_a_delete_hides_the_duplicate_again(tmp_path, mode):
+    with open(FIXTURE, "rb") as f:
+        original = f.read()
+    # A second "1001" at the end, as some dumps have.
+    tail = original.rindex(b"</imgdir>")
+    duplicate = b'  <imgdir name="1001">\r\n    <int name="copy" value="2"/>\r\n  </imgdir>\r\n'
+    original = original[:tail] + duplicate + original[tail:]
+    path, tree = _load(tmp_path, original, mode)
+    index = get_index(tree.getroot())
+    assert index.duplicates == {"1001": 2}
+
+    stack = UndoStack()
+    _delete(tree, stack, 1001)
+    assert b"copy" in index.xml_of(1001)
+    _apply(tree, stack)
+    assert index.duplicates == {"1001": 2}
+    assert b"copy" not in index.xml_of(1001)
+
+    _apply(tree, stack, undo=False)
+    assert not index.duplicates and b"copy" in index.xml_of(1001)
+    _apply(tree, stack)
+    assert _saved(tree, path) == original
+
+
+def test_rolling_back_a_delete_keeps_the_order(tmp_path):
+    with open(FIXTURE, "rb") as f:
+        original = f.read()
+    path, tree = _load(tmp_path, original, xml_loader.LOAD_FULL)
+    roots = {"Act": tree.getroot()}
+    journal = edit_journal.EditJournal(str(tmp_path))
+    ids = [1001, 1000]
+    journal.log_delete(
+        edit_journal.quest_images(roots, ids), ids, "Delete", edit_journal.quest_positions(roots, ids)
+    )
+    journal.close()
+    ops = edit_journal.EditJournal(str(tmp_path)).pending()
+    edit_journal.replay(ops, roots)
+    assert get_index(tree.getroot()).ids() == ["1002"]
+
+    edit_journal.roll_back(ops, roots)
+    assert _saved(tree, path) == original
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_undoing_a_scattered_delete_restores_the_whole_order(tmp_path, mode):
+    names = [str(2000 + i) for i in range(40)]
+    original = b'<imgdir name="Act.img">\r\n' + b"".join(
+        b'  <imgdir name="%s">\r\n    <int name="n" value="%d"/>\r\n  </imgdir>\r\n' % (name.encode(), i)
+        for i, name in enumerate(names)
+    ) + b"</imgdir>\r\n"
+    path, tree = _load(tmp_path, original, mode)
+    index = get_index(tree.getroot())
+    # First, last, a run of neighbours and every seventh one in between.
+    gone = {names[0], names[-1], *names[10:15], *names[3::7]}
+    stack = UndoStack()
+    _delete(tree, stack, *sorted(gone, reverse=True))
+    assert index.ids() == [name for name in names if name not in gone]
+
+    _apply(tree, stack)
+    assert index.ids() == names
+    assert index.get(names[12]).get("name") == names[12]
+    assert _saved(tree, path) == original
@@ -0,0 +1,105 @@
+import io
+import os
+
+import pytest
+
+from app.xml import parallel_writer, wz_writer, xml_loader
+from app.xml.backend import ET
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "Act.img.xml")
+
+
+def _fixture() -> bytes:
+    with open(FIXTURE, "rb") as f:
+        return f.read()
+
+
+def _variants():
+    data = _fixture()
+    return {
+        "crlf": data,
+        "no final newline": data.rstrip(),
+        "lf": data.replace(b"\r\n", b"\n"),
+        "blank lines at the end": data + b"\r\n\r\n",
+    }
+
+
+@pytest.mark.parametrize("name", list(_variants()))
+def test_full_rewrite_is_byte_for_byte(tmp_path, name):
+    data = _variants()[name]
+    path = tmp_path / "Act.img.xml"
+    path.write_bytes(data)
+
+    tree = xml_loader.load_xml(str(path))
+    out = io.BytesIO()
+    wz_writer.write_tree(tree, out, wz_writer.file_format(str(path)))
+    assert out.getvalue() == data
+
+    # save_xml() without a source map takes the same path.
+    xml_loader.save_xml(tree, str(path))
+    assert path.read_bytes() == data
+
+
+def test_detect_format():
+    data = _fixture()
+    fmt = wz_writer.detect_format(data, data)
+    assert (fmt.newline, fmt.indent, fmt.ending) == ("\r\n", "  ", "\r\n")
+    assert fmt.declaration == wz_writer.DEFAULT_DECLARATION
+    assert wz_writer.detect_format(data, data.rstrip()).ending == ""
+    # Without the tail a newline is assumed.
+    assert wz_writer.detect_format(data).ending == "\r\n"
+    # One line, no indentation: not the dialect.
+    assert wz_writer.detect_format(b'<imgdir name="Act.img"><imgdir name="1"/></imgdir>') is None
+
+
+def test_quests_serialize_like_the_file():
+    data = _fixture()
+    root = ET.fromstring(data)
+    fmt = wz_writer.detect_format(data)
+    for node, chunk in zip(root, wz_writer.serialize_quests(list(root), fmt)):
+        start = data.index(f'<imgdir name="{node.get("name")}">'.encode())
+        assert data[start:start + len(chunk)] == chunk
+
+
+def test_attribute_escapes_and_empty_imgdir():
+    node = ET.Element("imgdir", {"name": "5"})
+    ET.SubElement(node, "string", {"name": "a", "value": "x\"'&<>\n"})
+    ET.SubElement(node, "imgdir", {"name": "0"})
+    out = wz_writer.quest_bytes(node, wz_writer.WzFormat("\n", "  "))
+    assert out == (
+        b'<imgdir name="5">\n'
+        b'    <string name="a" value="x&quot;&apos;&amp;&lt;&gt;&#10;"/>\n'
+        b'    <imgdir name="0">\n'
+        b"    </imgdir>\n"
+        b"  </imgdir>"
+    )
+    assert ET.fromstring(out)[0].get("value") == "x\"'&<>\n"
+
+
+
+@pytest.mark.skipif(not parallel_writer.HAVE_LXML, reason="worker processes need lxml")
+def test_worker_processes_write_the_same_bytes(tmp_path, monkeypatch):
+    root = ET.fromstring(_fixture())
+    quests = list(root)
+    for i in range(300):
+        copy = ET.fromstring(ET.tostring(quests[i % len(quests)]))
+        copy.set("name", str(5000 + i))
+        copy.tail = quests[0].tail
+        root.insert(len(root) - 1, copy)
+    odd = ET.SubElement(root[3], "string", {"name": "note", "value": "tab\there 'quoted'"})
+    odd.text = "text content"  # outside the dialect: ElementTree output
+    path = tmp_path / "Act.img.xml"
+    ET.ElementTree(root).write(str(path), encoding="utf-8", xml_declaration=True)
+    tree = xml_loader.load_xml(str(path))
+    fmt = wz_writer.file_format(str(path))
+
+    sequential = io.BytesIO()
+    wz_writer.write_tree(tree, sequential, fmt)
+    assert b"text content" in sequential.getvalue()
+
+    monkeypatch.setattr(parallel_writer, "CHUNK_QUESTS", 16)
+    monkeypatch.setattr(parallel_writer, "MIN_PROCESSES", 0)
+    monkeypatch.setattr(parallel_writer, "processes", lambda: 2)
+    parallel = io.BytesIO()
+    wz_writer.write_tree(tree, parallel, fmt)
+    assert parallel.getvalue() == sequential.getvalue()
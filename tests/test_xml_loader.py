@@ -0,0 +1,107 @@
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from app.xml import xml_loader
+from app.xml.backend import ET
+from app.xml.quest_index import drop_index, get_index
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+FIXTURE = os.path.join(DATA, "Act.img.xml")
+KINDS = ("QuestInfo", "Check", "Act")
+MODES = [xml_loader.LOAD_FULL, xml_loader.LOAD_LAZY, xml_loader.LOAD_RECORDS]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_progress_ends_at_the_file_size(monkeypatch, mode):
+    monkeypatch.setattr(xml_loader, "CHUNK_SIZE", 256)
+    calls = []
+    tree = xml_loader.load_xml(FIXTURE, progress=lambda *args: calls.append(args), mode=mode)
+    size = os.path.getsize(FIXTURE)
+
+    assert calls[-1] == (size, size, 3)
+    done = [bytes_read for bytes_read, _total, _quests in calls]
+    assert done == sorted(done)
+    assert get_index(tree.getroot()).ids() == ["1000", "1001", "1002"]
+    drop_index(tree.getroot())
+
+
+def test_chunked_parse_gives_the_same_tree(monkeypatch):
+    monkeypatch.setattr(xml_loader, "CHUNK_SIZE", 100)
+    chunked = xml_loader.load_xml(FIXTURE, progress=lambda *args: None)
+    assert ET.tostring(chunked.getroot()) == ET.tostring(ET.parse(FIXTURE).getroot())
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_a_set_cancel_event_stops_the_load(mode):
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(xml_loader.LoadCancelled):
+        xml_loader.load_xml(FIXTURE, cancel=cancel, mode=mode)
+
+
+def test_cancelling_mid_parse(monkeypatch):
+    monkeypatch.setattr(xml_loader, "CHUNK_SIZE", 256)
+    cancel = threading.Event()
+    calls = []
+
+    def progress(*args):
+        calls.append(args)
+        cancel.set()
+
+    with pytest.raises(xml_loader.LoadCancelled):
+        xml_loader.load_xml(FIXTURE, progress=progress, cancel=cancel)
+    assert len(calls) == 1
+
+
+def test_missing_or_broken_files_give_none(tmp_path):
+    assert xml_loader.load_xml(str(tmp_path / "missing.xml")) is None
+    broken = tmp_path / "Act.img.xml"
+    broken.write_bytes(b'<imgdir name="Act.img"><imgdir name="1000">')
+    assert xml_loader.load_xml(str(broken), progress=lambda *args: None) is None
+
+
+def _run_load_job(paths, modes=None):
+    """Run an XmlLoadJob to the end: (file_loaded {kind: tree}, snapshot kinds, cancelled)."""
+    QCoreApplication = pytest.importorskip("PySide6.QtCore").QCoreApplication
+    from app.ui.xml_load_job import XmlLoadJob
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    loaded, snapshots, finished = {}, [], []
+    job = XmlLoadJob(paths, modes=modes)
+    job.file_loaded.connect(lambda kind, tree: loaded.__setitem__(kind, tree))
+    job.snapshot_loaded.connect(lambda kind, _snapshot: snapshots.append(kind))
+    job.finished.connect(finished.append)
+    job.start()
+    # Signals from the workers are queued onto this thread.
+    deadline = time.monotonic() + 10
+    while not finished and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    job.wait()
+    assert finished, "load job did not finish"
+    return loaded, snapshots, finished[0]
+
+
+def test_load_job_loads_every_file_and_warm_starts_the_next_time(tmp_path):
+    paths = {}
+    for kind in KINDS:
+        paths[kind] = str(tmp_path / f"{kind}.img.xml")
+        shutil.copyfile(os.path.join(DATA, f"{kind}.img.xml"), paths[kind])
+    modes = {"Act": xml_loader.LOAD_LAZY}
+
+    loaded, snapshots, cancelled = _run_load_job(paths, modes)
+    assert not cancelled and snapshots == []
+    for kind in KINDS:
+        index = get_index(loaded[kind].getroot())
+        assert index.ids() == ["1000", "1001", "1002"]
+        assert index.reverse is not None
+        drop_index(loaded[kind].getroot())
+
+    loaded, snapshots, cancelled = _run_load_job(paths, modes)
+    assert not cancelled and sorted(snapshots) == sorted(KINDS)
+    for tree in loaded.values():
+        drop_index(tree.getroot())